@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .models import (
+    Feed,
+    Article,
+    ArticleBody,
+    ChangeSequence,
+    CompressionDictionary,
+    Job,
+)
+from .bodies import decompress_body, dictionaries
+from .schemas import ArticleQueryParams
+from .crud import (
+    article_changes,
+    article_changes_statement,
+    articles_page_statement,
+    check_changes_available,
+    count_articles_statement,
+    duplicate_counts_statement,
+    paginate_articles,
+    pruned_through_statement,
+    tombstones_statement,
+)
+from .search import search_snippets_statement
+
+# Async counterparts of the read helpers in crud.py, sharing their query
+# builders. Used by the read endpoints so they don't occupy a threadpool
+# slot per request.
+
+
+async def get_feed(session: AsyncSession, feed_id: int) -> Optional[Feed]:
+    """Get a feed by ID."""
+    return await session.get(Feed, feed_id)
+
+
+async def get_feeds(
+    session: AsyncSession, skip: int = 0, limit: int = 100
+) -> List[Feed]:
+    """Get all feeds with pagination."""
+    statement = select(Feed).offset(skip).limit(limit)
+    return (await session.exec(statement)).all()
+
+
+async def get_change_version(session: AsyncSession) -> int:
+    """Get the change sequence, which every article and feed write advances."""
+    statement = select(ChangeSequence.value).where(ChangeSequence.id == 1)
+    return (await session.exec(statement)).one_or_none() or 0
+
+
+async def get_job(session: AsyncSession, job_id: int) -> Optional[Job]:
+    """Get a queued job by ID."""
+    return await session.get(Job, job_id)
+
+
+async def get_jobs(
+    session: AsyncSession,
+    feed_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+) -> List[Job]:
+    """Get queued jobs, newest first."""
+    statement = select(Job).order_by(Job.id.desc()).limit(limit)
+    if feed_id is not None:
+        statement = statement.where(Job.feed_id == feed_id)
+    if status is not None:
+        statement = statement.where(Job.status == status)
+    return (await session.exec(statement)).all()
+
+
+async def get_article(session: AsyncSession, article_id: int) -> Optional[Article]:
+    """Get an article by ID."""
+    return await session.get(Article, article_id)
+
+
+async def get_article_content(session: AsyncSession, article_id: int) -> Optional[str]:
+    """Get an article's decompressed content HTML."""
+    body = await session.get(ArticleBody, article_id)
+    if body is None:
+        return None
+    if body.dictionary_id is not None and body.dictionary_id not in dictionaries:
+        dictionary = await session.get(CompressionDictionary, body.dictionary_id)
+        dictionaries[body.dictionary_id] = dictionary.data
+    return decompress_body(body, dictionaries.get(body.dictionary_id))
+
+
+async def count_articles(session: AsyncSession, params: ArticleQueryParams) -> int:
+    """Count the articles matching the filters."""
+    return (await session.exec(count_articles_statement(params))).one()
+
+
+async def get_articles(
+    session: AsyncSession, params: ArticleQueryParams
+) -> Tuple[List[Tuple[Article, Feed]], Optional[int], Optional[str]]:
+    """Get articles with their feeds, filtering and pagination.
+
+    See crud.get_articles for the return value.
+    """
+    statement, offset = articles_page_statement(params)
+    rows, next_cursor = paginate_articles(
+        (await session.exec(statement)).all(), params, offset
+    )
+    total = await count_articles(session, params) if params.include_total else None
+    return rows, total, next_cursor
+
+
+async def get_search_snippets(
+    session: AsyncSession, article_ids: Iterable[int], search: str
+) -> Dict[int, str]:
+    """Get highlighted snippets for matched articles."""
+    statement = search_snippets_statement(article_ids, search)
+    if statement is None:
+        return {}
+    return {
+        article_id: snippet for article_id, snippet in await session.exec(statement)
+    }
+
+
+async def get_duplicate_counts(
+    session: AsyncSession, story_ids: Iterable[int]
+) -> Dict[int, int]:
+    """Get how many copies each story has."""
+    return dict((await session.exec(duplicate_counts_statement(story_ids))).all())
+
+
+async def get_article_changes(
+    session: AsyncSession, since: int, limit: int, fields: Iterable[str]
+) -> dict:
+    """Get the articles changed or deleted after a sequence number.
+
+    See crud.get_article_changes.
+    """
+    fields = tuple(fields)
+    check_changes_available(
+        since, (await session.exec(pruned_through_statement())).first()
+    )
+    rows = (await session.exec(article_changes_statement(since, limit, fields))).all()
+    tombstones = (await session.exec(tombstones_statement(since, limit))).all()
+    return article_changes(rows, tombstones, fields, since, limit)
@@ -0,0 +1,257 @@
+import logging
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, select
+from .core.config import settings
+from .models import ArticleBody, CompressionDictionary
+
+logger = logging.getLogger(__name__)
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+# zlib only looks back 32 KiB, so a longer preset dictionary is wasted
+ZLIB_MAX_DICTIONARY = 32 * 1024
+# Length of the byte strings counted when building a zlib dictionary
+ZLIB_SEGMENT = 64
+
+# Bodies are removed with their article, whatever deletes it
+BODY_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS article_body_ad AFTER DELETE ON article BEGIN
+    DELETE FROM article_body WHERE article_id = old.id;
+END
+"""
+
+
+def zstd_available() -> bool:
+    """Check whether the optional zstandard package is installed."""
+    try:
+        import zstandard  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def configured_codec() -> str:
+    """Get the codec new bodies are written with."""
+    if settings.ARTICLE_BODY_CODEC == ZSTD:
+        if zstd_available():
+            return ZSTD
+        logger.warning(
+            "ARTICLE_BODY_CODEC is zstd but 'zstandard' is not installed, falling back to zlib"
+        )
+    return ZLIB
+
+
+class BodyCodec:
+    """Compresses article bodies with one codec and an optional dictionary."""
+
+    def __init__(self, codec: str, dictionary: Optional[CompressionDictionary] = None):
+        self.codec = codec
+        self.dictionary = dictionary
+        self.level = settings.ARTICLE_BODY_COMPRESSION_LEVEL
+        if codec == ZSTD:
+            import zstandard
+
+            dict_data = (
+                zstandard.ZstdCompressionDict(dictionary.data) if dictionary else None
+            )
+            self.zstd = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+
+    def compress(self, html: Optional[str]) -> Optional[ArticleBody]:
+        """Compress content HTML into a body row, None for no content."""
+        if not html:
+            return None
+        data = html.encode("utf-8")
+        if self.codec == ZSTD:
+            data = self.zstd.compress(data)
+        elif self.dictionary:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionary.data)
+            data = compressor.compress(data) + compressor.flush()
+        else:
+            data = zlib.compress(data, self.level)
+        return ArticleBody(
+            codec=self.codec,
+            dictionary_id=self.dictionary.id if self.dictionary else None,
+            data=data,
+        )
+
+
+# The codec ingest writes with; replaced when a dictionary is loaded or trained
+codec: Optional[BodyCodec] = None
+# Dictionaries never change once stored, so they are cached by id
+dictionaries: Dict[int, bytes] = {}
+
+
+def get_codec() -> BodyCodec:
+    global codec
+    if codec is None:
+        codec = BodyCodec(configured_codec())
+    return codec
+
+
+def use_dictionary(dictionary: Optional[CompressionDictionary]):
+    """Compress new bodies with this dictionary from now on."""
+    global codec
+    codec = BodyCodec(
+        dictionary.codec if dictionary else configured_codec(), dictionary
+    )
+    if dictionary:
+        dictionaries[dictionary.id] = dictionary.data
+
+
+def compress_body(html: Optional[str]) -> Optional[ArticleBody]:
+    """Compress content HTML with the current codec."""
+    return get_codec().compress(html)
+
+
+def decompress_body(body: ArticleBody, dictionary: Optional[bytes] = None) -> str:
+    """Get the content HTML back from a body row.
+
+    dictionary is the data of the body's dictionary_id, if it has one.
+    """
+    if body.codec == ZSTD:
+        import zstandard
+
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        data = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(body.data)
+    elif dictionary:
+        decompressor = zlib.decompressobj(zdict=dictionary)
+        data = decompressor.decompress(body.data) + decompressor.flush()
+    else:
+        data = zlib.decompress(body.data)
+    return data.decode("utf-8")
+
+
+def get_body_dictionary(session: Session, body: ArticleBody) -> Optional[bytes]:
+    """Get the dictionary data a body needs to be decompressed."""
+    if body.dictionary_id is None:
+        return None
+    if body.dictionary_id not in dictionaries:
+        dictionaries[body.dictionary_id] = session.get(
+            CompressionDictionary, body.dictionary_id
+        ).data
+    return dictionaries[body.dictionary_id]
+
+
+def get_content(session: Session, article_id: int) -> Optional[str]:
+    """Get an article's decompressed content HTML."""
+    body = session.get(ArticleBody, article_id)
+    if body is None:
+        return None
+    return decompress_body(body, get_body_dictionary(session, body))
+
+
+def set_content(session: Session, article_id: int, html: Optional[str]):
+    """Replace an article's stored content. Does not commit."""
+    new_body = compress_body(html)
+    body = session.get(ArticleBody, article_id)
+    if new_body is None:
+        if body is not None:
+            session.delete(body)
+        return
+    if body is None:
+        new_body.article_id = article_id
+        session.add(new_body)
+        return
+    body.codec = new_body.codec
+    body.dictionary_id = new_body.dictionary_id
+    body.data = new_body.data
+    session.add(body)
+
+
+def create_body_trigger(conn: Connection):
+    conn.execute(text(BODY_TRIGGER))
+
+
+def load_dictionary(engine: Engine):
+    """Pick up the newest stored dictionary for the configured codec."""
+    if settings.ARTICLE_BODY_DICTIONARY_SIZE <= 0:
+        return
+    with Session(engine) as session:
+        dictionary = session.exec(
+            select(CompressionDictionary)
+            .where(CompressionDictionary.codec == configured_codec())
+            .order_by(CompressionDictionary.id.desc())
+        ).first()
+    if dictionary:
+        use_dictionary(dictionary)
+
+
+def build_zlib_dictionary(samples: List[bytes], size: int) -> bytes:
+    """Build a zlib preset dictionary from the segments most bodies share.
+
+    zlib has no trainer, so this keeps the fixed-length segments found in
+    the most samples. The most common ones go last, where matches are
+    closest and cheapest to encode.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(
+            {
+                sample[start : start + ZLIB_SEGMENT]
+                for start in range(0, len(sample) - ZLIB_SEGMENT + 1, ZLIB_SEGMENT // 2)
+            }
+        )
+    segments = []
+    total = 0
+    for segment, count in counts.most_common():
+        if count < 2 or total + len(segment) > size:
+            break
+        segments.append(segment)
+        total += len(segment)
+    return b"".join(reversed(segments))
+
+
+def train_dictionary(engine: Engine) -> Optional[CompressionDictionary]:
+    """Train a dictionary on the newest stored bodies and start using it.
+
+    Does nothing until there are ARTICLE_BODY_DICTIONARY_SAMPLES bodies to
+    learn from. Bodies already stored keep the dictionary they were
+    written with.
+    """
+    codec_name = configured_codec()
+    size = settings.ARTICLE_BODY_DICTIONARY_SIZE
+    if codec_name == ZLIB:
+        size = min(size, ZLIB_MAX_DICTIONARY)
+    with Session(engine) as session:
+        bodies = session.exec(
+            select(ArticleBody)
+            .order_by(ArticleBody.article_id.desc())
+            .limit(settings.ARTICLE_BODY_DICTIONARY_SAMPLES)
+        ).all()
+        if len(bodies) < settings.ARTICLE_BODY_DICTIONARY_SAMPLES:
+            return None
+        samples = [
+            decompress_body(body, get_body_dictionary(session, body)).encode("utf-8")
+            for body in bodies
+        ]
+        if codec_name == ZSTD:
+            import zstandard
+
+            data = zstandard.train_dictionary(size, samples).as_bytes()
+        else:
+            data = build_zlib_dictionary(samples, size)
+        dictionary = CompressionDictionary(codec=codec_name, data=data)
+        session.add(dictionary)
+        session.commit()
+        session.refresh(dictionary)
+    use_dictionary(dictionary)
+    logger.info(
+        f"Trained a {len(data)} byte {codec_name} dictionary on {len(samples)} article bodies"
+    )
+    return dictionary
+
+
+def ensure_dictionary(engine: Engine) -> bool:
+    """Train the first dictionary once enough bodies are stored, if enabled."""
+    if settings.ARTICLE_BODY_DICTIONARY_SIZE <= 0 or get_codec().dictionary is not None:
+        return False
+    # Another process may have trained one already
+    load_dictionary(engine)
+    if get_codec().dictionary is not None:
+        return False
+    return train_dictionary(engine) is not None
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from fastapi import Request, Response
+from pydantic import BaseModel
+from .core.config import settings
+from .metrics import (
+    RESPONSE_CACHE_BYTES,
+    RESPONSE_CACHE_ENTRIES,
+    RESPONSE_CACHE_HITS,
+    RESPONSE_CACHE_MISSES,
+)
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class ResponseCache:
+    """In-process LRU/TTL cache of serialized API responses.
+
+    Entries are invalidated as a whole by bumping the generation counter,
+    which ingest and the write endpoints do whenever data changes. A
+    response computed while the generation moved on is not stored, so a
+    slow request can't put stale data back after an invalidation.
+
+    Other worker processes write to the same database, so lookups also
+    sync the cache with the database's change sequence at most every
+    RESPONSE_CACHE_SYNC_SECONDS, and invalidate it when that moved.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.generation = 0
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Change sequence the entries were computed at, and when it was read
+        self.version: Optional[int] = None
+        self.synced_at = float("-inf")
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get a fresh entry and mark it as recently used."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                self._report_size()
+                entry = None
+            if entry is None:
+                self.misses += 1
+                RESPONSE_CACHE_MISSES.inc()
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            RESPONSE_CACHE_HITS.inc()
+            return entry
+
+    def put(self, key: str, body: bytes, generation: int) -> CacheEntry:
+        """Store a response body computed at the given generation."""
+        entry = CacheEntry(body, make_etag(body), time.monotonic() + self.ttl)
+        with self.lock:
+            if generation != self.generation or len(body) > self.max_bytes:
+                return entry
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size_bytes += len(key) + len(body)
+            while (
+                len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self.entries)))
+            self._report_size()
+        return entry
+
+    def sync_due(self) -> bool:
+        return time.monotonic() - self.synced_at >= settings.RESPONSE_CACHE_SYNC_SECONDS
+
+    def sync(self, version: int):
+        """Invalidate when the database's change sequence moved past the
+        one the entries were computed at."""
+        with self.lock:
+            self.synced_at = time.monotonic()
+            if self.version is not None and version <= self.version:
+                return
+            stale = self.version is not None
+            self.version = version
+        if stale:
+            self.invalidate()
+
+    def invalidate(self):
+        """Start a new generation, dropping every cached response."""
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.size_bytes = 0
+            self._report_size()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size_bytes": self.size_bytes,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.size_bytes -= len(key) + len(entry.body)
+
+    def _report_size(self):
+        RESPONSE_CACHE_ENTRIES.set(len(self.entries))
+        RESPONSE_CACHE_BYTES.set(self.size_bytes)
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact response bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def cache_key(route: str, params: BaseModel = None, **extra) -> str:
+    """Build a cache key from a route and its normalized query params."""
+    values = params.model_dump(mode="json") if params is not None else {}
+    values.update(extra)
+    return route + "?" + json.dumps(values, sort_keys=True, ensure_ascii=False)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cached_response(request: Request, entry: CacheEntry) -> Response:
+    """Answer from a cache entry, with 304 when the client's copy matches."""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,55 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Change feed for incremental sync. Every insert and update of an article
+# stamps it with the next value of a global sequence, and every delete
+# leaves a tombstone with its own sequence number, so "what changed since
+# N" is a range scan over two small indexes. Kept up to date by triggers,
+# like the search index, so no write path can forget to bump it. SQLite
+# runs one write transaction at a time, so sequence numbers become
+# visible in order. Feed writes advance the sequence too, without a
+# change entry, so it tells every worker process when any listing it has
+# cached went stale (see ResponseCache.sync).
+
+CHANGE_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS article_change_ai AFTER INSERT ON article BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE id = 1;
+        UPDATE article SET change_seq = (SELECT value FROM change_sequence WHERE id = 1)
+        WHERE id = new.id;
+        DELETE FROM article_tombstone WHERE article_id = new.id;
+    END""",
+    # Skips the trigger's own change_seq update
+    """CREATE TRIGGER IF NOT EXISTS article_change_au AFTER UPDATE ON article
+    WHEN new.change_seq = old.change_seq BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE id = 1;
+        UPDATE article SET change_seq = (SELECT value FROM change_sequence WHERE id = 1)
+        WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_change_ad AFTER DELETE ON article BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE id = 1;
+        INSERT OR REPLACE INTO article_tombstone (article_id, feed_id, change_seq, deleted_at)
+        VALUES (
+            old.id, old.feed_id,
+            (SELECT value FROM change_sequence WHERE id = 1),
+            strftime('%Y-%m-%d %H:%M:%f', 'now')
+        );
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feed_change_ai AFTER INSERT ON feed BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feed_change_au AFTER UPDATE ON feed BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feed_change_ad AFTER DELETE ON feed BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE id = 1;
+    END""",
+]
+
+
+class ChangesExpired(Exception):
+    """The tombstones a sync needs were purged; it has to start from 0."""
+
+
+def create_change_triggers(connection: Connection):
+    for statement in CHANGE_DDL:
+        connection.execute(text(statement))
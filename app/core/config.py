@@ -12,14 +12,107 @@ class Settings(BaseSettings):
     # Security
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    ADMIN_TOKEN: Optional[str] = None  # bearer token for /admin endpoints, which are off without one
     
     # Database
     SQLITE_DB_PATH: Path = Path("bitpulse.db")
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes, 0 disables mmap
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_READ_POOL_SIZE: int = 8
     
     # RSS Settings
-    RSS_UPDATE_INTERVAL_MINUTES: int = 30
+    RSS_UPDATE_INTERVAL_MINUTES: int = 30  # starting interval for new feeds
+    RSS_POLL_TICK_SECONDS: int = 60  # how often due feeds are dispatched
+    RSS_MIN_POLL_MINUTES: int = 5
+    RSS_MAX_POLL_MINUTES: int = 360
+    RSS_POLL_JITTER: float = 0.1  # +/- fraction of each interval
+    RSS_POLL_BACKOFF_FACTOR: float = 1.5  # growth when a feed had nothing new
+    RSS_CIRCUIT_BREAKER_FAILURES: int = 5
+    RSS_CIRCUIT_BREAKER_MINUTES: int = 720
     RSS_MAX_CONCURRENT_REQUESTS: int = 10
     RSS_REQUEST_TIMEOUT: int = 30
+    RSS_CONNECT_TIMEOUT: float = 10.0
+    RSS_READ_TIMEOUT: float = 20.0
+    RSS_MAX_CONCURRENT_REQUESTS_PER_HOST: int = 2
+    RSS_MAX_CONNECTIONS: int = 100
+    RSS_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    RSS_KEEPALIVE_EXPIRY: float = 60.0
+    RSS_HTTP2: bool = False  # requires the optional "h2" package
+    RSS_PARSE_EXECUTOR: str = "thread"  # "thread", "process" or "inline"
+    RSS_PARSE_WORKERS: int = 2
+    RSS_MAX_ENTRIES: int = 20  # latest entries kept per fetch
+    RSS_MAX_FEED_BYTES: int = 10 * 1024 * 1024  # larger responses are rejected
+    RSS_STREAMING_PARSER: bool = True  # stop reading once RSS_MAX_ENTRIES are parsed
+    
+    # Ingest pipeline
+    INGEST_QUEUE_SIZE: int = 16  # feeds waiting between two stages
+    INGEST_FETCH_WORKERS: int = 50  # above RSS_MAX_CONCURRENT_REQUESTS, so feeds queued for a busy host don't hold up others
+    INGEST_DEDUPE_WORKERS: int = 2  # threads looking up stored entries
+    INGEST_NORMALIZE_WORKERS: int = 2  # threads normalizing new entries
+    INGEST_WRITE_BATCH_SIZE: int = 500  # new articles per write transaction, at most
+    
+    # Worker coordination
+    SCHEDULER_LEASE_SECONDS: int = 90  # a leader that stops renewing is replaced after this
+    SCHEDULER_LEASE_RENEW_SECONDS: int = 20
+    SCHEDULER_PARTITION_FEEDS: bool = False  # every worker fetches, claiming feeds one by one
+    FEED_LEASE_SECONDS: int = 300  # time a worker has to fetch a feed it claimed
+    
+    # Job queue
+    JOB_POLL_SECONDS: float = 5.0  # how often each worker looks for queued jobs
+    JOB_BATCH_SIZE: int = 50  # jobs claimed and run together
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_SECONDS: int = 60  # delay before the first retry, doubled for each one after
+    JOB_TIMEOUT_SECONDS: int = 300  # a job running longer is assumed lost and run again
+    JOB_RETENTION_HOURS: int = 24  # finished jobs are kept this long
+    
+    # Housekeeping
+    HOUSEKEEPING_INTERVAL_MINUTES: int = 60
+    ARTICLE_NEW_HOURS: int = 24  # articles stop being "new" after this
+    ARTICLE_RETENTION_DAYS: int = 20  # 0 keeps articles forever; feeds can override
+    HOUSEKEEPING_DELETE_BATCH_SIZE: int = 500  # rows per delete transaction
+    HOUSEKEEPING_VACUUM_PAGES: int = 0  # pages released per run, 0 for all free pages
+    
+    # Content normalization
+    ARTICLE_EXCERPT_LENGTH: int = 280  # characters
+    READING_WORDS_PER_MINUTE: int = 200
+    
+    # Article bodies
+    ARTICLE_BODY_CODEC: str = "zlib"  # or "zstd", which requires the optional "zstandard" package
+    ARTICLE_BODY_COMPRESSION_LEVEL: int = 6
+    ARTICLE_BODY_DICTIONARY_SIZE: int = 0  # bytes, 0 disables; zlib uses at most 32 KiB
+    ARTICLE_BODY_DICTIONARY_SAMPLES: int = 1000  # stored bodies needed to train one
+    
+    # Near-duplicate stories
+    NEAR_DUPLICATE_SIMILARITY: float = 0.5  # estimated Jaccard similarity of word bigrams
+    NEAR_DUPLICATE_WINDOW_HOURS: int = 72  # copies are published this close together
+    NEAR_DUPLICATE_MIN_WORDS: int = 20  # shorter texts get no fingerprint
+    
+    # Change feed
+    ARTICLE_TOMBSTONE_DAYS: int = 30  # syncs older than this start over
+    CHANGES_STREAM_POLL_SECONDS: float = 1.0
+    CHANGES_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Response cache
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 60.0
+    RESPONSE_CACHE_SYNC_SECONDS: float = 1.0  # how long other workers' writes can go unseen, 0 checks every request
+    
+    # WebSocket updates
+    WS_SEND_QUEUE_SIZE: int = 16  # pending messages before a client is evicted
+    WS_SEND_TIMEOUT: float = 5.0
+    WS_MAX_ARTICLES_PER_MESSAGE: int = 50
+    
+    # Metrics and tracing
+    TRACING_ENABLED: bool = False  # requires the optional "opentelemetry-api" package
+    
+    # Profiling
+    PROFILE_MAX_SECONDS: int = 300
+    PROFILE_SAMPLE_INTERVAL_MS: float = 10.0
+    PROFILE_MEMORY_FRAMES: int = 25  # stack depth recorded per allocation
     
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = [
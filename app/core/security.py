@@ -0,0 +1,26 @@
+import secrets
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from .config import settings
+
+bearer = HTTPBearer(auto_error=False)
+
+
+def require_admin(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+):
+    """Allow only requests bearing ADMIN_TOKEN.
+
+    Without a token configured the admin endpoints don't exist.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Admin token required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -1,8 +1,17 @@
-from typing import List, Optional, Tuple
+import base64
+import json
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from sqlmodel import Session, select, or_, and_
+from sqlalchemy import delete, false, func, true, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import load_only
 from datetime import datetime, timedelta
-from .models import Feed, Article
-from .schemas import ArticleQueryParams
+from .models import Feed, Article, ArticleBody, ArticleTombstone, ChangeSequence
+from .schemas import ArticleQueryParams, ArticleSummary
+from .normalize import normalize_article
+from .bodies import get_content, set_content
+from .changes import ChangesExpired
+from .search import article_fts, build_match_query, match_clause, rank
 
 def create_feed(session: Session, feed: Feed) -> Feed:
     """Create a new feed."""
@@ -37,7 +46,7 @@ def update_feed(session: Session, feed_id: int, feed_data: dict) -> Optional[Fee
     return feed
 
 def delete_feed(session: Session, feed_id: int) -> bool:
-    """Delete a feed."""
+    """Delete a feed. Housekeeping purges its articles afterwards."""
     feed = get_feed(session, feed_id)
     if feed:
         session.delete(feed)
@@ -61,56 +70,400 @@ def get_article_by_link(session: Session, link: str) -> Optional[Article]:
     statement = select(Article).where(Article.link == link)
     return session.exec(statement).first()
 
-def get_articles(
+def article_key(title: str, published_at: datetime) -> Tuple[str, datetime]:
+    """Build the (title, published_at) dedupe key as SQLite stores it."""
+    # SQLite keeps datetimes without their offset, so compare naive values
+    return title, published_at.replace(tzinfo=None)
+
+def get_existing_article_keys(
     session: Session,
-    params: ArticleQueryParams
-) -> Tuple[List[Article], int]:
-    """Get articles with filtering and pagination."""
-    # Build base query
-    statement = select(Article)
-    
-    # Apply filters
+    links: Iterable[str],
+    title_dates: Iterable[Tuple[str, datetime]]
+) -> Tuple[Set[str], Set[Tuple[str, datetime]]]:
+    """Find which links and (title, published_at) pairs are already stored.
+
+    Links are matched against both the stored and the canonical link, so a
+    story reposted with different tracking parameters is found too. Does a
+    single lookup for a whole batch instead of one query per entry.
+    """
+    links = list(links)
+    title_dates = list(title_dates)
+    if not links and not title_dates:
+        return set(), set()
+
+    # Matching the pair as separate IN lists lets each side of the OR use
+    # an index (link, published_at); exact pairs are checked by the caller.
+    statement = select(
+        Article.link, Article.canonical_link, Article.title, Article.published_at
+    ).where(
+        or_(
+            Article.link.in_(links),
+            Article.canonical_link.in_(links),
+            and_(
+                Article.published_at.in_({published_at for _, published_at in title_dates}),
+                Article.title.in_({title for title, _ in title_dates})
+            )
+        )
+    )
+    existing_links = set()
+    existing_title_dates = set()
+    for link, canonical_link, title, published_at in session.exec(statement):
+        existing_links.add(link)
+        if canonical_link:
+            existing_links.add(canonical_link)
+        existing_title_dates.add(article_key(title, published_at))
+    return existing_links, existing_title_dates
+
+def bulk_insert_articles(session: Session, articles: List[Article]) -> List[Article]:
+    """Insert articles in one statement, skipping links that already exist.
+
+    Relies on the unique index on Article.link, so rows added concurrently
+    by another writer are ignored rather than raising. Compressed bodies
+    attached as article.body are stored with their articles. Returns the
+    articles that were actually inserted, with their ids set. Does not
+    commit.
+    """
+    if not articles:
+        return []
+
+    statement = (
+        sqlite_insert(Article)
+        .values([article.model_dump(exclude={"id"}) for article in articles])
+        .on_conflict_do_nothing(index_elements=["link"])
+        .returning(Article.id, Article.link)
+    )
+    inserted_ids = {link: article_id for article_id, link in session.execute(statement)}
+
+    inserted = []
+    bodies = []
+    for article in articles:
+        if article.link in inserted_ids:
+            article.id = inserted_ids[article.link]
+            inserted.append(article)
+            if article.body is not None:
+                bodies.append({**article.body.model_dump(exclude={"article_id"}), "article_id": article.id})
+    if bodies:
+        session.execute(sqlite_insert(ArticleBody), bodies)
+    return inserted
+
+def encode_cursor(position: dict) -> str:
+    """Encode a pagination position as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor made by encode_cursor; raises ValueError if invalid."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+def _cursor_value(position: dict, key: str, convert):
+    """Read and convert one field of a decoded cursor."""
+    try:
+        return convert(position[key])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def _cursor_int(value) -> int:
+    """Convert a cursor id or offset, which must fit an SQLite INTEGER."""
+    number = int(value)
+    if not 0 <= number < 2**63:
+        raise ValueError("Out of range")
+    return number
+
+def apply_article_filters(statement, params: ArticleQueryParams):
+    """Apply the ArticleQueryParams filters to a statement over Article."""
     if params.feed_id:
         statement = statement.where(Article.feed_id == params.feed_id)
-    
+
     if params.search:
-        search_term = f"%{params.search}%"
-        statement = statement.where(
-            or_(
-                Article.title.ilike(search_term),
-                Article.description.ilike(search_term),
-                Article.content.ilike(search_term)
-            )
-        )
-    
+        if build_match_query(params.search):
+            statement = statement.join(
+                article_fts, article_fts.c.rowid == Article.id
+            ).where(match_clause(params.search))
+        else:
+            # No words to look for, e.g. only punctuation, so nothing matches
+            statement = statement.where(false())
+
     if params.start_date:
         statement = statement.where(Article.published_at >= params.start_date)
-    
+
     if params.end_date:
         statement = statement.where(Article.published_at <= params.end_date)
-    
+
     if params.is_new is not None:
-        statement = statement.where(Article.is_new == params.is_new)
-    
-    # Get total count
-    count_statement = select(Article).where(statement.whereclause)
-    total = len(session.exec(count_statement).all())
-    
-    # Apply pagination
-    statement = statement.offset((params.page - 1) * params.size).limit(params.size)
-    
-    # Order by published_at descending
-    statement = statement.order_by(Article.published_at.desc())
-    
-    return session.exec(statement).all(), total
+        # Compare against a literal so the partial index on is_new applies
+        statement = statement.where(Article.is_new == (true() if params.is_new else false()))
+
+    if params.collapse_duplicates:
+        statement = statement.where(Article.story_id.is_(None))
+
+    return statement
+
+def is_search(params: ArticleQueryParams) -> bool:
+    """Check whether the params ask for a full-text search."""
+    return bool(params.search and build_match_query(params.search))
+
+def count_articles_statement(params: ArticleQueryParams):
+    """Build a single COUNT(*) over the articles matching the filters."""
+    statement = select(func.count()).select_from(Article).join(Feed, Article.feed_id == Feed.id)
+    return apply_article_filters(statement, params)
+
+def count_articles(session: Session, params: ArticleQueryParams) -> int:
+    """Count the articles matching the filters."""
+    return session.exec(count_articles_statement(params)).one()
+
+# Fields an article listing can return, in response order
+ARTICLE_FIELDS = tuple(ArticleSummary.model_fields)
+# Listings leave out the full text unless asked for
+DEFAULT_ARTICLE_FIELDS = tuple(field for field in ARTICLE_FIELDS if field != "content_text")
+# Columns every listing needs for joining and building cursors
+REQUIRED_ARTICLE_COLUMNS = ("id", "feed_id", "published_at")
+
+def article_fields(params: ArticleQueryParams) -> Tuple[str, ...]:
+    """Get the item fields a listing should return from ?fields=."""
+    return parse_article_fields(params.fields)
+
+def parse_article_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Parse a comma-separated ?fields= value."""
+    if not fields:
+        return DEFAULT_ARTICLE_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(ARTICLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The id is always returned
+    return tuple(field for field in ARTICLE_FIELDS if field in requested or field == "id")
+
+def article_load_options(fields: Iterable[str]) -> list:
+    """Load only the columns a listing returns, leaving the rest deferred."""
+    columns = set(REQUIRED_ARTICLE_COLUMNS).union(fields).intersection(Article.__table__.columns.keys())
+    return [
+        load_only(*(getattr(Article, column) for column in sorted(columns))),
+        load_only(Feed.id, Feed.title),
+    ]
+
+def article_summaries(
+    rows: List[Tuple[Article, Feed]],
+    fields: Iterable[str],
+    snippets: Optional[Dict[int, str]] = None,
+    duplicates: Optional[Dict[int, int]] = None
+) -> List[dict]:
+    """Build listing items holding only the requested fields.
+
+    Plain dicts instead of ArticleSummary models, so a page is serialized
+    without validating every row, and deferred columns are never touched.
+    """
+    fields = tuple(fields)
+    items = []
+    for article, feed in rows:
+        item = {}
+        for field in fields:
+            if field == "feed":
+                item["feed"] = {"id": feed.id, "title": feed.title}
+            elif field == "snippet":
+                item["snippet"] = (snippets or {}).get(article.id)
+            elif field == "duplicates":
+                item["duplicates"] = duplicates.get(article.id, 0) if duplicates is not None else None
+            else:
+                item[field] = getattr(article, field)
+        items.append(item)
+    return items
+
+def duplicate_counts_statement(story_ids: Iterable[int]):
+    """Build the query for how many copies each story has."""
+    return (
+        select(Article.story_id, func.count())
+        .where(Article.story_id.in_(list(story_ids)))
+        .group_by(Article.story_id)
+    )
+
+def get_duplicate_counts(session: Session, story_ids: Iterable[int]) -> Dict[int, int]:
+    """Get how many copies each story has."""
+    return dict(session.exec(duplicate_counts_statement(story_ids)).all())
+
+def articles_page_statement(params: ArticleQueryParams):
+    """Build the query for one page of (article, feed) rows.
+
+    Listings are paged by keyset on (published_at, id) so deep pages cost
+    the same as the first; search results, ordered by relevance, are paged
+    by offset. One extra row is fetched to tell whether a next page exists,
+    and only the columns behind the requested ?fields= are loaded.
+    Returns the statement and the offset it starts at.
+    """
+    statement = (
+        select(Article, Feed)
+        .join(Feed, Article.feed_id == Feed.id)
+        .options(*article_load_options(article_fields(params)))
+    )
+    statement = apply_article_filters(statement, params)
+
+    position = decode_cursor(params.cursor) if params.cursor else None
+    offset = 0
+    if is_search(params):
+        # Order by relevance
+        offset = (params.page - 1) * params.size
+        if position:
+            offset = _cursor_value(position, "offset", _cursor_int)
+        statement = statement.order_by(rank(), Article.id).offset(offset)
+    else:
+        # Order by published_at descending, newest first
+        if position:
+            published_at = _cursor_value(position, "published_at", datetime.fromisoformat)
+            article_id = _cursor_value(position, "id", _cursor_int)
+            statement = statement.where(
+                tuple_(Article.published_at, Article.id) < tuple_(published_at, article_id)
+            )
+        else:
+            statement = statement.offset((params.page - 1) * params.size)
+        statement = statement.order_by(Article.published_at.desc(), Article.id.desc())
+
+    return statement.limit(params.size + 1), offset
+
+def paginate_articles(
+    rows: list,
+    params: ArticleQueryParams,
+    offset: int
+) -> Tuple[list, Optional[str]]:
+    """Trim the extra row off a page and build the next page's cursor."""
+    if len(rows) <= params.size:
+        return rows, None
+
+    rows = rows[:params.size]
+    if is_search(params):
+        return rows, encode_cursor({"offset": offset + params.size})
+    last = rows[-1][0]
+    return rows, encode_cursor({
+        "published_at": last.published_at.isoformat(),
+        "id": last.id
+    })
+
+def get_articles(
+    session: Session,
+    params: ArticleQueryParams
+) -> Tuple[List[Tuple[Article, Feed]], Optional[int], Optional[str]]:
+    """Get articles with their feeds, filtering and pagination.
+
+    Returns the page of (article, feed) rows, the total count (None unless
+    params.include_total is set) and the cursor of the next page, if any.
+    """
+    statement, offset = articles_page_statement(params)
+    rows, next_cursor = paginate_articles(session.exec(statement).all(), params, offset)
+    total = count_articles(session, params) if params.include_total else None
+    return rows, total, next_cursor
+
+def article_changes_statement(since: int, limit: int, fields: Iterable[str]):
+    """Build the query for articles changed after a sequence number.
+
+    Fetches one extra row to tell whether there are more changes.
+    """
+    return (
+        select(Article, Feed)
+        .join(Feed, Article.feed_id == Feed.id)
+        .options(*article_load_options(("change_seq", *fields)))
+        .where(Article.change_seq > since)
+        .order_by(Article.change_seq)
+        .limit(limit + 1)
+    )
+
+def tombstones_statement(since: int, limit: int):
+    """Build the query for articles deleted after a sequence number."""
+    return (
+        select(ArticleTombstone)
+        .where(ArticleTombstone.change_seq > since)
+        .order_by(ArticleTombstone.change_seq)
+        .limit(limit + 1)
+    )
+
+def pruned_through_statement():
+    return select(ChangeSequence.pruned_through).where(ChangeSequence.id == 1)
+
+def check_changes_available(since: int, pruned_through: Optional[int]):
+    """Raise ChangesExpired if deletions after since were already purged."""
+    if since > 0 and pruned_through and since < pruned_through:
+        raise ChangesExpired(
+            f"Changes before {pruned_through} are no longer available, sync again from 0"
+        )
+
+def article_changes(
+    rows: List[Tuple[Article, Feed]],
+    tombstones: List[ArticleTombstone],
+    fields: Iterable[str],
+    since: int,
+    limit: int
+) -> dict:
+    """Merge changed articles and tombstones into one page in sequence order.
+
+    Returns the ArticleChanges body: the changes, the sequence number to
+    pass as ?since= next time and whether more changes are waiting.
+    """
+    summaries = article_summaries(rows, fields)
+    changes = [
+        {
+            "seq": article.change_seq,
+            "id": article.id,
+            "feed_id": article.feed_id,
+            "deleted": False,
+            "article": summary,
+        }
+        for (article, _), summary in zip(rows, summaries)
+    ]
+    changes.extend(
+        {
+            "seq": tombstone.change_seq,
+            "id": tombstone.article_id,
+            "feed_id": tombstone.feed_id,
+            "deleted": True,
+            "article": None,
+        }
+        for tombstone in tombstones
+    )
+    changes.sort(key=lambda change: change["seq"])
+    page = changes[:limit]
+    return {
+        "changes": page,
+        "next_since": page[-1]["seq"] if page else since,
+        "has_more": len(changes) > limit,
+    }
+
+def get_article_changes(session: Session, since: int, limit: int, fields: Iterable[str]) -> dict:
+    """Get the articles changed or deleted after a sequence number.
+
+    Raises ChangesExpired when since is older than the purged tombstones.
+    """
+    fields = tuple(fields)
+    check_changes_available(since, session.exec(pruned_through_statement()).first())
+    rows = session.exec(article_changes_statement(since, limit, fields)).all()
+    tombstones = session.exec(tombstones_statement(since, limit)).all()
+    return article_changes(rows, tombstones, fields, since, limit)
 
 def update_article(session: Session, article_id: int, article_data: dict) -> Optional[Article]:
     """Update an article."""
     article = get_article(session, article_id)
     if article:
+        article_data = dict(article_data)
+        content_changed = "content" in article_data
+        content = article_data.pop("content", None)
+        renormalize = content_changed or {"title", "description"}.intersection(article_data)
+        if renormalize and not content_changed:
+            content = get_content(session, article_id)
         for key, value in article_data.items():
             setattr(article, key, value)
+        if renormalize:
+            # Keep the derived text columns and the body in step with the edit
+            normalized = normalize_article(
+                article.title, article.link, article.description, content
+            )
+            content = normalized.pop("content")
+            for key, value in normalized.items():
+                setattr(article, key, value)
         article.updated_at = datetime.utcnow()
+        if renormalize:
+            # After all the column changes, so they flush as one UPDATE
+            set_content(session, article_id, content)
         session.add(article)
         session.commit()
         session.refresh(article)
@@ -119,15 +472,45 @@ def update_article(session: Session, article_id: int, article_data: dict) -> Opt
 def mark_old_articles(session: Session, hours: int = 24) -> int:
     """Mark articles older than specified hours as not new."""
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-    statement = select(Article).where(
-        and_(
-            Article.is_new == True,
-            Article.published_at < cutoff_time
-        )
+    # One UPDATE over the partial "is_new = 1" index instead of loading rows
+    statement = (
+        update(Article)
+        .where(Article.is_new == True, Article.published_at < cutoff_time)
+        .values(is_new=False)
+    )
+    result = session.execute(statement)
+    session.commit()
+    return result.rowcount
+
+def delete_old_articles(session: Session, feed_id: int, cutoff: datetime, limit: int) -> int:
+    """Delete up to limit of a feed's articles published before cutoff."""
+    # Pick the batch by (feed_id, published_at) so the range is an index seek
+    batch = (
+        select(Article.id)
+        .where(Article.feed_id == feed_id, Article.published_at < cutoff)
+        .limit(limit)
+    )
+    result = session.execute(delete(Article).where(Article.id.in_(batch)))
+    session.commit()
+    return result.rowcount
+
+def get_deleted_feed_ids(session: Session) -> List[int]:
+    """Get the feed IDs articles still carry after their feed was deleted."""
+    statement = select(Article.feed_id).distinct().where(Article.feed_id.not_in(select(Feed.id)))
+    return list(session.exec(statement).all())
+
+def delete_old_tombstones(session: Session, cutoff: datetime) -> int:
+    """Delete tombstones older than cutoff and remember where they ended."""
+    last_seq = session.exec(
+        select(func.max(ArticleTombstone.change_seq)).where(ArticleTombstone.deleted_at < cutoff)
+    ).one()
+    if last_seq is None:
+        return 0
+    result = session.execute(delete(ArticleTombstone).where(ArticleTombstone.change_seq <= last_seq))
+    session.execute(
+        update(ChangeSequence)
+        .where(ChangeSequence.id == 1)
+        .values(pruned_through=func.max(ChangeSequence.pruned_through, last_seq))
     )
-    articles = session.exec(statement).all()
-    for article in articles:
-        article.is_new = False
-        session.add(article)
     session.commit()
-    return len(articles) 
\ No newline at end of file
+    return result.rowcount
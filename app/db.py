@@ -1,26 +1,161 @@
+import os
+from contextlib import contextmanager
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 from .core.config import settings
+from .migrations import migrate
+from .bodies import load_dictionary
+from .metrics import instrument_engine
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Create SQLite database engine
-engine = create_engine(
-    f"sqlite:///{settings.SQLITE_DB_PATH}",
-    echo=False,
-    connect_args={"check_same_thread": False}
-)
+def sqlite_url(driver: str = "sqlite", read_only: bool = False) -> str:
+    """Build the database URL; read-only URLs open the file with mode=ro."""
+    if read_only:
+        return f"{driver}:///file:{settings.SQLITE_DB_PATH.as_posix()}?mode=ro&uri=true"
+    return f"{driver}:///{settings.SQLITE_DB_PATH}"
+
+def set_sqlite_pragmas(dbapi_connection, read_only: bool):
+    """Apply the tuned connection profile to a new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    if not read_only:
+        # Persistent for the database file, so only the writer sets it
+        cursor.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    else:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+def create_sqlite_engine(read_only: bool = False):
+    """Create an engine with the tuned SQLite connection profile.
+
+    The writer engine holds a single connection so all writes are
+    serialized in-process instead of fighting over the database lock.
+    Read-only engines pool several connections, which in WAL mode keep
+    reading while the writer commits.
+    """
+    sqlite_engine = create_engine(
+        sqlite_url(read_only=read_only),
+        echo=False,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.SQLITE_READ_POOL_SIZE if read_only else 1,
+        max_overflow=0
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, read_only)
+
+    instrument_engine(sqlite_engine)
+    return sqlite_engine
+
+def create_async_read_engine():
+    """Create a read-only aiosqlite engine for the async API endpoints."""
+    async_engine = create_async_engine(
+        sqlite_url("sqlite+aiosqlite", read_only=True),
+        echo=False,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0
+    )
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, read_only=True)
+
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+# Create SQLite database engines: one writer, a pool of readers
+engine = create_sqlite_engine()
+read_engine = create_sqlite_engine(read_only=True)
+async_read_engine = create_async_read_engine()
+# Leases get their own writer connection, so taking one never waits for
+# the main one, which the scheduler's own session may be holding
+lease_engine = create_sqlite_engine()
+
+def enable_incremental_vacuum(sqlite_engine):
+    """Switch the database to incremental auto-vacuum so housekeeping can
+    shrink the file after deleting articles.
+
+    Existing databases need a one-off VACUUM for the mode to take effect.
+    """
+    with sqlite_engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return
+        logger.info("Enabling incremental auto-vacuum, rebuilding the database file")
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+@contextmanager
+def init_lock():
+    """Hold an exclusive lock on a file next to the database.
+
+    Every worker process initializes the database when it starts. pysqlite
+    sends no BEGIN before DDL, so SQLite's own locking doesn't keep them
+    from creating the same table twice; the workers take turns instead,
+    and the ones after the first find the database up to date.
+    """
+    path = settings.SQLITE_DB_PATH.with_name(f"{settings.SQLITE_DB_PATH.name}.lock")
+    with open(path, "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ten seconds, keep waiting
+                    pass
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 def init_db():
-    """Initialize the database by creating all tables."""
+    """Initialize the database by creating all tables and migrating them.
+
+    Safe to run from several processes at once, see init_lock.
+    """
     try:
-        SQLModel.metadata.create_all(engine)
+        with init_lock():
+            SQLModel.metadata.create_all(engine)
+            migrate(engine)
+            enable_incremental_vacuum(engine)
+            load_dictionary(engine)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise
 
 def get_session():
-    """Get a database session."""
+    """Get a database session for writes."""
     with Session(engine) as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+def get_read_session():
+    """Get a read-only database session."""
+    with Session(read_engine) as session:
+        yield session
+
+async def get_async_read_session():
+    """Get a read-only async database session."""
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
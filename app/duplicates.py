@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from sqlalchemy import bindparam, column, select, table, text
+from sqlalchemy.engine import Connection
+from .core.config import settings
+from .models import Article
+
+# Near-duplicate detection for syndicated stories.
+#
+# Each article gets a MinHash signature of the word bigrams in its title
+# and text: BINS 16-bit slots, where two signatures agree on a slot with
+# probability equal to the Jaccard similarity of their bigram sets. It is
+# computed with one-permutation hashing, one hash per bigram instead of
+# one per slot, which keeps it cheap in pure Python.
+#
+# The signature is cut into BANDS bands. Articles sharing any band are
+# candidates, found through an index over the band bytes, so a lookup
+# costs a few index seeks however many articles are stored. Candidates
+# are then confirmed by the share of slots that agree. Bands of four
+# slots make articles with a Jaccard similarity of 0.7 candidates about
+# 90% of the time, and unrelated articles almost never.
+
+BINS = 32
+BANDS = 8
+BAND_BYTES = BINS * 2 // BANDS
+# Spreads the value copied into an empty slot, see minhash_signature
+GOLDEN = 0x9E3779B97F4A7C15
+
+minhash_band = table(
+    "article_minhash_band",
+    column("band_key"),
+    column("article_id"),
+)
+
+_band_rows = " UNION ALL ".join(
+    f"SELECT substr(new.minhash, {band * BAND_BYTES + 1}, {BAND_BYTES}) AS band_key"
+    for band in range(BANDS)
+)
+_old_band_keys = ", ".join(
+    f"substr(old.minhash, {band * BAND_BYTES + 1}, {BAND_BYTES})"
+    for band in range(BANDS)
+)
+
+# The band index is a table of (band bytes, article id), kept in sync with
+# article.minhash by triggers. Band keys are slices of the signature, so
+# SQLite can derive them itself.
+DUPLICATES_DDL = [
+    """CREATE TABLE IF NOT EXISTS article_minhash_band (
+        band_key BLOB NOT NULL,
+        article_id INTEGER NOT NULL,
+        PRIMARY KEY (band_key, article_id)
+    ) WITHOUT ROWID""",
+    f"""CREATE TRIGGER IF NOT EXISTS article_minhash_ai
+    AFTER INSERT ON article WHEN new.minhash IS NOT NULL BEGIN
+        INSERT OR IGNORE INTO article_minhash_band (band_key, article_id)
+        SELECT band_key, new.id FROM ({_band_rows});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS article_minhash_ad
+    AFTER DELETE ON article WHEN old.minhash IS NOT NULL BEGIN
+        DELETE FROM article_minhash_band
+        WHERE band_key IN ({_old_band_keys}) AND article_id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS article_minhash_au AFTER UPDATE OF minhash ON article BEGIN
+        DELETE FROM article_minhash_band
+        WHERE old.minhash IS NOT NULL AND band_key IN ({_old_band_keys}) AND article_id = old.id;
+        INSERT OR IGNORE INTO article_minhash_band (band_key, article_id)
+        SELECT band_key, new.id FROM ({_band_rows})
+        WHERE new.minhash IS NOT NULL;
+    END""",
+    # A story is led by its first article (story_id NULL), the copies point
+    # at it. When the lead is deleted the oldest copy takes over.
+    """CREATE TRIGGER IF NOT EXISTS article_story_ad
+    AFTER DELETE ON article WHEN old.story_id IS NULL BEGIN
+        UPDATE article SET story_id = (SELECT min(id) FROM article WHERE story_id = old.id)
+        WHERE story_id = old.id AND id != (SELECT min(id) FROM article WHERE story_id = old.id);
+        UPDATE article SET story_id = NULL
+        WHERE id = (SELECT min(id) FROM article WHERE story_id = old.id);
+    END""",
+]
+
+
+class Fingerprint(NamedTuple):
+    id: Optional[int]  # None for articles not stored yet
+    minhash: Optional[bytes]
+    published_at: datetime
+
+
+def minhash_signature(words: Sequence[str]) -> Optional[bytes]:
+    """Get the MinHash signature of a text's word bigrams.
+
+    Returns None for texts too short to compare reliably.
+    """
+    if len(words) < settings.NEAR_DUPLICATE_MIN_WORDS:
+        return None
+    shingles = {f"{first} {second}" for first, second in zip(words, words[1:])}
+    minima: List[Optional[int]] = [None] * BINS
+    for shingle in shingles:
+        value = int.from_bytes(
+            blake2b(shingle.encode(), digest_size=8).digest(), "little"
+        )
+        slot = value % BINS
+        value //= BINS
+        if minima[slot] is None or value < minima[slot]:
+            minima[slot] = value
+    signature = bytearray()
+    for slot in range(BINS):
+        # An empty slot borrows from the next filled one, offset by the
+        # distance, so it still agrees exactly when the texts agree
+        distance = 0
+        while minima[(slot + distance) % BINS] is None:
+            distance += 1
+        value = minima[(slot + distance) % BINS] + distance * GOLDEN
+        signature += (value & 0xFFFF).to_bytes(2, "little")
+    return bytes(signature)
+
+
+def band_keys(signature: bytes) -> List[bytes]:
+    return [
+        signature[start : start + BAND_BYTES]
+        for start in range(0, len(signature), BAND_BYTES)
+    ]
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    slots = zip(memoryview(first).cast("H"), memoryview(second).cast("H"))
+    return sum(a == b for a, b in slots) / BINS
+
+
+def naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None)
+
+
+def find_stories(
+    connection: Connection, articles: Sequence[Fingerprint]
+) -> List[Optional[int]]:
+    """Find the story each article is a near-duplicate of.
+
+    Looks up every article's bands in one query, then keeps the most
+    similar candidate published within NEAR_DUPLICATE_WINDOW_HOURS and at
+    least NEAR_DUPLICATE_SIMILARITY alike. Articles with an id only match
+    older articles, and ones earlier in the list are taken into account,
+    so stored articles can be clustered in id order. Returns the story id
+    for each article, None when it starts a story of its own.
+    """
+    keys = {
+        key
+        for article in articles
+        if article.minhash
+        for key in band_keys(article.minhash)
+    }
+    if not keys:
+        return [None] * len(articles)
+
+    statement = (
+        select(
+            minhash_band.c.band_key,
+            Article.id,
+            Article.story_id,
+            Article.minhash,
+            Article.published_at,
+        )
+        .join(Article, Article.id == minhash_band.c.article_id)
+        .where(minhash_band.c.band_key.in_(bindparam("keys", expanding=True)))
+    )
+    by_key: Dict[bytes, list] = {}
+    for key, *candidate in connection.execute(statement, {"keys": list(keys)}):
+        by_key.setdefault(key, []).append(candidate)
+
+    window = timedelta(hours=settings.NEAR_DUPLICATE_WINDOW_HOURS)
+    assigned: Dict[int, Optional[int]] = {}
+    stories = []
+    for article in articles:
+        best = None
+        best_similarity = settings.NEAR_DUPLICATE_SIMILARITY
+        if article.minhash:
+            for key in band_keys(article.minhash):
+                for candidate_id, story_id, minhash, published_at in by_key.get(
+                    key, ()
+                ):
+                    if article.id is not None and candidate_id >= article.id:
+                        continue
+                    if abs(naive(published_at) - naive(article.published_at)) > window:
+                        continue
+                    score = similarity(article.minhash, minhash)
+                    if score > best_similarity or (
+                        score == best_similarity and best is None
+                    ):
+                        best, best_similarity = (candidate_id, story_id), score
+        story = None
+        if best is not None:
+            candidate_id, story_id = best
+            story = assigned.get(candidate_id, story_id) or candidate_id
+        if article.id is not None:
+            assigned[article.id] = story
+        stories.append(story)
+    return stories
+
+
+def assign_stories(connection: Connection, articles: Sequence[Article]):
+    """Set story_id on new articles that copy a stored one. Does not commit."""
+    fingerprints = [
+        Fingerprint(None, article.minhash, article.published_at) for article in articles
+    ]
+    for article, story_id in zip(articles, find_stories(connection, fingerprints)):
+        article.story_id = story_id
+
+
+def create_duplicate_index(connection: Connection):
+    for statement in DUPLICATES_DDL:
+        connection.execute(text(statement))
+
+
+def rebuild_duplicate_index(connection: Connection):
+    """Rebuild the band index from article.minhash."""
+    bands = " UNION ALL ".join(f"SELECT {band} AS band" for band in range(BANDS))
+    connection.execute(text("DELETE FROM article_minhash_band"))
+    connection.execute(
+        text(
+            "INSERT INTO article_minhash_band (band_key, article_id) "
+            f"SELECT substr(minhash, 1 + band * {BAND_BYTES}, {BAND_BYTES}), id "
+            f"FROM article, ({bands}) WHERE minhash IS NOT NULL"
+        )
+    )
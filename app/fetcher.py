@@ -0,0 +1,89 @@
+import asyncio
+import time
+import httpx
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+import logging
+from .core.config import settings
+from .metrics import observe_feed_stage
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseTooLarge(Exception):
+    """The response body is larger than RSS_MAX_FEED_BYTES."""
+
+
+def http2_available() -> bool:
+    """Check whether the optional HTTP/2 dependency is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class FeedClient:
+    """Long-lived, pooled HTTP client shared by all feed fetches.
+
+    Connections are kept alive between refresh cycles, so feeds hosted on
+    the same server reuse one TCP/TLS session. Concurrency is capped both
+    globally (RSS_MAX_CONCURRENT_REQUESTS) and per host.
+    """
+
+    def __init__(self):
+        http2 = settings.RSS_HTTP2
+        if http2 and not http2_available():
+            logger.warning(
+                "RSS_HTTP2 is enabled but 'h2' is not installed, falling back to HTTP/1.1"
+            )
+            http2 = False
+
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(
+                settings.RSS_REQUEST_TIMEOUT,
+                connect=settings.RSS_CONNECT_TIMEOUT,
+                read=settings.RSS_READ_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.RSS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.RSS_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.RSS_KEEPALIVE_EXPIRY,
+            ),
+            headers={"User-Agent": f"{settings.PROJECT_NAME}/{settings.VERSION}"},
+        )
+        self.semaphore = asyncio.Semaphore(settings.RSS_MAX_CONCURRENT_REQUESTS)
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Get the concurrency limiter for the host of a URL."""
+        host = httpx.URL(url).host
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.RSS_MAX_CONCURRENT_REQUESTS_PER_HOST)
+            self.host_semaphores[host] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def stream(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[httpx.Response]:
+        """Open a streamed GET within the global and per-host limits.
+
+        The body is not read; the slots are held until the block exits,
+        which closes the response even if it wasn't read to the end.
+        """
+        started = time.perf_counter()
+        # Take the host slot first so requests queued for a busy host
+        # don't hold global slots that other hosts could be using.
+        async with self.host_semaphore(url):
+            async with self.semaphore:
+                started = observe_feed_stage("queue", started)
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    observe_feed_stage("request", started)
+                    yield response
+
+    async def aclose(self):
+        """Close all pooled connections."""
+        await self.client.aclose()
@@ -0,0 +1,113 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Tuple
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+from .core.config import settings
+from .bodies import ensure_dictionary
+from .crud import (
+    delete_old_articles,
+    delete_old_tombstones,
+    get_deleted_feed_ids,
+    mark_old_articles,
+)
+from .jobs import delete_old_jobs
+from .models import Feed
+
+logger = logging.getLogger(__name__)
+
+
+class HousekeepingReport(NamedTuple):
+    expired: int  # articles no longer marked as new
+    deleted: int  # articles purged by the retention policy or with their feed
+    tombstones: int  # deletion records dropped from the change feed
+    jobs: int  # finished queued jobs dropped
+    freed_pages: int  # pages returned to the filesystem
+    seconds: float
+
+    @property
+    def changed(self) -> bool:
+        return self.expired > 0 or self.deleted > 0
+
+
+def retention_cutoffs(feeds: List[Feed], now: datetime) -> List[Tuple[int, datetime]]:
+    """Get the (feed_id, cutoff) pairs for feeds whose articles expire."""
+    cutoffs = []
+    for feed in feeds:
+        days = feed.retention_days
+        if days is None:
+            days = settings.ARTICLE_RETENTION_DAYS
+        if days > 0:
+            cutoffs.append((feed.id, now - timedelta(days=days)))
+    return cutoffs
+
+
+def purge_old_articles(engine: Engine) -> int:
+    """Delete articles past their feed's retention, and all articles of
+    deleted feeds, in small batches.
+
+    Each batch is its own transaction, so the writer lock is released
+    between batches and ingest can interleave with a large purge.
+    """
+    with Session(engine) as session:
+        feeds = session.exec(select(Feed)).all()
+        # delete_feed leaves the articles behind, for this batched purge
+        deleted_feeds = get_deleted_feed_ids(session)
+    cutoffs = retention_cutoffs(feeds, datetime.utcnow())
+    cutoffs.extend((feed_id, datetime.max) for feed_id in deleted_feeds)
+    deleted = 0
+    for feed_id, cutoff in cutoffs:
+        while True:
+            with Session(engine) as session:
+                count = delete_old_articles(
+                    session, feed_id, cutoff, settings.HOUSEKEEPING_DELETE_BATCH_SIZE
+                )
+            deleted += count
+            if count < settings.HOUSEKEEPING_DELETE_BATCH_SIZE:
+                break
+    return deleted
+
+
+def incremental_vacuum(engine: Engine) -> int:
+    """Return free pages to the filesystem and get how many were released."""
+    with engine.connect() as conn:
+        before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if before:
+            pages = settings.HOUSEKEEPING_VACUUM_PAGES or before
+            # execute() stops after the first freed page; executescript()
+            # steps the pragma to completion
+            conn.connection.dbapi_connection.executescript(
+                f"PRAGMA incremental_vacuum({pages})"
+            )
+        after = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        conn.commit()
+    return before - after
+
+
+def run_housekeeping(engine: Engine) -> HousekeepingReport:
+    """Expire new flags, purge old articles, tombstones and finished jobs, train the
+    body compression dictionary when one is due and shrink the database file."""
+    started = time.perf_counter()
+    with Session(engine) as session:
+        expired = mark_old_articles(session, hours=settings.ARTICLE_NEW_HOURS)
+    deleted = purge_old_articles(engine)
+    with Session(engine) as session:
+        tombstones = delete_old_tombstones(
+            session, datetime.utcnow() - timedelta(days=settings.ARTICLE_TOMBSTONE_DAYS)
+        )
+    with engine.begin() as conn:
+        jobs = delete_old_jobs(
+            conn, datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        )
+    ensure_dictionary(engine)
+    freed_pages = incremental_vacuum(engine)
+    report = HousekeepingReport(
+        expired, deleted, tombstones, jobs, freed_pages, time.perf_counter() - started
+    )
+    logger.info(
+        f"Housekeeping: marked {report.expired} articles as not new, "
+        f"deleted {report.deleted} old articles, {report.tombstones} tombstones and {report.jobs} jobs, "
+        f"freed {report.freed_pages} pages in {report.seconds:.2f}s"
+    )
+    return report
@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, exists, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from .core.config import settings
+from .models import Job
+
+# A job queue in the database, so work the API asks for survives restarts
+# and runs on the scheduler's event loop instead of a request thread. Each
+# worker claims a batch of pending jobs at a time, highest priority first,
+# with a single UPDATE ... RETURNING; SQLite runs one write at a time, so
+# no job is claimed twice. A claim runs out after JOB_TIMEOUT_SECONDS and
+# the job is put back, in case its worker died. Failed jobs are retried
+# with exponential backoff up to JOB_MAX_ATTEMPTS times. Enqueueing a job
+# while an identical one is pending returns the pending one.
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_STATUSES = (JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED)
+
+# Fetch a feed and store its new articles
+JOB_FETCH_FEED = "fetch_feed"
+
+# Fetches someone asked for go ahead of retries of earlier ones
+JOB_PRIORITY_USER = 10
+JOB_PRIORITY_RETRY = 0
+
+
+def job_key(kind: str, feed_id: Optional[int]) -> str:
+    return f"{kind}:{feed_id}"
+
+
+def job_from_row(row) -> Job:
+    return Job(**row._mapping)
+
+
+def enqueue_job(
+    conn: Connection,
+    kind: str,
+    feed_id: Optional[int] = None,
+    priority: int = JOB_PRIORITY_USER,
+) -> Job:
+    """Queue a job, or return the identical one already pending. Does not commit.
+
+    A pending job asked for again keeps the higher of the two priorities
+    and runs as soon as either would.
+    """
+    now = datetime.utcnow()
+    statement = sqlite_insert(Job).values(
+        kind=kind,
+        key=job_key(kind, feed_id),
+        feed_id=feed_id,
+        priority=priority,
+        status=JOB_PENDING,
+        attempts=0,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_after=now,
+        created_at=now,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["key"],
+        index_where=text("status = 'pending'"),
+        set_={
+            "priority": func.max(Job.priority, statement.excluded.priority),
+            "run_after": func.min(Job.run_after, statement.excluded.run_after),
+        },
+    )
+    return job_from_row(conn.execute(statement.returning(*Job.__table__.c)).one())
+
+
+def claim_jobs(conn: Connection, holder: str, limit: int) -> List[Job]:
+    """Take up to limit pending jobs that are due, highest priority first. Does not commit."""
+    now = datetime.utcnow()
+    expired = (Job.status == JOB_RUNNING) & (Job.expires_at < now)
+    pending = Job.__table__.alias("pending")
+    other = Job.__table__.alias("other")
+    # A worker that died mid-job leaves it running. Give it up when it
+    # has no attempts left or an identical job was queued since, which
+    # takes its place, and put it back otherwise. Identical jobs can all
+    # have been running, so only the oldest of them is put back; only one
+    # job per key may be pending.
+    conn.execute(
+        update(Job)
+        .where(
+            expired,
+            (Job.attempts >= Job.max_attempts)
+            | exists().where(pending.c.key == Job.key, pending.c.status == JOB_PENDING),
+        )
+        .values(status=JOB_FAILED, error="Timed out", holder=None, finished_at=now)
+    )
+    conn.execute(
+        update(Job)
+        .where(
+            expired,
+            exists().where(
+                other.c.key == Job.key,
+                other.c.id < Job.id,
+                other.c.status == JOB_RUNNING,
+                other.c.expires_at < now,
+            ),
+        )
+        .values(status=JOB_FAILED, error="Timed out", holder=None, finished_at=now)
+    )
+    conn.execute(
+        update(Job)
+        .where(expired)
+        .values(status=JOB_PENDING, error="Timed out", holder=None, expires_at=None)
+    )
+
+    due = (
+        select(Job.id)
+        .where(Job.status == JOB_PENDING, Job.run_after <= now)
+        .order_by(Job.priority.desc(), Job.run_after)
+        .limit(limit)
+    )
+    rows = conn.execute(
+        update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(
+            status=JOB_RUNNING,
+            holder=holder,
+            attempts=Job.attempts + 1,
+            expires_at=now + timedelta(seconds=settings.JOB_TIMEOUT_SECONDS),
+        )
+        .returning(*Job.__table__.c)
+    ).all()
+    jobs = [job_from_row(row) for row in rows]
+    jobs.sort(key=lambda job: (-job.priority, job.run_after))
+    return jobs
+
+
+def complete_job(conn: Connection, job: Job, holder: str) -> bool:
+    """Mark a claimed job done. Does not commit.
+
+    Returns False when the claim ran out and the job was taken back.
+    """
+    result = conn.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == JOB_RUNNING, Job.holder == holder)
+        .values(
+            status=JOB_DONE,
+            error=None,
+            holder=None,
+            expires_at=None,
+            finished_at=datetime.utcnow(),
+        )
+    )
+    return result.rowcount > 0
+
+
+def fail_job(
+    conn: Connection, job: Job, holder: str, error: str, retry: bool = True
+) -> Optional[str]:
+    """Queue a claimed job to run again later, or give up on it. Does not commit.
+
+    Returns the job's new status, or None when the claim ran out and the
+    job was taken back. A job isn't retried when it has no attempts left
+    or an identical job was queued in the meantime.
+    """
+    now = datetime.utcnow()
+    claimed = (Job.id == job.id) & (Job.status == JOB_RUNNING) & (Job.holder == holder)
+    if retry and job.attempts < job.max_attempts:
+        pending = Job.__table__.alias("pending")
+        delay = settings.JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+        result = conn.execute(
+            update(Job)
+            .where(
+                claimed,
+                ~exists().where(
+                    pending.c.key == Job.key, pending.c.status == JOB_PENDING
+                ),
+            )
+            .values(
+                status=JOB_PENDING,
+                priority=min(job.priority, JOB_PRIORITY_RETRY),
+                run_after=now + timedelta(seconds=delay),
+                error=error,
+                holder=None,
+                expires_at=None,
+            )
+        )
+        if result.rowcount > 0:
+            return JOB_PENDING
+    result = conn.execute(
+        update(Job)
+        .where(claimed)
+        .values(
+            status=JOB_FAILED,
+            error=error,
+            holder=None,
+            expires_at=None,
+            finished_at=now,
+        )
+    )
+    return JOB_FAILED if result.rowcount > 0 else None
+
+
+def delete_old_jobs(conn: Connection, before: datetime) -> int:
+    """Delete jobs that finished before a cutoff. Does not commit."""
+    result = conn.execute(
+        delete(Job).where(
+            Job.status.in_([JOB_DONE, JOB_FAILED]), Job.finished_at < before
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,87 @@
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy import bindparam, delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from .models import Lease
+
+# Leases coordinate worker processes sharing the database, such as
+# `uvicorn --workers N`. A lease is a row naming its holder and when it
+# runs out. Taking one is a single upsert that only overwrites a row the
+# holder already owns or that has expired, and SQLite runs one write at a
+# time, so at most one process holds a lease however many ask at once. A
+# holder that dies stops renewing and loses the lease when it expires.
+
+# Held by the worker that runs the scheduled jobs
+LEADER_LEASE = "scheduler"
+
+
+def feed_lease(feed_id: int) -> str:
+    return f"feed:{feed_id}"
+
+
+def lease_holder() -> str:
+    """Make a holder name unique to this process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+
+def acquire_leases(
+    conn: Connection, names: Iterable[str], holder: str, seconds: float
+) -> List[str]:
+    """Take or renew leases for the next seconds. Does not commit.
+
+    Returns the names the holder now has; the others are held by someone
+    else.
+    """
+    names = list(names)
+    if not names:
+        return []
+    now = datetime.utcnow()
+    statement = sqlite_insert(Lease).values(
+        name=bindparam("lease_name"),
+        holder=holder,
+        expires_at=now + timedelta(seconds=seconds),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={
+            "holder": statement.excluded.holder,
+            "expires_at": statement.excluded.expires_at,
+        },
+        where=or_(Lease.holder == holder, Lease.expires_at < now),
+    )
+    conn.execute(statement, [{"lease_name": name} for name in names])
+    held = (
+        conn.execute(
+            select(Lease.name).where(Lease.name.in_(names), Lease.holder == holder)
+        )
+        .scalars()
+        .all()
+    )
+    return list(held)
+
+
+def hold_leases(conn: Connection, leases: Dict[str, float], holder: str):
+    """Change when leases the holder has run out, in seconds from now. Does not commit."""
+    if not leases:
+        return
+    now = datetime.utcnow()
+    conn.execute(
+        update(Lease)
+        .where(Lease.name == bindparam("lease_name"), Lease.holder == holder)
+        .values(expires_at=bindparam("lease_expires_at")),
+        [
+            {"lease_name": name, "lease_expires_at": now + timedelta(seconds=seconds)}
+            for name, seconds in leases.items()
+        ],
+    )
+
+
+def release_leases(conn: Connection, names: Iterable[str], holder: str):
+    """Give up leases so others can take them right away. Does not commit."""
+    names = list(names)
+    if names:
+        conn.execute(delete(Lease).where(Lease.name.in_(names), Lease.holder == holder))
@@ -1,27 +1,42 @@
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session, select, col
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from sqlmodel import Session, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+from pydantic import TypeAdapter
+from prometheus_client import CONTENT_TYPE_LATEST
+from typing import AsyncIterator, List, Optional
+import asyncio
 import json
 import logging
+import orjson
+import os
+import time
 from datetime import datetime, timedelta
-from celery import Celery
-from celery.schedules import crontab
 
-from .db import get_session, init_db, engine
-from .models import Feed, Article
+from .db import get_session, get_async_read_session, init_db, async_read_engine
+from .models import Feed
 from .schemas import (
     FeedCreate, FeedUpdate, FeedInDB,
     ArticleCreate, ArticleUpdate, ArticleInDB,
-    ArticleQueryParams, PaginatedResponse
+    ArticleQueryParams, PaginatedResponse, ArticleChanges, JobInDB
 )
 from .crud import (
-    create_feed, get_feed, get_feeds, update_feed, delete_feed,
-    create_article, get_article, get_articles, update_article
+    create_feed, get_feed, update_feed, delete_feed,
+    create_article, update_article,
+    article_fields, article_summaries, parse_article_fields
 )
+from . import async_crud
 from .core.config import settings
 from .scheduler import scheduler
-from .rss import RSSParser
+from .realtime import manager
+from .cache import cache_key, cached_response, response_cache
+from .jobs import JOB_FETCH_FEED, JOB_STATUSES, enqueue_job
+from .bodies import get_content
+from .changes import ChangesExpired
+from .metrics import RequestMetricsMiddleware, mark_worker_stopped, render_metrics
+from .profiling import PROFILE_FINISHED, ProfileRunning, profiler
+from .core.security import require_admin
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -30,6 +45,7 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
+    default_response_class=ORJSONResponse,
     description="""
     BitPulse - Persian Crypto RSS Aggregator
     
@@ -44,6 +60,18 @@ app = FastAPI(
             "name": "articles",
             "description": "Operations with articles",
         },
+        {
+            "name": "jobs",
+            "description": "Background fetches queued by the feed endpoints",
+        },
+        {
+            "name": "metrics",
+            "description": "Runtime statistics",
+        },
+        {
+            "name": "admin",
+            "description": "Operations on the running worker, with ADMIN_TOKEN",
+        },
     ]
 )
 
@@ -56,26 +84,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+# Time requests by route for /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except WebSocketDisconnect:
-                self.disconnect(connection)
-
-manager = ConnectionManager()
+# Serializer for cached feed listings
+feed_list_adapter = TypeAdapter(List[FeedInDB])
 
 # Startup and shutdown events
 @app.on_event("startup")
@@ -85,7 +98,8 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    scheduler.shutdown()
+    await scheduler.shutdown()
+    mark_worker_stopped()
 
 # WebSocket endpoint
 @app.websocket("/ws/updates")
@@ -95,41 +109,122 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
+@app.get("/cache/stats", tags=["metrics"])
+def read_cache_stats():
+    """Get response cache hit ratio and memory use."""
+    return response_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["metrics"])
+def read_metrics():
+    """Get the metrics in the Prometheus text format, of every worker when
+    PROMETHEUS_MULTIPROC_DIR is set and of this one otherwise."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+# Admin endpoints
+@app.post("/admin/profile", tags=["admin"], dependencies=[Depends(require_admin)])
+def start_profile(
+    seconds: float = Query(30, gt=0, le=settings.PROFILE_MAX_SECONDS),
+    memory: bool = Query(False, description="Also record allocations with tracemalloc"),
+    next_update: bool = Query(False, description="Profile the next feed update run instead of starting now")
+):
+    """Profile the worker serving this request, now or on its next feed update.
+
+    Only the worker leading the scheduler runs feed updates, unless
+    SCHEDULER_PARTITION_FEEDS is set; the status names the process.
+    """
+    try:
+        profile = profiler.start(seconds, memory, job="update_feeds" if next_update else None)
+    except ProfileRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile.status()
+
+@app.get("/admin/profile", tags=["admin"], dependencies=[Depends(require_admin)])
+def read_profile():
+    """Get the state of the current or last profile."""
+    if profiler.profile is None:
+        raise HTTPException(status_code=404, detail="No profile taken")
+    return profiler.profile.status()
+
+@app.delete("/admin/profile", tags=["admin"], dependencies=[Depends(require_admin)])
+def stop_profile():
+    """End the running profile early, or cancel one waiting for a feed update."""
+    if profiler.profile is None:
+        raise HTTPException(status_code=404, detail="No profile taken")
+    profiler.stop()
+    return profiler.profile.status()
+
+@app.get(
+    "/admin/profile/flamegraph",
+    response_class=PlainTextResponse,
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+def download_flamegraph(
+    allocations: bool = Query(False, description="Allocated bytes instead of wall-clock samples")
+):
+    """Download the last profile as folded stacks, for flamegraph.pl or speedscope."""
+    profile = profiler.profile
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile taken")
+    if profile.state != PROFILE_FINISHED:
+        raise HTTPException(status_code=409, detail=f"The profile is {profile.state}")
+    if allocations and profile.allocations is None:
+        raise HTTPException(status_code=404, detail="The profile didn't record allocations")
+    started = f"{profile.started_at:%Y%m%dT%H%M%S}" if profile.started_at else "never"
+    filename = f"bitpulse-{os.getpid()}-{started}{'-allocations' if allocations else ''}.folded"
+    return PlainTextResponse(
+        profile.allocations if allocations else profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def sync_response_cache(session: AsyncSession):
+    """Drop cached responses when any worker changed the data since."""
+    if response_cache.sync_due():
+        response_cache.sync(await async_crud.get_change_version(session))
+
 # Feed endpoints
 @app.post("/feeds", response_model=FeedInDB, tags=["feeds"])
-def create_feed_endpoint(
-    feed: FeedCreate,
-    background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session)
-):
-    """Create a new RSS feed and fetch articles immediately."""
+def create_feed_endpoint(feed: FeedCreate, session: Session = Depends(get_session)):
+    """Create a new RSS feed and queue a fetch of its articles.
+
+    The fetch runs in the background; follow it with GET /jobs?feed_id=.
+    """
     db_feed = Feed(**feed.dict())
     created_feed = create_feed(session, db_feed)
-
-    # Add background task to fetch articles for this feed
-    def fetch_articles_for_feed(feed_id):
-        with Session(engine) as s:
-            parser = RSSParser(s)
-            feed_obj = get_feed(s, feed_id)
-            if feed_obj:
-                import asyncio
-                asyncio.run(parser.process_feed(feed_obj))
-            s.commit()
-
-    background_tasks.add_task(fetch_articles_for_feed, created_feed.id)
+    enqueue_job(session.connection(), JOB_FETCH_FEED, created_feed.id)
+    session.commit()
+    response_cache.invalidate()
+    scheduler.wake_jobs()
     return created_feed
 
 @app.get("/feeds", response_model=List[FeedInDB], tags=["feeds"])
-def read_feeds(skip: int = 0, limit: int = 100, session: Session = Depends(get_session)):
+async def read_feeds(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    session: AsyncSession = Depends(get_async_read_session)
+):
     """Get all feeds."""
-    return get_feeds(session, skip=skip, limit=limit)
+    key = cache_key("feeds", skip=skip, limit=limit)
+    await sync_response_cache(session)
+    generation = response_cache.generation
+    entry = response_cache.get(key)
+    if entry is None:
+        feeds = await async_crud.get_feeds(session, skip=skip, limit=limit)
+        body = feed_list_adapter.dump_json(
+            feed_list_adapter.validate_python(feeds, from_attributes=True)
+        )
+        entry = response_cache.put(key, body, generation)
+    return cached_response(request, entry)
 
 @app.get("/feeds/{feed_id}", response_model=FeedInDB, tags=["feeds"])
-def read_feed(feed_id: int, session: Session = Depends(get_session)):
+async def read_feed(feed_id: int, session: AsyncSession = Depends(get_async_read_session)):
     """Get a specific feed."""
-    db_feed = get_feed(session, feed_id)
+    db_feed = await async_crud.get_feed(session, feed_id)
     if not db_feed:
         raise HTTPException(status_code=404, detail="Feed not found")
     return db_feed
@@ -144,57 +239,182 @@ def update_feed_endpoint(
     db_feed = update_feed(session, feed_id, feed.dict(exclude_unset=True))
     if not db_feed:
         raise HTTPException(status_code=404, detail="Feed not found")
+    response_cache.invalidate()
     return db_feed
 
+@app.post("/feeds/{feed_id}/refresh", response_model=JobInDB, status_code=202, tags=["feeds"])
+def refresh_feed_endpoint(feed_id: int, session: Session = Depends(get_session)):
+    """Queue a fetch of a feed's new articles, or get the one already queued."""
+    if not get_feed(session, feed_id):
+        raise HTTPException(status_code=404, detail="Feed not found")
+    job = enqueue_job(session.connection(), JOB_FETCH_FEED, feed_id)
+    session.commit()
+    scheduler.wake_jobs()
+    return job
+
 @app.delete("/feeds/{feed_id}", tags=["feeds"])
 def delete_feed_endpoint(feed_id: int, session: Session = Depends(get_session)):
     """Delete a feed."""
     success = delete_feed(session, feed_id)
     if not success:
         raise HTTPException(status_code=404, detail="Feed not found")
+    response_cache.invalidate()
     return {"message": "Feed deleted successfully"}
 
+# Job endpoints
+@app.get("/jobs", response_model=List[JobInDB], tags=["jobs"])
+async def read_jobs(
+    feed_id: Optional[int] = None,
+    status: Optional[str] = Query(default=None, description=", ".join(JOB_STATUSES)),
+    limit: int = Query(default=100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Get queued jobs, newest first."""
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown job status: {status}")
+    return await async_crud.get_jobs(session, feed_id=feed_id, status=status, limit=limit)
+
+@app.get("/jobs/{job_id}", response_model=JobInDB, tags=["jobs"])
+async def read_job(job_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    """Get a queued job's status."""
+    job = await async_crud.get_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 # Article endpoints
 @app.get("/articles", response_model=PaginatedResponse, tags=["articles"])
-def read_articles(
+async def read_articles(
+    request: Request,
     params: ArticleQueryParams = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
-    # Build the base query with filters
-    base_statement = select(Article, Feed).join(Feed, Article.feed_id == Feed.id)
-    # (Apply filters from params here as needed)
-
-    # Get total count (without pagination)
-    count_statement = select(Article).join(Feed, Article.feed_id == Feed.id)
-    total = len(session.exec(count_statement).all())
-
-    # Pagination
-    statement = base_statement.offset((params.page - 1) * params.size).limit(params.size)
-    # Order by published_at descending
-    statement = statement.order_by(Article.published_at.desc())
-
-    results = session.exec(statement).all()
-    articles = []
-    for article, feed in results:
-        article_data = ArticleInDB.model_validate(article)
-        article_data.feed = FeedInDB.model_validate(feed)
-        articles.append(article_data)
-
-    return PaginatedResponse(
-        total=total,
-        page=params.page,
-        size=params.size,
-        pages=(total + params.size - 1) // params.size,
-        items=articles
+    """Get articles, newest first, or ranked by relevance when searching."""
+    key = cache_key("articles", params)
+    await sync_response_cache(session)
+    generation = response_cache.generation
+    entry = response_cache.get(key)
+    if entry is None:
+        page = await build_articles_page(params, session)
+        entry = response_cache.put(key, orjson.dumps(page), generation)
+    return cached_response(request, entry)
+
+async def build_articles_page(params: ArticleQueryParams, session: AsyncSession) -> dict:
+    """Run the article listing query and build the PaginatedResponse body."""
+    try:
+        fields = article_fields(params)
+        results, total, next_cursor = await async_crud.get_articles(session, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    snippets = {}
+    if params.search and "snippet" in fields:
+        snippets = await async_crud.get_search_snippets(
+            session, [article.id for article, _ in results], params.search
+        )
+
+    duplicates = None
+    if params.collapse_duplicates and "duplicates" in fields:
+        duplicates = await async_crud.get_duplicate_counts(
+            session, [article.id for article, _ in results]
+        )
+
+    return {
+        "total": total,
+        "page": params.page,
+        "size": params.size,
+        "pages": (total + params.size - 1) // params.size if total is not None else None,
+        "items": article_summaries(results, fields, snippets, duplicates),
+        "next_cursor": next_cursor,
+    }
+
+@app.get("/articles/changes", response_model=ArticleChanges, tags=["articles"])
+async def read_article_changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Get articles added, updated or deleted since a change sequence number.
+
+    Start from since=0 and pass next_since back on the next call. Answers
+    410 when deletions after since were already purged.
+    """
+    try:
+        page = await async_crud.get_article_changes(
+            session, since, limit, parse_article_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ChangesExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    # Items only carry the requested fields, like listings
+    return ORJSONResponse(page)
+
+@app.get("/articles/changes/stream", tags=["articles"])
+async def stream_article_changes(
+    request: Request,
+    since: int = Query(default=0, ge=0),
+    fields: Optional[str] = None
+):
+    """Stream the change feed as Server-Sent Events.
+
+    Each event's id is its sequence number, so a reconnecting client
+    resumes from Last-Event-ID. A "reset" event means the client has to
+    sync again from 0.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = max(since, int(last_event_id))
+    try:
+        fields = parse_article_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        change_events(request, since, fields),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+async def change_events(request: Request, since: int, fields: tuple) -> AsyncIterator[bytes]:
+    """Poll the change feed and turn new changes into SSE messages."""
+    last_sent = time.monotonic()
+    while not await request.is_disconnected():
+        # A short session per poll, so an idle stream holds no read snapshot
+        async with AsyncSession(async_read_engine) as session:
+            try:
+                page = await async_crud.get_article_changes(session, since, 100, fields)
+            except ChangesExpired as e:
+                yield b"event: reset\ndata: " + orjson.dumps({"detail": str(e)}) + b"\n\n"
+                return
+        for change in page["changes"]:
+            yield (
+                f"id: {change['seq']}\nevent: change\ndata: ".encode()
+                + orjson.dumps(change) + b"\n\n"
+            )
+            last_sent = time.monotonic()
+        since = page["next_since"]
+        if page["has_more"]:
+            continue
+        if time.monotonic() - last_sent >= settings.CHANGES_STREAM_HEARTBEAT_SECONDS:
+            # Comment line, keeps proxies from closing an idle stream
+            yield b": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(settings.CHANGES_STREAM_POLL_SECONDS)
+
 @app.get("/articles/{article_id}", response_model=ArticleInDB, tags=["articles"])
-def read_article(article_id: int, session: Session = Depends(get_session)):
+async def read_article(
+    article_id: int,
+    session: AsyncSession = Depends(get_async_read_session)
+):
     """Get a specific article."""
-    db_article = get_article(session, article_id)
+    db_article = await async_crud.get_article(session, article_id)
     if not db_article:
         raise HTTPException(status_code=404, detail="Article not found")
-    return db_article
+    # The body is the only place the content is decompressed
+    article = ArticleInDB.model_validate(db_article)
+    article.content = await async_crud.get_article_content(session, article_id)
+    return article
 
 @app.put("/articles/{article_id}", response_model=ArticleInDB, tags=["articles"])
 def update_article_endpoint(
@@ -206,16 +426,7 @@ def update_article_endpoint(
     db_article = update_article(session, article_id, article.dict(exclude_unset=True))
     if not db_article:
         raise HTTPException(status_code=404, detail="Article not found")
-    return db_article
-
-def cleanup_old_articles():
-    from sqlmodel import Session
-    from .models import Article
-    from .db import engine
-    from datetime import datetime, timedelta
-    with Session(engine) as session:
-        cutoff = datetime.utcnow() - timedelta(days=20)
-        session.exec(
-            select(Article).where(Article.published_at < cutoff)
-        ).delete()
-        session.commit() 
\ No newline at end of file
+    response_cache.invalidate()
+    updated = ArticleInDB.model_validate(db_article)
+    updated.content = get_content(session, article_id)
+    return updated
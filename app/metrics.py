@@ -0,0 +1,288 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Tuple
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from .tracing import span
+
+# Process-wide metrics in the Prometheus text format, served by /metrics.
+#
+# Each worker process keeps its own values. With PROMETHEUS_MULTIPROC_DIR
+# set for every worker (an empty directory, cleared before starting them),
+# prometheus_client keeps them in files there instead and /metrics combines
+# every worker's; otherwise Prometheus should scrape each worker directly,
+# not through a load balancer. Gauges say how to combine: "livesum" adds up
+# the workers still running.
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Seconds; covers a cached response up to a slow feed
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def render_metrics() -> bytes:
+    """Render the metrics in the Prometheus text format, every worker's
+    when PROMETHEUS_MULTIPROC_DIR is set."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, MULTIPROC_DIR)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the combined metrics."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid(), MULTIPROC_DIR)
+
+
+# HTTP
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "bitpulse_http_request_duration_seconds",
+    "Time until the response headers are sent, by route template",
+    ["method", "route", "status"],
+    buckets=DEFAULT_BUCKETS,
+)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route.
+
+    Timed until the response starts, so streaming responses such as the
+    change stream count their time to first byte rather than their
+    lifetime. Unmatched paths share one label to keep the series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status: int):
+            nonlocal observed
+            observed = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status
+            ).observe(time.perf_counter() - started)
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start" and not observed:
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if not observed:
+                observe(500)
+
+
+# Database
+
+DB_QUERY_SECONDS = Histogram(
+    "bitpulse_db_query_duration_seconds",
+    "Time SQLite spends executing statements, by operation and table",
+    ["operation", "table"],
+    buckets=DEFAULT_BUCKETS,
+)
+
+STATEMENT_TABLE = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(?!(?:OF|ON)\b)[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=2048)
+def statement_labels(statement: str) -> Tuple[str, str]:
+    """Reduce a statement to its operation and main table."""
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words else ""
+    match = STATEMENT_TABLE.search(statement)
+    return operation, match.group(1) if match else ""
+
+
+def instrument_engine(sqlite_engine):
+    """Time every statement an engine executes."""
+    from sqlalchemy import event
+
+    @event.listens_for(sqlite_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sqlite_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            DB_QUERY_SECONDS.labels(*statement_labels(statement)).observe(
+                time.perf_counter() - started
+            )
+
+
+# Ingest
+
+FEED_STAGE_SECONDS = Histogram(
+    "bitpulse_feed_stage_duration_seconds",
+    "Time each stage of a feed refresh takes, per feed",
+    ["stage"],
+    buckets=DEFAULT_BUCKETS,
+)
+ENTRY_STAGE_SECONDS = Histogram(
+    "bitpulse_entry_stage_duration_seconds",
+    "Time each stage of parsing one feed entry takes",
+    ["stage"],
+    buckets=(
+        0.00005,
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+    ),
+)
+FEED_REFRESH_SECONDS = Histogram(
+    "bitpulse_feed_refresh_duration_seconds",
+    "Time a whole feed refresh takes, by outcome",
+    ["status"],
+    buckets=DEFAULT_BUCKETS,
+)
+ARTICLES_INSERTED = Counter(
+    "bitpulse_articles_inserted_total", "New articles stored by ingest"
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "bitpulse_ingest_queue_depth",
+    "Feeds waiting for each ingest pipeline stage",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+INGEST_WRITE_SECONDS = Histogram(
+    "bitpulse_ingest_write_duration_seconds",
+    "Time each step of storing a batch of feeds takes",
+    ["stage"],
+    buckets=DEFAULT_BUCKETS,
+)
+INGEST_WRITE_ARTICLES = Histogram(
+    "bitpulse_ingest_write_batch_articles",
+    "New articles stored per write transaction",
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+
+# Scheduler
+
+JOB_SECONDS = Histogram(
+    "bitpulse_scheduler_job_duration_seconds",
+    "Time each run of a scheduled job takes",
+    ["job"],
+    buckets=DEFAULT_BUCKETS,
+)
+JOB_SKIPPED = Counter(
+    "bitpulse_scheduler_skipped_runs_total",
+    "Scheduled runs skipped because the previous one was still going (overlap) or started too late (missed)",
+    ["job", "reason"],
+)
+QUEUED_JOBS = Counter(
+    "bitpulse_queued_jobs_total",
+    "Queued jobs run, by kind and outcome (done, retried or failed)",
+    ["kind", "status"],
+)
+SCHEDULER_LEADER = Gauge(
+    "bitpulse_scheduler_leader",
+    "Workers holding the scheduler lease, 1 in the leader and 0 in the others",
+    multiprocess_mode="livesum",
+)
+
+# Response cache
+
+RESPONSE_CACHE_ENTRIES = Gauge(
+    "bitpulse_response_cache_entries",
+    "Responses in the cache",
+    multiprocess_mode="livesum",
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "bitpulse_response_cache_bytes",
+    "Size of the cached responses",
+    multiprocess_mode="livesum",
+)
+RESPONSE_CACHE_HITS = Counter(
+    "bitpulse_response_cache_hits_total", "Cache lookups answered"
+)
+RESPONSE_CACHE_MISSES = Counter(
+    "bitpulse_response_cache_misses_total", "Cache lookups missed"
+)
+
+# WebSocket updates
+
+WS_CONNECTIONS = Gauge(
+    "bitpulse_websocket_connections",
+    "Connected WebSocket clients",
+    multiprocess_mode="livesum",
+)
+WS_EVICTIONS = Counter(
+    "bitpulse_websocket_evictions_total",
+    "WebSocket clients dropped for falling behind",
+    ["reason"],
+)
+
+
+@contextmanager
+def feed_stage(stage: str, **attributes):
+    """Time a stage of a feed refresh, as a metric and a tracing span."""
+    started = time.perf_counter()
+    with span(f"feed.{stage}", **attributes):
+        try:
+            yield
+        finally:
+            FEED_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def observe_feed_stage(stage: str, started: float) -> float:
+    """Record a stage of a feed refresh that began at started, without a
+    span; returns the time now, for the next stage to start from."""
+    now = time.perf_counter()
+    FEED_STAGE_SECONDS.labels(stage).observe(now - started)
+    return now
+
+
+def observe_entry_stage(stage: str, started: float) -> float:
+    """Record a stage of parsing one entry that began at started; returns
+    the time now."""
+    now = time.perf_counter()
+    ENTRY_STAGE_SECONDS.labels(stage).observe(now - started)
+    return now
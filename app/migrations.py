@@ -0,0 +1,307 @@
+import logging
+import sqlite3
+from typing import Callable, List
+from sqlalchemy import Table, select, text
+from sqlalchemy.engine import Connection, Engine
+from .models import (
+    Article,
+    ArticleBody,
+    ArticleTombstone,
+    ChangeSequence,
+    CompressionDictionary,
+    Job,
+    Lease,
+)
+from .normalize import fingerprint, normalize_article
+from .bodies import compress_body, create_body_trigger
+from .changes import create_change_triggers
+from .duplicates import (
+    Fingerprint,
+    create_duplicate_index,
+    find_stories,
+    rebuild_duplicate_index,
+)
+from .search import create_search_index, drop_search_index, rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+# Schema migrations for existing databases.
+#
+# create_all only creates missing tables, so any change to an existing
+# table (new columns, new indexes, triggers) needs a migration here. The
+# applied version is kept in SQLite's PRAGMA user_version. Migrations are
+# written to be idempotent because a fresh database gets its tables from
+# create_all first and then runs them all.
+
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    """Check whether a table already has a column."""
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).all()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn: Connection, table: str, column: str, column_type: str):
+    """Add a column unless it already exists."""
+    if not column_exists(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+
+def create_indexes(conn: Connection, table: Table, *names: str):
+    """Create the named indexes declared on a model's table."""
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def add_feed_cache_validators(conn: Connection):
+    add_column(conn, "feed", "etag", "VARCHAR")
+    add_column(conn, "feed", "last_modified", "VARCHAR")
+
+
+def add_article_text_columns(conn: Connection):
+    """Add the columns filled in by app/normalize.py."""
+    add_column(conn, "article", "canonical_link", "VARCHAR")
+    add_column(conn, "article", "content_text", "VARCHAR")
+    add_column(conn, "article", "excerpt", "VARCHAR")
+    add_column(conn, "article", "word_count", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "article", "reading_time_minutes", "INTEGER NOT NULL DEFAULT 0")
+
+
+def add_article_search_index(conn: Connection):
+    # The index reads content_text, which databases older than migration 5
+    # don't have yet
+    add_article_text_columns(conn)
+    if create_search_index(conn):
+        rebuild_search_index(conn)
+
+
+def add_article_list_indexes(conn: Connection):
+    create_indexes(
+        conn,
+        Article.__table__,
+        "ix_article_published_at_id",
+        "ix_article_feed_id_published_at",
+        "ix_article_new_published_at",
+    )
+
+
+def add_feed_retention(conn: Connection):
+    add_column(conn, "feed", "retention_days", "INTEGER")
+
+
+def normalize_existing_articles(conn: Connection):
+    # Rebuilt afterwards, so the backfill doesn't churn it row by row
+    drop_search_index(conn)
+    add_article_text_columns(conn)
+    create_indexes(conn, Article.__table__, "ix_article_canonical_link")
+
+    # Bodies moved out of the table in migration 6; databases created
+    # after that have no content column to read from
+    content_column = "content" if column_exists(conn, "article", "content") else "NULL"
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                f"SELECT id, title, link, description, {content_column} FROM article "
+                "WHERE id > :last_id ORDER BY id LIMIT 500"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        for article_id, title, link, description, content in rows:
+            values = normalize_article(title, link, description, content)
+            # Stored content was already sanitized by feedparser
+            del values["content"], values["link"]
+            conn.execute(
+                text(
+                    "UPDATE article SET title = :title, description = :description, "
+                    "canonical_link = :canonical_link, content_text = :content_text, "
+                    "excerpt = :excerpt, word_count = :word_count, "
+                    "reading_time_minutes = :reading_time_minutes WHERE id = :id"
+                ),
+                {**values, "id": article_id},
+            )
+        last_id = rows[-1][0]
+
+    create_search_index(conn)
+    rebuild_search_index(conn)
+
+
+def compress_article_bodies(conn: Connection):
+    CompressionDictionary.__table__.create(conn, checkfirst=True)
+    ArticleBody.__table__.create(conn, checkfirst=True)
+    create_body_trigger(conn)
+    if not column_exists(conn, "article", "content"):
+        return
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, content FROM article WHERE id > :last_id "
+                "AND content IS NOT NULL ORDER BY id LIMIT 500"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        bodies = []
+        for article_id, content in rows:
+            body = compress_body(content)
+            if body is not None:
+                bodies.append(
+                    {
+                        **body.model_dump(exclude={"article_id"}),
+                        "article_id": article_id,
+                    }
+                )
+        if bodies:
+            conn.execute(
+                text(
+                    "INSERT OR REPLACE INTO article_body (article_id, codec, dictionary_id, data) "
+                    "VALUES (:article_id, :codec, :dictionary_id, :data)"
+                ),
+                bodies,
+            )
+        last_id = rows[-1][0]
+
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute(text("ALTER TABLE article DROP COLUMN content"))
+    else:
+        # Too old to drop columns; emptying it frees the space all the same
+        conn.execute(text("UPDATE article SET content = NULL"))
+
+
+def add_article_change_sequence(conn: Connection):
+    add_column(conn, "article", "change_seq", "INTEGER NOT NULL DEFAULT 0")
+    create_indexes(conn, Article.__table__, "ix_article_change_seq")
+    ChangeSequence.__table__.create(conn, checkfirst=True)
+    ArticleTombstone.__table__.create(conn, checkfirst=True)
+    # Existing articles join the sequence in the order they were added
+    conn.execute(text("UPDATE article SET change_seq = id WHERE change_seq = 0"))
+    conn.execute(
+        text(
+            "INSERT OR IGNORE INTO change_sequence (id, value, pruned_through) "
+            "SELECT 1, coalesce(max(change_seq), 0), 0 FROM article"
+        )
+    )
+    create_change_triggers(conn)
+
+
+def add_article_stories(conn: Connection):
+    add_column(conn, "article", "minhash", "BLOB")
+    add_column(conn, "article", "story_id", "INTEGER")
+    create_indexes(
+        conn, Article.__table__, "ix_article_story_id", "ix_article_lead_published_at"
+    )
+    # Fingerprints aren't visible to sync clients, don't bump change_seq
+    conn.execute(text("DROP TRIGGER IF EXISTS article_change_au"))
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, title, coalesce(content_text, description) FROM article "
+                "WHERE id > :last_id ORDER BY id LIMIT 500"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE article SET minhash = :minhash WHERE id = :id"),
+            [
+                {"id": article_id, "minhash": fingerprint(title, body)}
+                for article_id, title, body in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+    create_change_triggers(conn)
+    create_duplicate_index(conn)
+    rebuild_duplicate_index(conn)
+
+    # Cluster the stored articles in the order they arrived
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(Article.id, Article.minhash, Article.published_at)
+            .where(Article.id > last_id)
+            .order_by(Article.id)
+            .limit(500)
+        ).all()
+        if not rows:
+            break
+        stories = find_stories(conn, [Fingerprint(*row) for row in rows])
+        updates = [
+            {"article_id": row.id, "story_id": story}
+            for row, story in zip(rows, stories)
+            if story is not None
+        ]
+        if updates:
+            conn.execute(
+                text("UPDATE article SET story_id = :story_id WHERE id = :article_id"),
+                updates,
+            )
+        last_id = rows[-1].id
+
+
+def add_leases(conn: Connection):
+    Lease.__table__.create(conn, checkfirst=True)
+
+
+def add_jobs(conn: Connection):
+    Job.__table__.create(conn, checkfirst=True)
+
+
+def add_feed_change_triggers(conn: Connection):
+    create_change_triggers(conn)
+
+
+# Append only; a migration's position in this list is its version number
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    add_feed_cache_validators,
+    add_article_search_index,
+    add_article_list_indexes,
+    add_feed_retention,
+    normalize_existing_articles,
+    compress_article_bodies,
+    add_article_change_sequence,
+    add_article_stories,
+    add_leases,
+    add_jobs,
+    add_feed_change_triggers,
+]
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Get the version of the last migration applied to the database."""
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrate(engine: Engine) -> int:
+    """Apply pending migrations and return the resulting schema version.
+
+    Each migration commits together with its version bump, or not at all.
+    pysqlite commits DDL as soon as it runs, so the connection is put in
+    autocommit mode and every migration gets an explicit BEGIN IMMEDIATE,
+    which also takes the write lock before the version is read.
+    """
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        while True:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                version = get_schema_version(conn)
+                if version >= len(MIGRATIONS):
+                    conn.exec_driver_sql("COMMIT")
+                    return version
+                migration = MIGRATIONS[version]
+                migration(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {version + 1}")
+                conn.exec_driver_sql("COMMIT")
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            logger.info(f"Applied migration {version + 1}: {migration.__name__}")
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import Index, text
 from pydantic import HttpUrl
 
 class Feed(SQLModel, table=True):
@@ -11,19 +12,59 @@ class Feed(SQLModel, table=True):
     last_updated: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = Field(default=True)
+    # HTTP cache validators from the last successful fetch
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Days to keep this feed's articles, None for ARTICLE_RETENTION_DAYS
+    retention_days: Optional[int] = None
 
 class Article(SQLModel, table=True):
+    # Indexes follow the list queries: newest first overall, newest first
+    # per feed, and the small "still new" subset. Changes here need a
+    # migration in app/migrations.py to reach existing databases.
+    __table_args__ = (
+        Index("ix_article_published_at_id", "published_at", "id"),
+        Index("ix_article_feed_id_published_at", "feed_id", "published_at", "id"),
+        Index(
+            "ix_article_new_published_at",
+            "published_at",
+            sqlite_where=text("is_new = 1")
+        ),
+        # Listings that collapse duplicates only show story leads
+        Index(
+            "ix_article_lead_published_at",
+            "published_at",
+            "id",
+            sqlite_where=text("story_id IS NULL")
+        ),
+        Index("ix_article_story_id", "story_id", sqlite_where=text("story_id IS NOT NULL")),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     feed_id: int = Field(foreign_key="feed.id")
     title: str
     link: str = Field(unique=True, index=True)
     description: Optional[str] = None
-    content: Optional[str] = None
     author: Optional[str] = None
     published_at: datetime
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     is_new: bool = Field(default=True)
+    # Derived at ingest by app/normalize.py so reads never re-process HTML
+    canonical_link: Optional[str] = Field(default=None, index=True)
+    content_text: Optional[str] = None
+    excerpt: Optional[str] = None
+    word_count: int = Field(default=0)
+    reading_time_minutes: int = Field(default=0)
+    # Set by triggers on every insert and update, see app/changes.py
+    change_seq: int = Field(default=0, index=True)
+    # Near-duplicate fingerprint and the story this article copies, None
+    # for the first article of a story; see app/duplicates.py
+    minhash: Optional[bytes] = None
+    story_id: Optional[int] = None
+    # Compressed content HTML, kept out of the article table so list
+    # queries read dense pages; see app/bodies.py
+    body: Optional["ArticleBody"] = Relationship(sa_relationship_kwargs={"uselist": False})
     
     class Config:
         schema_extra = {
@@ -32,9 +73,78 @@ class Article(SQLModel, table=True):
                 "title": "Bitcoin Reaches New All-Time High",
                 "link": "https://example.com/bitcoin-news",
                 "description": "Bitcoin has reached a new all-time high...",
-                "content": "Full article content...",
                 "author": "John Doe",
                 "published_at": "2024-02-12T12:00:00Z",
                 "is_new": True
             }
-        } 
\ No newline at end of file
+        }
+
+class CompressionDictionary(SQLModel, table=True):
+    __tablename__ = "compression_dictionary"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    codec: str
+    data: bytes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ArticleBody(SQLModel, table=True):
+    __tablename__ = "article_body"
+
+    article_id: Optional[int] = Field(default=None, primary_key=True, foreign_key="article.id")
+    codec: str
+    # Dictionary the body was compressed with, None for plain compression
+    dictionary_id: Optional[int] = Field(default=None, foreign_key="compression_dictionary.id")
+    data: bytes
+
+# Single-row counter behind Article.change_seq and tombstones
+class ChangeSequence(SQLModel, table=True):
+    __tablename__ = "change_sequence"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: int = Field(default=0)
+    # Tombstones up to this sequence were purged; syncs from before it
+    # can't see those deletions and must start over
+    pruned_through: int = Field(default=0)
+
+class ArticleTombstone(SQLModel, table=True):
+    __tablename__ = "article_tombstone"
+
+    article_id: int = Field(primary_key=True)
+    feed_id: int
+    change_seq: int = Field(index=True)
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Time-limited locks shared by all worker processes, see app/leases.py
+class Lease(SQLModel, table=True):
+    __tablename__ = "lease"
+
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
+
+# Work queued by the API and run by the scheduler, see app/jobs.py
+class Job(SQLModel, table=True):
+    __tablename__ = "job"
+    __table_args__ = (
+        # One pending job per key, so repeated requests share it
+        Index("ix_job_pending_key", "key", unique=True, sqlite_where=text("status = 'pending'")),
+        # Only the few pending jobs are searched when claiming
+        Index("ix_job_pending_priority", "priority", "run_after", sqlite_where=text("status = 'pending'")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str
+    # Jobs doing the same work share a key
+    key: str
+    feed_id: Optional[int] = Field(default=None, index=True)
+    priority: int = 0  # higher runs first
+    status: str = Field(default="pending")
+    attempts: int = 0
+    max_attempts: int
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    # The worker running the job and when its claim runs out
+    holder: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,163 @@
+import html
+import math
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from feedparser.sanitizer import _sanitize_html
+from .core.config import settings
+from .duplicates import minhash_signature
+
+# Compiled once; these run for every entry of every feed
+TAG_RE = re.compile(r"<[^>]*>")
+# Tags that end a line of text, so words on either side don't run together
+BLOCK_TAG_RE = re.compile(
+    r"</?(?:p|div|br|li|ul|ol|h[1-6]|blockquote|tr|td|th|table|figure|figcaption)\b[^>]*>",
+    re.I,
+)
+# The ZWNJ half-space joins the parts of one Persian word
+WORD_RE = re.compile(r"[\w\u200c]+")
+
+# Arabic code points that have a distinct Persian form, plus the tatweel
+# used to stretch words, so Arabic and Persian spellings of a word match
+PERSIAN_FORMS = {
+    "\u064a": "\u06cc",  # Arabic yeh -> Persian yeh
+    "\u0649": "\u06cc",  # alef maksura -> Persian yeh
+    "\u0643": "\u06a9",  # Arabic kaf -> keheh
+    "\u0640": "",  # tatweel
+    # Arabic-Indic digits -> Persian digits
+    **{chr(0x0660 + digit): chr(0x06F0 + digit) for digit in range(10)},
+}
+# A regex only calls back for the few characters that change, which is
+# several times faster than str.translate over the whole text
+PERSIAN_FORMS_RE = re.compile("[" + "".join(PERSIAN_FORMS) + "]")
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "_hsenc",
+    "_hsmi",
+    "mkt_tok",
+    "ref_src",
+}
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_persian(text: Optional[str]) -> Optional[str]:
+    """Replace Arabic letter and digit forms with their Persian ones."""
+    if not text:
+        return text
+    return PERSIAN_FORMS_RE.sub(lambda match: PERSIAN_FORMS[match.group()], text)
+
+
+def sanitize_html(raw_html: Optional[str]) -> Optional[str]:
+    """Strip scripts, event handlers and unsafe markup from feed HTML."""
+    if not raw_html:
+        return None
+    # feedparser has no public sanitizer API. _sanitize_html is private and
+    # only called here; its (html, encoding, content type) signature is the
+    # one of feedparser 6.0.11 as pinned in requirements.txt, so check it
+    # when upgrading.
+    return _sanitize_html(raw_html, "utf-8", "text/html")
+
+
+def html_to_text(raw_html: Optional[str]) -> str:
+    """Turn HTML into a single line of plain text."""
+    if not raw_html:
+        return ""
+    text = BLOCK_TAG_RE.sub(" ", raw_html)
+    text = TAG_RE.sub("", text)
+    if "&" in text:
+        text = html.unescape(text)
+    # split/join collapses whitespace faster than a \s+ substitution
+    return " ".join(text.split())
+
+
+def normalize_title(title: str) -> str:
+    """Get the stored form of a title, which ingest also dedupes on."""
+    # Some feeds double-escape titles; they are plain text, never markup
+    return normalize_persian(html.unescape(title).strip())
+
+
+def make_excerpt(text: str, length: Optional[int] = None) -> str:
+    """Cut text to at most length characters at a word boundary."""
+    length = length or settings.ARTICLE_EXCERPT_LENGTH
+    if len(text) <= length:
+        return text
+    cut = text[: length - 1]
+    space = cut.rfind(" ")
+    if space > length // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,.;:،؛") + "…"
+
+
+def count_words(text: str) -> int:
+    return len(WORD_RE.findall(text))
+
+
+def reading_time_minutes(word_count: int) -> int:
+    """Estimated minutes to read, at least one for any text."""
+    if word_count == 0:
+        return 0
+    return math.ceil(word_count / settings.READING_WORDS_PER_MINUTE)
+
+
+def canonical_link(url: str) -> str:
+    """Normalize a link so the same story shared with different tracking
+    parameters, fragments or host casing compares equal."""
+    url = url.strip()
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    host, _, port = netloc.rpartition(":")
+    if host and DEFAULT_PORTS.get(scheme) == port:
+        netloc = host
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+def fingerprint(title: str, text: Optional[str]) -> Optional[bytes]:
+    """Get the near-duplicate signature of an article's title and text."""
+    return minhash_signature(WORD_RE.findall(f"{title} {text or ''}".lower()))
+
+
+def normalize_article(
+    title: str, link: str, description: Optional[str], content: Optional[str]
+) -> dict:
+    """Compute the stored form of an article's text fields.
+
+    Takes the title, link and raw description/content HTML of an entry and
+    returns the Article column values: sanitized content HTML, plain-text
+    description and content, excerpt, word count, reading time, the
+    canonical link and the near-duplicate fingerprint.
+    """
+    content = sanitize_html(content)
+    description_text = normalize_persian(html_to_text(description))
+    content_text = normalize_persian(html_to_text(content))
+    body = content_text or description_text
+    word_count = count_words(body)
+    title = normalize_title(title)
+    return {
+        "title": title,
+        "link": link.strip(),
+        "canonical_link": canonical_link(link),
+        "description": description_text or None,
+        "content": content,
+        "content_text": content_text or None,
+        "excerpt": make_excerpt(description_text or content_text) or None,
+        "word_count": word_count,
+        "reading_time_minutes": reading_time_minutes(word_count),
+        "minhash": fingerprint(title, body),
+    }
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple
+from sqlmodel import Session
+from .core.config import settings
+from .crud import article_key, bulk_insert_articles, get_existing_article_keys
+from .db import engine, read_engine
+from .duplicates import assign_stories
+from .metrics import (
+    ARTICLES_INSERTED,
+    FEED_REFRESH_SECONDS,
+    INGEST_QUEUE_DEPTH,
+    INGEST_WRITE_ARTICLES,
+    INGEST_WRITE_SECONDS,
+    feed_stage,
+)
+from .models import Article, Feed
+from .normalize import canonical_link, normalize_title
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Returned by fetch_feed when the server reports the feed is unchanged
+NOT_MODIFIED = object()
+
+# Outcomes of refreshing a feed
+FEED_UPDATED = "updated"
+FEED_NOT_MODIFIED = "not_modified"
+FEED_FAILED = "failed"
+
+# Ends a stage's input once every item upstream has been handed on
+DONE = object()
+
+
+class FeedResult(NamedTuple):
+    feed_id: int
+    status: str
+    # Articles that were new and inserted
+    articles: List[Article] = []
+    # Publish dates the document gives for its entries, new or not
+    published: List[datetime] = []
+
+
+class FeedWork:
+    """A feed on its way through the pipeline."""
+
+    def __init__(self, feed: Feed):
+        self.feed = feed
+        self.started = time.perf_counter()
+        self.parsed = None
+        # Entries not stored yet, and the publish dates of all the dated ones
+        self.entries: List[Any] = []
+        self.published: List[datetime] = []
+        self.articles: List[Article] = []
+
+
+class IngestPipeline:
+    """Refreshes feeds in stages: fetch -> dedupe -> normalize -> write.
+
+    Stages are connected by queues of INGEST_QUEUE_SIZE feeds, so a slow
+    stage holds up the ones before it instead of letting parsed documents
+    pile up in memory. Each stage runs its own number of workers. Entries
+    are deduped on their link and title before the costly normalization,
+    so unchanged entries are never sanitized or compressed. A single
+    writer stores whatever feeds are waiting in one transaction, so
+    concurrent fetches share commits instead of each paying for one.
+
+    A pipeline refreshes one set of feeds and is then discarded; its
+    sessions live no longer than the stage step that opens them.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.queues: Dict[str, asyncio.Queue] = {
+            name: asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+            for name in ("fetch", "dedupe", "normalize", "write")
+        }
+        self.peak_depth = dict.fromkeys(self.queues, 0)
+        self.results: List[FeedResult] = []
+        self.batches = 0
+        # Keys of entries taken by an earlier feed of this run, which may
+        # not be committed yet
+        self.seen_links = set()
+        self.seen_title_dates = set()
+        self.seen_lock = threading.Lock()
+
+    async def run(self, feeds: List[Feed]) -> List[FeedResult]:
+        """Refresh the feeds and return their results, in no particular order."""
+        steps = [
+            self.enqueue(feeds),
+            self.stage("fetch", self.fetch, settings.INGEST_FETCH_WORKERS, "dedupe"),
+            self.stage(
+                "dedupe", self.dedupe, settings.INGEST_DEDUPE_WORKERS, "normalize"
+            ),
+            self.stage(
+                "normalize", self.normalize, settings.INGEST_NORMALIZE_WORKERS, "write"
+            ),
+            self.write_loop(),
+        ]
+        tasks = [asyncio.create_task(step) for step in steps]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return self.results
+
+    def stats(self) -> dict:
+        return {
+            "peak_queue_depth": dict(self.peak_depth),
+            "write_batches": self.batches,
+        }
+
+    async def put(self, name: str, item):
+        queue = self.queues[name]
+        await queue.put(item)
+        depth = queue.qsize()
+        INGEST_QUEUE_DEPTH.labels(name).set(depth)
+        if depth > self.peak_depth[name]:
+            self.peak_depth[name] = depth
+
+    async def get(self, name: str):
+        item = await self.queues[name].get()
+        INGEST_QUEUE_DEPTH.labels(name).set(self.queues[name].qsize())
+        return item
+
+    async def enqueue(self, feeds: List[Feed]):
+        for feed in feeds:
+            await self.put("fetch", FeedWork(feed))
+        await self.put("fetch", DONE)
+
+    async def stage(self, name: str, step, workers: int, downstream: str):
+        """Run step over a queue with several workers, passing work on."""
+
+        async def worker():
+            while True:
+                work = await self.get(name)
+                if work is DONE:
+                    # Leave it for the other workers
+                    await self.queues[name].put(DONE)
+                    return
+                try:
+                    passed_on = await step(work)
+                except Exception as e:
+                    logger.error(f"Error in the {name} stage for {work.feed.url}: {e}")
+                    self.finish(work, FEED_FAILED)
+                    continue
+                if passed_on:
+                    await self.put(downstream, work)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+        await self.put(downstream, DONE)
+
+    def finish(self, work: FeedWork, status: str, articles: List[Article] = []):
+        self.results.append(FeedResult(work.feed.id, status, articles, work.published))
+        FEED_REFRESH_SECONDS.labels(status).observe(time.perf_counter() - work.started)
+
+    async def fetch(self, work: FeedWork) -> bool:
+        """Download and parse the feed document."""
+        with feed_stage("fetch", feed_id=work.feed.id, url=work.feed.url):
+            parsed = await self.parser.fetch_feed(work.feed)
+        if parsed is NOT_MODIFIED:
+            self.finish(work, FEED_NOT_MODIFIED)
+            return False
+        if not parsed:
+            self.finish(work, FEED_FAILED)
+            return False
+        work.parsed = parsed
+        return True
+
+    async def dedupe(self, work: FeedWork) -> bool:
+        """Keep the entries that aren't stored yet."""
+        await asyncio.to_thread(self.find_new_entries, work)
+        return True
+
+    def find_new_entries(self, work: FeedWork):
+        with feed_stage("dedupe", feed_id=work.feed.id):
+            keyed = []
+            # Only process the latest entries
+            for entry in work.parsed.entries[: settings.RSS_MAX_ENTRIES]:
+                try:
+                    date = self.parser.entry_date(entry)
+                    published = date or datetime.now(self.parser.timezone)
+                    link = entry.link.strip()
+                    keyed.append(
+                        (
+                            entry,
+                            link,
+                            canonical_link(link),
+                            article_key(normalize_title(entry.title), published),
+                        )
+                    )
+                except Exception:
+                    logger.warning(
+                        f"Could not parse entry: {entry.get('title', 'No Title')}"
+                    )
+                    continue
+                # Undated entries would all get the current time, which
+                # says nothing about how often the feed publishes
+                if date is not None:
+                    work.published.append(date)
+
+            # Skip entries that already exist by link OR (title and published_at),
+            # looked up for the whole feed at once on a reader connection
+            with Session(read_engine) as session:
+                existing_links, existing_title_dates = get_existing_article_keys(
+                    session,
+                    {link for _, link, _, _ in keyed}
+                    | {canonical for _, _, canonical, _ in keyed},
+                    {key for _, _, _, key in keyed},
+                )
+            with self.seen_lock:
+                for entry, link, canonical, key in keyed:
+                    if (
+                        link in existing_links
+                        or canonical in existing_links
+                        or key in existing_title_dates
+                        or link in self.seen_links
+                        or canonical in self.seen_links
+                        or key in self.seen_title_dates
+                    ):
+                        continue
+                    # Also drop repeats within this run, in this feed or another
+                    self.seen_links.update((link, canonical))
+                    self.seen_title_dates.add(key)
+                    work.entries.append(entry)
+
+    async def normalize(self, work: FeedWork) -> bool:
+        """Turn the new entries into articles."""
+        await asyncio.to_thread(self.parse_entries, work)
+        return True
+
+    def parse_entries(self, work: FeedWork):
+        with feed_stage("normalize", feed_id=work.feed.id):
+            for entry in work.entries:
+                article = self.parser.parse_entry(entry, work.feed.id)
+                if not article:
+                    logger.warning(
+                        f"Could not parse entry: {entry.get('title', 'No Title')}"
+                    )
+                else:
+                    work.articles.append(article)
+        # The document isn't needed any more, don't keep it queued
+        work.parsed = work.parsed.feed
+        work.entries = []
+
+    async def write_loop(self):
+        """Store feeds as they arrive, all those waiting in one transaction."""
+        queue = self.queues["write"]
+        done = False
+        while not done:
+            batch = [await self.get("write")]
+            articles = len(batch[0].articles) if batch[0] is not DONE else 0
+            while articles < settings.INGEST_WRITE_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+                articles += len(batch[-1].articles) if batch[-1] is not DONE else 0
+            INGEST_QUEUE_DEPTH.labels("write").set(queue.qsize())
+            done = DONE in batch
+            batch = [work for work in batch if work is not DONE]
+            if not batch:
+                continue
+            try:
+                inserted = await asyncio.to_thread(self.write, batch)
+            except Exception as e:
+                logger.error(f"Error storing {len(batch)} feeds: {e}")
+                for work in batch:
+                    self.finish(work, FEED_FAILED)
+                continue
+            for work, articles in zip(batch, inserted):
+                ARTICLES_INSERTED.inc(len(articles))
+                self.finish(work, FEED_UPDATED, articles)
+
+    def write(self, batch: List[FeedWork]) -> List[List[Article]]:
+        """Store the feeds' new articles and metadata in one transaction."""
+        self.batches += 1
+        INGEST_WRITE_ARTICLES.observe(sum(len(work.articles) for work in batch))
+        inserted = []
+        with span("ingest.write", feeds=len(batch)), Session(
+            engine, expire_on_commit=False
+        ) as session:
+            now = datetime.now(self.parser.timezone)
+            for work in batch:
+                # Update feed metadata
+                feed = work.feed
+                feed.title = work.parsed.get("title", feed.title)
+                feed.description = work.parsed.get("description", feed.description)
+                feed.last_updated = now
+                session.add(feed)
+
+                # Link copies of stories other feeds already carried,
+                # including feeds earlier in this batch
+                with INGEST_WRITE_SECONDS.labels("stories").time():
+                    assign_stories(session.connection(), work.articles)
+                with INGEST_WRITE_SECONDS.labels("insert").time():
+                    inserted.append(bulk_insert_articles(session, work.articles))
+            with INGEST_WRITE_SECONDS.labels("commit").time():
+                session.commit()
+        return inserted
@@ -0,0 +1,170 @@
+import heapq
+import logging
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PollState:
+    """When a feed is next due and how often it is being polled."""
+
+    feed_id: int
+    interval: float  # seconds
+    due: float  # time.monotonic()
+    failures: int = 0
+    scheduled: bool = False
+
+
+def clamp_interval(seconds: float) -> float:
+    """Keep a polling interval within the configured bounds."""
+    return min(
+        max(seconds, settings.RSS_MIN_POLL_MINUTES * 60),
+        settings.RSS_MAX_POLL_MINUTES * 60,
+    )
+
+
+def with_jitter(seconds: float) -> float:
+    """Spread fetches out so feeds with equal intervals don't fire together."""
+    jitter = settings.RSS_POLL_JITTER
+    return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+
+def publish_interval(published: Iterable[datetime]) -> Optional[float]:
+    """Estimate how often a feed publishes from its entries' dates.
+
+    Returns the median gap in seconds between consecutive entries, or None
+    when there are too few dated entries to tell.
+    """
+    times = sorted(set(published), reverse=True)
+    gaps = [(newer - older).total_seconds() for newer, older in zip(times, times[1:])]
+    gaps = [gap for gap in gaps if gap > 0]
+    if not gaps:
+        return None
+    return statistics.median(gaps)
+
+
+class PollSchedule:
+    """Priority queue of feeds ordered by when they are next due.
+
+    Each feed's interval adapts to how often it actually publishes, within
+    RSS_MIN_POLL_MINUTES and RSS_MAX_POLL_MINUTES. Failing feeds back off
+    exponentially, and after RSS_CIRCUIT_BREAKER_FAILURES consecutive
+    failures the circuit opens: the feed is left alone for
+    RSS_CIRCUIT_BREAKER_MINUTES before a single retry.
+    """
+
+    def __init__(self):
+        self.states: Dict[int, PollState] = {}
+        self.heap: List[Tuple[float, int]] = []
+
+    def sync(self, feed_ids: Iterable[int], now: Optional[float] = None):
+        """Track new feeds, due immediately, and forget removed ones."""
+        now = time.monotonic() if now is None else now
+        feed_ids = set(feed_ids)
+        for feed_id in list(self.states):
+            if feed_id not in feed_ids:
+                # Stale heap entries are skipped when popped
+                del self.states[feed_id]
+        for feed_id in feed_ids:
+            state = self.states.get(feed_id)
+            if state is None:
+                state = PollState(
+                    feed_id=feed_id,
+                    interval=clamp_interval(settings.RSS_UPDATE_INTERVAL_MINUTES * 60),
+                    due=now,
+                )
+                self.states[feed_id] = state
+            if not state.scheduled:
+                self._push(state, now)
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        """Remove and return the feeds that are due."""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due_at, feed_id = heapq.heappop(self.heap)
+            state = self.states.get(feed_id)
+            if state is None or not state.scheduled or state.due != due_at:
+                continue
+            state.scheduled = False
+            due.append(feed_id)
+        return due
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the next feed is due, or None when nothing is scheduled."""
+        now = time.monotonic() if now is None else now
+        pending = [state.due for state in self.states.values() if state.scheduled]
+        return max(min(pending) - now, 0.0) if pending else None
+
+    def seconds_until_due(
+        self, feed_id: int, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Seconds until a feed is due again, or None when it isn't scheduled."""
+        now = time.monotonic() if now is None else now
+        state = self.states.get(feed_id)
+        if state is None or not state.scheduled:
+            return None
+        return max(state.due - now, 0.0)
+
+    def record_success(
+        self, feed_id: int, published: Iterable[datetime], now: Optional[float] = None
+    ):
+        """Reschedule a fetched feed from its observed publishing rate."""
+        state = self.states.get(feed_id)
+        if state is None:
+            return
+        state.failures = 0
+        observed = publish_interval(published)
+        if observed is None:
+            state.interval = clamp_interval(
+                state.interval * settings.RSS_POLL_BACKOFF_FACTOR
+            )
+        else:
+            # Smooth towards the observed rate so one burst doesn't swing it
+            state.interval = clamp_interval((state.interval + observed) / 2)
+        self._reschedule(state, state.interval, now)
+
+    def record_not_modified(self, feed_id: int, now: Optional[float] = None):
+        """Nothing changed since the last fetch, so poll a little less often."""
+        state = self.states.get(feed_id)
+        if state is None:
+            return
+        state.failures = 0
+        state.interval = clamp_interval(
+            state.interval * settings.RSS_POLL_BACKOFF_FACTOR
+        )
+        self._reschedule(state, state.interval, now)
+
+    def record_failure(self, feed_id: int, now: Optional[float] = None):
+        """Back off exponentially and open the circuit after repeated failures."""
+        state = self.states.get(feed_id)
+        if state is None:
+            return
+        state.failures += 1
+        if state.failures >= settings.RSS_CIRCUIT_BREAKER_FAILURES:
+            logger.warning(
+                f"Feed {feed_id} failed {state.failures} times in a row, "
+                f"pausing it for {settings.RSS_CIRCUIT_BREAKER_MINUTES} minutes"
+            )
+            delay = settings.RSS_CIRCUIT_BREAKER_MINUTES * 60
+        else:
+            delay = clamp_interval(
+                settings.RSS_MIN_POLL_MINUTES * 60 * 2 ** (state.failures - 1)
+            )
+        self._reschedule(state, delay, now)
+
+    def _reschedule(self, state: PollState, delay: float, now: Optional[float]):
+        now = time.monotonic() if now is None else now
+        self._push(state, now + with_jitter(delay))
+
+    def _push(self, state: PollState, due: float):
+        state.due = due
+        state.scheduled = True
+        heapq.heappush(self.heap, (due, state.feed_id))
@@ -0,0 +1,221 @@
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# On-demand profiling of a live worker. A sampling thread snapshots every
+# thread's stack (sys._current_frames) at a fixed interval and counts
+# identical stacks, which gives wall-clock samples: a thread waiting on
+# I/O or a lock shows up where it waits. Optionally tracemalloc records
+# where the memory allocated during the profile, and still held at its
+# end, came from. Results are in the folded format ("frame;frame;frame
+# count") that flamegraph.pl, speedscope and inferno read. Nothing runs
+# and no hook is installed while no profile is active.
+
+PROFILE_ARMED = "armed"
+PROFILE_RUNNING = "running"
+PROFILE_FINISHED = "finished"
+
+
+class ProfileRunning(Exception):
+    """Another profile is armed or running in this process."""
+
+
+class Profile:
+    """One profile, from being started or armed until it finishes."""
+
+    def __init__(self, seconds: float, memory: bool, job: Optional[str] = None):
+        self.seconds = seconds
+        self.memory = memory
+        self.job = job  # profile the next run of this job instead of starting now
+        self.state = PROFILE_ARMED if job else PROFILE_RUNNING
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        # Folded allocation stacks weighted by bytes, with memory=True
+        self.allocations: Optional[str] = None
+        # Whether tracemalloc was started for this profile, or was already on
+        self.owns_tracemalloc = False
+        self.stop_event = threading.Event()
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "state": self.state,
+            "job": self.job,
+            "seconds": self.seconds,
+            "memory": self.memory,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "samples": self.samples,
+        }
+
+    def folded(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+def source_prefixes() -> list:
+    """Directories on the import path, longest first."""
+    prefixes = {os.path.abspath(path) + os.sep for path in sys.path}
+    return sorted(prefixes, key=len, reverse=True)
+
+
+def short_path(filename: str, prefixes: list) -> str:
+    """Shorten a source path to the module path it is imported as."""
+    for prefix in prefixes:
+        if filename.startswith(prefix):
+            return filename[len(prefix) :]
+    return filename
+
+
+class SamplingProfiler:
+    """Runs at most one profile at a time and keeps the last result."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profile: Optional[Profile] = None
+        self.thread: Optional[threading.Thread] = None
+        # Frame labels by code object, so each is formatted once per profile
+        self.labels: Dict[object, str] = {}
+        self.prefixes: list = []
+
+    @property
+    def active(self) -> bool:
+        return self.profile is not None and self.profile.state != PROFILE_FINISHED
+
+    def start(
+        self, seconds: float, memory: bool = False, job: Optional[str] = None
+    ) -> Profile:
+        """Start a profile now, or arm one for the next run of a job."""
+        with self.lock:
+            if self.active:
+                raise ProfileRunning("A profile is already armed or running")
+            self.profile = Profile(
+                min(seconds, settings.PROFILE_MAX_SECONDS), memory, job
+            )
+            if job is None:
+                self._begin(self.profile)
+        logger.info(
+            f"Profiling {'the next ' + job + ' run' if job else f'for {seconds}s'}"
+        )
+        return self.profile
+
+    def stop(self):
+        """End the running profile early, or disarm one waiting for its job."""
+        with self.lock:
+            profile = self.profile
+            if profile is None or profile.state == PROFILE_FINISHED:
+                return
+            if profile.state == PROFILE_ARMED:
+                profile.state = PROFILE_FINISHED
+                return
+        profile.stop_event.set()
+        self.thread.join()
+
+    @contextmanager
+    def job(self, name: str):
+        """Profile this run of a job if a profile is armed for it."""
+        profile = self.profile
+        if profile is None or profile.state != PROFILE_ARMED or profile.job != name:
+            yield
+            return
+        with self.lock:
+            # Disarmed, or taken by a concurrent run, in the meantime
+            if profile.state != PROFILE_ARMED:
+                profile = None
+            else:
+                self._begin(profile)
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.stop_event.set()
+
+    def _begin(self, profile: Profile):
+        profile.state = PROFILE_RUNNING
+        profile.started_at = datetime.utcnow()
+        self.prefixes = source_prefixes()
+        if profile.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILE_MEMORY_FRAMES)
+            profile.owns_tracemalloc = True
+        self.thread = threading.Thread(
+            target=self._sample, args=(profile,), name="profiler", daemon=True
+        )
+        self.thread.start()
+
+    def _sample(self, profile: Profile):
+        interval = settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        deadline = time.monotonic() + profile.seconds
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        try:
+            while not profile.stop_event.wait(interval) and time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    name = names.get(ident)
+                    if name is None:
+                        names.update(
+                            (thread.ident, thread.name)
+                            for thread in threading.enumerate()
+                        )
+                        name = names.get(ident, str(ident))
+                    profile.stacks[self._stack(name, frame)] += 1
+                profile.samples += 1
+        finally:
+            self._finish(profile)
+
+    def _stack(self, thread_name: str, frame) -> str:
+        labels = self.labels
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                name = getattr(code, "co_qualname", code.co_name)
+                path = short_path(code.co_filename, self.prefixes)
+                label = f"{name} ({path}:{code.co_firstlineno})".replace(";", ",")
+                labels[code] = label
+            frames.append(label)
+            frame = frame.f_back
+        frames.append(thread_name.replace(";", ","))
+        return ";".join(reversed(frames))
+
+    def _finish(self, profile: Profile):
+        if profile.memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ]
+            )
+            if profile.owns_tracemalloc:
+                tracemalloc.stop()
+            profile.allocations = "".join(
+                ";".join(
+                    f"{short_path(frame.filename, self.prefixes)}:{frame.lineno}"
+                    for frame in stat.traceback
+                )
+                + f" {stat.size}\n"
+                for stat in snapshot.statistics("traceback")
+            )
+        self.labels = {}
+        profile.finished_at = datetime.utcnow()
+        profile.state = PROFILE_FINISHED
+        logger.info(f"Profile finished with {profile.samples} samples")
+
+
+# Create global profiler instance
+profiler = SamplingProfiler()
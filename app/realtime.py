@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Dict, List, Set
+from fastapi import WebSocket
+from .models import Article
+from .core.config import settings
+from .metrics import WS_CONNECTIONS, WS_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def new_articles_message(articles: List[Article]) -> dict:
+    """Build the compact delta pushed to clients after an ingest cycle."""
+    limit = settings.WS_MAX_ARTICLES_PER_MESSAGE
+    newest = sorted(articles, key=lambda article: article.published_at, reverse=True)
+    return {
+        "type": "new_articles",
+        "count": len(articles),
+        "articles": [
+            {
+                "id": article.id,
+                "feed_id": article.feed_id,
+                "title": article.title,
+                "link": article.link,
+                "published_at": article.published_at.isoformat(),
+            }
+            for article in newest[:limit]
+        ],
+    }
+
+
+def coalesce(messages: List[dict]) -> List[dict]:
+    """Merge consecutive new_articles deltas into a single message."""
+    merged: List[dict] = []
+    for message in messages:
+        previous = merged[-1] if merged else None
+        if previous and previous["type"] == message["type"] == "new_articles":
+            merged[-1] = {
+                "type": "new_articles",
+                "count": previous["count"] + message["count"],
+                # Newer deltas go first and the total stays capped
+                "articles": (message["articles"] + previous["articles"])[
+                    : settings.WS_MAX_ARTICLES_PER_MESSAGE
+                ],
+            }
+        else:
+            merged.append(message)
+    return merged
+
+
+class Client:
+    """A connected WebSocket with its own bounded send queue."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.sender: asyncio.Task = None
+
+
+class ConnectionManager:
+    """Fans messages out to WebSocket clients without letting one slow
+    client hold up the others.
+
+    Each client gets a bounded queue drained by its own sender task, so a
+    broadcast only enqueues. Bursts that pile up in a queue are coalesced
+    into one frame. Clients whose queue overflows or whose send times out
+    are evicted.
+    """
+
+    def __init__(self):
+        self.clients: Dict[WebSocket, Client] = {}
+        # Keep references to background close tasks until they finish
+        self.closing: Set[asyncio.Task] = set()
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket) -> Client:
+        await websocket.accept()
+        client = Client(websocket)
+        client.sender = asyncio.create_task(self._send_loop(client))
+        self.clients[websocket] = client
+        WS_CONNECTIONS.set(len(self.clients))
+        return client
+
+    def disconnect(self, websocket: WebSocket, code: int = None):
+        """Drop a client, closing the socket when a close code is given."""
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        WS_CONNECTIONS.set(len(self.clients))
+        if client.sender is not asyncio.current_task():
+            client.sender.cancel()
+        if code is not None:
+            # Close in the background so a stuck client can't block the caller
+            task = asyncio.create_task(self._close(websocket, code))
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=code), timeout=settings.WS_SEND_TIMEOUT
+            )
+        except Exception:
+            pass
+
+    async def broadcast(self, message: dict):
+        """Queue a message for every connected client without waiting on sends."""
+        # Iterate over a snapshot, evictions change the dict
+        for websocket, client in list(self.clients.items()):
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("Evicting WebSocket client with a full send queue")
+                WS_EVICTIONS.labels("queue_full").inc()
+                # 1013: try again later
+                self.disconnect(websocket, code=1013)
+
+    async def _send_loop(self, client: Client):
+        try:
+            while True:
+                messages = [await client.queue.get()]
+                while not client.queue.empty():
+                    messages.append(client.queue.get_nowait())
+                for message in coalesce(messages):
+                    await asyncio.wait_for(
+                        client.websocket.send_json(message),
+                        timeout=settings.WS_SEND_TIMEOUT,
+                    )
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning("Evicting slow WebSocket client")
+            WS_EVICTIONS.labels("send_timeout").inc()
+            self.disconnect(client.websocket, code=1013)
+        except Exception:
+            # The socket is gone; the endpoint's receive loop cleans up too
+            self.disconnect(client.websocket)
+
+
+manager = ConnectionManager()
@@ -1,46 +1,183 @@
 import asyncio
+import time
 import feedparser
 import httpx
-from datetime import datetime, timedelta
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 import pytz
 from typing import List, Optional, Dict, Any
 import logging
 from .models import Feed, Article
 from .core.config import settings
+from .fetcher import FeedClient, ResponseTooLarge
+from .streaming import StreamingFeedParser, UnsupportedFeed
+from .normalize import normalize_article
+from .bodies import compress_body
+from .metrics import FEED_STAGE_SECONDS, observe_entry_stage
+from .pipeline import FEED_NOT_MODIFIED, NOT_MODIFIED, FeedResult, IngestPipeline
 from sqlmodel import select
-import re
 
 logger = logging.getLogger(__name__)
 
+def parse_feed_content(content: bytes):
+    """Parse a raw feed document.
+
+    Takes bytes rather than decoded text so feedparser can honour the
+    encoding declared in the XML prolog, and so the call can be shipped
+    to a worker process cheaply.
+    """
+    # Sanitizing happens once, in the normalization step of parse_entry
+    return feedparser.parse(content, sanitize_html=False)
+
+def create_parse_executor() -> Optional[Executor]:
+    """Create the worker pool configured by RSS_PARSE_EXECUTOR.
+
+    Returns None for "inline", in which case feeds are parsed on the
+    event loop.
+    """
+    mode = settings.RSS_PARSE_EXECUTOR
+    if mode == "inline":
+        return None
+    if mode == "process":
+        return ProcessPoolExecutor(max_workers=settings.RSS_PARSE_WORKERS)
+    if mode == "thread":
+        return ThreadPoolExecutor(
+            max_workers=settings.RSS_PARSE_WORKERS,
+            thread_name_prefix="feed-parse"
+        )
+    raise ValueError(f"Unknown RSS_PARSE_EXECUTOR: {mode}")
+
 class RSSParser:
-    def __init__(self, session):
+    def __init__(
+        self,
+        session,
+        client: Optional[FeedClient] = None,
+        executor: Optional[Executor] = None
+    ):
         self.session = session
         self.timezone = pytz.timezone(settings.DEFAULT_TIMEZONE)
-        self.semaphore = asyncio.Semaphore(settings.RSS_MAX_CONCURRENT_REQUESTS)
+        # Use the caller's shared client when given, otherwise own one
+        self.owns_client = client is None
+        self.client = client or FeedClient()
+        self.executor = executor
+        self.skipped_feeds = 0
+        # Queue depths and write batches of the last update_feeds
+        self.pipeline_stats = {}
+
+    async def aclose(self):
+        """Release the HTTP client if this parser created it."""
+        if self.owns_client:
+            await self.client.aclose()
 
     async def fetch_feed(self, feed: Feed) -> Optional[Dict[str, Any]]:
-        """Fetch and parse a single feed."""
+        """Fetch and parse a single feed.
+
+        Sends the validators stored on the feed as a conditional GET and
+        returns NOT_MODIFIED when the server answers 304.
+        """
+        headers = {}
+        if feed.etag:
+            headers['If-None-Match'] = feed.etag
+        if feed.last_modified:
+            headers['If-Modified-Since'] = feed.last_modified
+
         try:
-            async with self.semaphore:
-                async with httpx.AsyncClient(timeout=settings.RSS_REQUEST_TIMEOUT) as client:
-                    response = await client.get(feed.url)
-                    response.raise_for_status()
-                    return feedparser.parse(response.text)
+            async with self.client.stream(feed.url, headers=headers) as response:
+                if response.status_code == 304:
+                    return NOT_MODIFIED
+                response.raise_for_status()
+                feed.etag = response.headers.get('etag')
+                feed.last_modified = response.headers.get('last-modified')
+                return await self.read_feed(response)
         except Exception as e:
             logger.error(f"Error fetching feed {feed.url}: {e}")
             return None
 
+    async def read_feed(self, response: httpx.Response):
+        """Read and parse a streamed feed body of at most RSS_MAX_FEED_BYTES.
+
+        Chunks go through the streaming parser as they arrive and reading
+        stops as soon as RSS_MAX_ENTRIES entries are parsed. Documents the
+        streaming parser can't handle are read in full and parsed by
+        feedparser instead.
+        """
+        max_bytes = settings.RSS_MAX_FEED_BYTES
+        declared = response.headers.get('content-length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ResponseTooLarge(f"Feed is {declared} bytes, limit is {max_bytes}")
+
+        stream_parser = None
+        if settings.RSS_STREAMING_PARSER:
+            stream_parser = StreamingFeedParser(settings.RSS_MAX_ENTRIES)
+        chunks = []
+        size = 0
+        # Reading and parsing interleave; the time spent in the parser is
+        # reported as parse, the rest as download
+        started = time.perf_counter()
+        parsing = 0.0
+        try:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ResponseTooLarge(f"Feed is over the {max_bytes} byte limit")
+                # Kept until the streaming parser succeeds, for the fallback
+                chunks.append(chunk)
+                if stream_parser is None:
+                    continue
+                parse_started = time.perf_counter()
+                try:
+                    stream_parser.feed(chunk)
+                except UnsupportedFeed as e:
+                    logger.debug(f"Falling back to feedparser for {response.url}: {e}")
+                    stream_parser = None
+                    continue
+                finally:
+                    parsing += time.perf_counter() - parse_started
+                if stream_parser.done:
+                    return stream_parser.result()
+
+            parse_started = time.perf_counter()
+            try:
+                if stream_parser is not None:
+                    try:
+                        return stream_parser.close()
+                    except UnsupportedFeed as e:
+                        logger.debug(f"Falling back to feedparser for {response.url}: {e}")
+                return await self.parse(b"".join(chunks))
+            finally:
+                parsing += time.perf_counter() - parse_started
+        finally:
+            FEED_STAGE_SECONDS.labels("download").observe(time.perf_counter() - started - parsing)
+            FEED_STAGE_SECONDS.labels("parse").observe(parsing)
+
+    async def parse(self, content: bytes):
+        """Parse feed content without blocking the event loop.
+
+        Runs on the parser's executor, or on the loop's default thread pool
+        when none was given. With RSS_PARSE_EXECUTOR set to "inline" the
+        document is parsed directly on the loop.
+        """
+        if settings.RSS_PARSE_EXECUTOR == "inline":
+            return parse_feed_content(content)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, parse_feed_content, content)
+
+    def entry_date(self, entry: Dict[str, Any]) -> Optional[datetime]:
+        """Get when an entry was published, None if the feed doesn't say."""
+        published = entry.get('published_parsed') or entry.get('updated_parsed')
+        if not published:
+            return None
+        published_dt = pytz.UTC.localize(datetime(*published[:6]))
+        return published_dt.astimezone(self.timezone)
+
+    def entry_published(self, entry: Dict[str, Any]) -> datetime:
+        """Get when an entry was published, now if the feed doesn't say."""
+        return self.entry_date(entry) or datetime.now(self.timezone)
+
     def parse_entry(self, entry: Dict[str, Any], feed_id: int) -> Optional[Article]:
         """Parse a single feed entry into an Article."""
         try:
-            # Extract published date
-            published = entry.get('published_parsed') or entry.get('updated_parsed')
-            if published:
-                published_dt = datetime(*published[:6])
-                published_dt = pytz.UTC.localize(published_dt)
-                published_dt = published_dt.astimezone(self.timezone)
-            else:
-                published_dt = datetime.now(self.timezone)
+            published_dt = self.entry_published(entry)
 
             # Extract content
             content = None
@@ -49,20 +186,27 @@ class RSSParser:
             elif 'summary' in entry:
                 content = entry.summary
 
-            # Clean description
-            description = entry.get('description')
-            if description:
-                description = clean_html(description)
+            # Sanitize, extract text and normalize once, at ingest
+            started = time.perf_counter()
+            normalized = normalize_article(
+                entry.title,
+                entry.link,
+                entry.get('description'),
+                content
+            )
+            started = observe_entry_stage("normalize", started)
+
+            # The content HTML is stored compressed, apart from the article row
+            body = compress_body(normalized.pop('content'))
+            observe_entry_stage("compress", started)
 
             return Article(
                 feed_id=feed_id,
-                title=entry.title,
-                link=entry.link,
-                description=description,
-                content=content,
                 author=entry.get('author'),
                 published_at=published_dt,
-                is_new=True
+                is_new=True,
+                body=body,
+                **normalized
             )
         except Exception as e:
             logger.error(f"Error parsing entry: {e}")
@@ -70,76 +214,33 @@ class RSSParser:
 
     async def process_feed(self, feed: Feed) -> List[Article]:
         """Process a single feed and return new articles."""
-        parsed = await self.fetch_feed(feed)
-        if not parsed:
-            return []
-
-        new_articles = []
-        # Only process the 20 latest entries
-        for entry in parsed.entries[:20]:
-            article = self.parse_entry(entry, feed.id)
-            if not article:
-                logger.warning(f"Could not parse entry: {entry.get('title', 'No Title')}")
-            else:
-                # Check if article already exists by link OR (title and published_at)
-                existing = self.session.exec(
-                    select(Article).where(
-                        (Article.link == article.link) |
-                        ((Article.title == article.title) & (Article.published_at == article.published_at))
-                    )
-                ).first()
-                if not existing:
-                    new_articles.append(article)
-
-        # Update feed metadata
-        feed.title = parsed.feed.get('title', feed.title)
-        feed.description = parsed.feed.get('description', feed.description)
-        feed.last_updated = datetime.now(self.timezone)
-        self.session.add(feed)
-        
-        # Save all new articles
-        for article in new_articles:
-            self.session.add(article)
-        self.session.commit()
-
-        return new_articles
-
-    async def update_feeds(self) -> int:
-        """Update all active feeds and return number of new articles."""
-        feeds = self.session.exec(
-            select(Feed).where(Feed.is_active == True)
-        ).all()
+        result = await self.refresh_feed(feed)
+        return result.articles
+
+    async def refresh_feed(self, feed: Feed) -> FeedResult:
+        """Fetch a feed, store its new articles and report the outcome."""
+        results = await self.update_feeds([feed])
+        return results[0]
+
+    async def update_feeds(self, feeds: Optional[List[Feed]] = None) -> List[FeedResult]:
+        """Update the given feeds, or all active feeds, and return their results.
+
+        Runs them through a new IngestPipeline; the stages open their own
+        sessions. The parser's session is only used to load the active
+        feeds when none are given, so it should be a read_engine session
+        that doesn't hold on to the writer connection the pipeline needs.
+        """
+        self.skipped_feeds = 0
+        if feeds is None:
+            feeds = self.session.exec(
+                select(Feed).where(Feed.is_active == True)
+            ).all()
 
         if not feeds:
-            return 0
-
-        tasks = [self.process_feed(feed) for feed in feeds]
-        results = await asyncio.gather(*tasks)
-        
-        new_articles = []
-        for articles in results:
-            new_articles.extend(articles)
-
-        # Save all new articles
-        for article in new_articles:
-            self.session.add(article)
-        
-        self.session.commit()
-        return len(new_articles)
-
-    def mark_old_articles(self, session):
-        from .models import Article
-        threshold = datetime.utcnow() - timedelta(hours=24)
-        articles = session.exec(
-            select(Article).where(Article.published_at < threshold, Article.is_new == True)
-        ).all()
-        for article in articles:
-            article.is_new = False
-            session.add(article)
-        session.commit()
-        return len(articles)
-
-def clean_html(raw_html):
-    cleanr = re.compile('<.*?>')
-    cleantext = re.sub(cleanr, '', raw_html)
-    return cleantext 
\ No newline at end of file
+            return []
+
+        pipeline = IngestPipeline(self)
+        results = await pipeline.run(feeds)
+        self.skipped_feeds = sum(result.status == FEED_NOT_MODIFIED for result in results)
+        self.pipeline_stats = pipeline.stats()
+        return results
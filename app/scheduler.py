@@ -1,56 +1,331 @@
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlmodel import Session
+from sqlmodel import Session, select
+from datetime import datetime
+from typing import List, Tuple
 import logging
-from .rss import RSSParser
-from .db import engine
+import time
+from .rss import RSSParser, create_parse_executor
+from .pipeline import FEED_FAILED, FEED_UPDATED, FEED_NOT_MODIFIED, FeedResult
+from .polling import PollSchedule
+from .housekeeping import run_housekeeping
+from .models import Article, Feed
+from .fetcher import FeedClient
+from .realtime import manager, new_articles_message
+from .cache import response_cache
+from .db import engine, lease_engine, read_engine
+from .jobs import JOB_DONE, JOB_FETCH_FEED, JOB_PENDING, claim_jobs, complete_job, fail_job
+from .leases import (
+    LEADER_LEASE, acquire_leases, feed_lease, hold_leases, lease_holder, release_leases
+)
+from .metrics import JOB_SECONDS, JOB_SKIPPED, QUEUED_JOBS, SCHEDULER_LEADER
+from .tracing import span
+from .profiling import profiler
 from .core.config import settings
 
 logger = logging.getLogger(__name__)
 
 class FeedScheduler:
+    """Runs the feed refresh and housekeeping jobs.
+
+    Every worker process starts one, but only the holder of the scheduler
+    lease runs the jobs; the others keep trying to take the lease over.
+    With SCHEDULER_PARTITION_FEEDS every worker refreshes feeds instead,
+    each claiming the due feeds through per-feed leases, and only
+    housekeeping is left to the leader.
+
+    Every worker also runs the jobs queued through the API, see
+    app/jobs.py.
+    """
+
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
-        self.parser = None
+        self.client = None
+        self.executor = None
+        self.schedule = PollSchedule()
+        self.holder = None
+        self.leading = False
+        self.lease_expires = 0.0  # time.monotonic()
+        # Whether run_jobs_job is claiming jobs, so waking it is pointless
+        self.draining = False
+
+    def claim_feeds(self, feeds: List[Feed]) -> List[Feed]:
+        """Lease due feeds so no other worker fetches them at the same time.
+
+        Feeds another worker holds come due again on the next tick, and
+        are picked up once its lease runs out.
+        """
+        by_lease = {feed_lease(feed.id): feed for feed in feeds}
+        with lease_engine.begin() as conn:
+            held = acquire_leases(conn, by_lease, self.holder, settings.FEED_LEASE_SECONDS)
+        return [by_lease[name] for name in held]
+
+    def hold_feeds(self, feeds: List[Feed]):
+        """Keep fetched feeds leased until they are due again here."""
+        holds = {}
+        released = []
+        for feed in feeds:
+            seconds = self.schedule.seconds_until_due(feed.id)
+            if seconds is None:
+                released.append(feed_lease(feed.id))
+            else:
+                holds[feed_lease(feed.id)] = seconds
+        with lease_engine.begin() as conn:
+            hold_leases(conn, holds, self.holder)
+            release_leases(conn, released, self.holder)
 
     async def update_feeds_job(self):
-        """Job to update all feeds."""
+        """Job to update the feeds that are due."""
+        with JOB_SECONDS.labels("update_feeds").time(), span("ingest_cycle"), profiler.job("update_feeds"):
+            try:
+                # Load the feeds through a reader, which doesn't wait on the
+                # writer connection, and let it go before refreshing them
+                with Session(read_engine) as session:
+                    feeds = session.exec(select(Feed).where(Feed.is_active)).all()
+                self.schedule.sync(feed.id for feed in feeds)
+                due = set(self.schedule.pop_due())
+                due_feeds = [feed for feed in feeds if feed.id in due]
+                if settings.SCHEDULER_PARTITION_FEEDS:
+                    due_feeds = self.claim_feeds(due_feeds)
+                if not due_feeds:
+                    return
+
+                parser = RSSParser(
+                    None,
+                    client=self.client,
+                    executor=self.executor
+                )
+                results = await parser.update_feeds(due_feeds)
+                new_articles, failed = self.record_results(results)
+                if settings.SCHEDULER_PARTITION_FEEDS:
+                    self.hold_feeds(due_feeds)
+
+                logger.info(
+                    f"Refreshed {len(due_feeds)} due feeds in "
+                    f"{parser.pipeline_stats['write_batches']} write batches"
+                )
+                if new_articles:
+                    logger.info(f"Added {len(new_articles)} new articles")
+                    await manager.broadcast(new_articles_message(new_articles))
+                if parser.skipped_feeds > 0:
+                    logger.info(f"Skipped {parser.skipped_feeds} unchanged feeds")
+                if failed > 0:
+                    logger.info(f"Failed to fetch {failed} feeds")
+
+                # Feeds and articles changed, drop cached listings
+                response_cache.invalidate()
+
+            except Exception as e:
+                logger.error(f"Error in update_feeds_job: {e}")
+
+    def record_results(self, results: List[FeedResult]) -> Tuple[List[Article], int]:
+        """Reschedule refreshed feeds from their results, and get the new
+        articles and the number of feeds that failed."""
+        new_articles = []
+        failed = 0
+        for result in results:
+            if result.status == FEED_UPDATED:
+                self.schedule.record_success(result.feed_id, result.published)
+                new_articles.extend(result.articles)
+            elif result.status == FEED_NOT_MODIFIED:
+                self.schedule.record_not_modified(result.feed_id)
+            else:
+                self.schedule.record_failure(result.feed_id)
+                failed += 1
+        return new_articles, failed
+
+    async def run_jobs_job(self):
+        """Job to run queued jobs, a batch at a time until none are due."""
+        with JOB_SECONDS.labels("jobs").time():
+            self.draining = True
+            try:
+                while await self.run_jobs():
+                    pass
+            except Exception as e:
+                logger.error(f"Error in run_jobs_job: {e}")
+            finally:
+                self.draining = False
+
+    async def run_jobs(self) -> int:
+        """Claim a batch of queued jobs and run them, and return how many
+        there were.
+
+        The batch's feeds go through one ingest pipeline on the shared
+        client, so a burst of queued fetches is bounded by the pipeline's
+        workers rather than taking a thread each.
+        """
+        with lease_engine.begin() as conn:
+            jobs = claim_jobs(conn, self.holder, settings.JOB_BATCH_SIZE)
+        if not jobs:
+            return 0
+
+        feed_ids = {job.feed_id for job in jobs if job.kind == JOB_FETCH_FEED}
+        with Session(read_engine) as session:
+            feeds = session.exec(select(Feed).where(Feed.id.in_(feed_ids))).all()
+        parser = RSSParser(None, client=self.client, executor=self.executor)
+        results = await parser.update_feeds(feeds)
+        new_articles, _ = self.record_results(results)
+
+        by_feed = {result.feed_id: result for result in results}
+        with lease_engine.begin() as conn:
+            for job in jobs:
+                result = by_feed.get(job.feed_id)
+                if job.kind != JOB_FETCH_FEED:
+                    status = fail_job(conn, job, self.holder, f"Unknown job kind: {job.kind}", retry=False)
+                elif result is None:
+                    status = fail_job(conn, job, self.holder, "Feed not found", retry=False)
+                elif result.status == FEED_FAILED:
+                    status = fail_job(conn, job, self.holder, "Could not fetch the feed")
+                else:
+                    status = JOB_DONE if complete_job(conn, job, self.holder) else None
+                if status is not None:
+                    QUEUED_JOBS.labels(job.kind, "retried" if status == JOB_PENDING else status).inc()
+
+        logger.info(f"Ran {len(jobs)} queued jobs")
+        if new_articles:
+            logger.info(f"Added {len(new_articles)} new articles")
+            await manager.broadcast(new_articles_message(new_articles))
+        if results:
+            response_cache.invalidate()
+        return len(jobs)
+
+    def wake_jobs(self):
+        """Run queued jobs now instead of at the next poll. May be called
+        from any thread."""
+        if self.scheduler.running and not self.draining:
+            self.scheduler.modify_job('jobs', next_run_time=datetime.now())
+
+    def housekeeping_job(self):
+        """Job to expire, purge and vacuum old articles.
+
+        A plain function, so APScheduler runs it in a worker thread and the
+        batched deletes don't block the event loop.
+        """
+        with JOB_SECONDS.labels("housekeeping").time():
+            try:
+                report = run_housekeeping(engine)
+                if report.changed:
+                    response_cache.invalidate()
+            except Exception as e:
+                logger.error(f"Error in housekeeping_job: {e}")
+
+    def leadership_job(self):
+        """Job to take or renew the scheduler lease, and start or stop
+        running the scheduled jobs to match.
+
+        A plain function, so a slow write by another process doesn't block
+        the event loop.
+        """
+        renewing_at = time.monotonic()
         try:
-            with Session(engine) as session:
-                if not self.parser:
-                    self.parser = RSSParser(session)
-                
-                new_articles = await self.parser.update_feeds()
-                if new_articles > 0:
-                    logger.info(f"Added {new_articles} new articles")
-                
-                # Mark old articles as not new
-                old_count = self.parser.mark_old_articles(session)
-                if old_count > 0:
-                    logger.info(f"Marked {old_count} articles as not new")
-        
+            with lease_engine.begin() as conn:
+                leading = LEADER_LEASE in acquire_leases(
+                    conn, [LEADER_LEASE], self.holder, settings.SCHEDULER_LEASE_SECONDS
+                )
+            if leading:
+                self.lease_expires = renewing_at + settings.SCHEDULER_LEASE_SECONDS
         except Exception as e:
-            logger.error(f"Error in update_feeds_job: {e}")
+            logger.error(f"Error in leadership_job: {e}")
+            # No other worker can take the lease before it expires
+            leading = self.leading and time.monotonic() < self.lease_expires
+
+        if leading and not self.leading:
+            self.lead()
+        elif not leading and self.leading:
+            self.follow()
+
+    def skipped_run(self, event):
+        """Count a run APScheduler skipped, because the job's previous run
+        was still going or the run started too late."""
+        reason = "overlap" if event.code == EVENT_JOB_MAX_INSTANCES else "missed"
+        JOB_SKIPPED.labels(event.job_id, reason).inc()
+
+    def lead(self):
+        """Start running the jobs only one worker may run."""
+        self.leading = True
+        SCHEDULER_LEADER.set(1)
+        if not settings.SCHEDULER_PARTITION_FEEDS:
+            self.add_update_feeds_job()
+        self.scheduler.add_job(
+            self.housekeeping_job,
+            trigger=IntervalTrigger(
+                minutes=settings.HOUSEKEEPING_INTERVAL_MINUTES
+            ),
+            id='housekeeping',
+            replace_existing=True
+        )
+        logger.info(f"Took the scheduler lease as {self.holder}")
+
+    def follow(self):
+        """Stop running the leader's jobs after losing the lease."""
+        self.leading = False
+        SCHEDULER_LEADER.set(0)
+        if not settings.SCHEDULER_PARTITION_FEEDS:
+            self.scheduler.remove_job('update_feeds')
+        self.scheduler.remove_job('housekeeping')
+        logger.warning(f"Lost the scheduler lease, {self.holder} stops scheduling")
+
+    def add_update_feeds_job(self):
+        self.scheduler.add_job(
+            self.update_feeds_job,
+            trigger=IntervalTrigger(
+                seconds=settings.RSS_POLL_TICK_SECONDS
+            ),
+            # Run the first dispatch right away rather than after one tick
+            next_run_time=datetime.now(),
+            id='update_feeds',
+            replace_existing=True
+        )
 
     def start(self):
         """Start the scheduler."""
         if not self.scheduler.running:
+            self.client = FeedClient()
+            self.executor = create_parse_executor()
+            self.holder = lease_holder()
+            if settings.SCHEDULER_PARTITION_FEEDS:
+                self.add_update_feeds_job()
+            self.scheduler.add_job(
+                self.run_jobs_job,
+                trigger=IntervalTrigger(
+                    seconds=settings.JOB_POLL_SECONDS
+                ),
+                # Pick up jobs left over from before a restart
+                next_run_time=datetime.now(),
+                id='jobs',
+                replace_existing=True
+            )
             self.scheduler.add_job(
-                self.update_feeds_job,
+                self.leadership_job,
                 trigger=IntervalTrigger(
-                    minutes=settings.RSS_UPDATE_INTERVAL_MINUTES
+                    seconds=settings.SCHEDULER_LEASE_RENEW_SECONDS
                 ),
-                id='update_feeds',
+                next_run_time=datetime.now(),
+                id='leadership',
                 replace_existing=True
             )
+            self.scheduler.add_listener(self.skipped_run, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
             self.scheduler.start()
-            logger.info("Feed scheduler started")
+            logger.info(f"Feed scheduler started as {self.holder}")
 
-    def shutdown(self):
-        """Shutdown the scheduler."""
+    async def shutdown(self):
+        """Shutdown the scheduler and close the shared HTTP client."""
         if self.scheduler.running:
             self.scheduler.shutdown()
             logger.info("Feed scheduler shutdown")
+        if self.leading:
+            # Let another worker take over without waiting for the lease to expire
+            with lease_engine.begin() as conn:
+                release_leases(conn, [LEADER_LEASE], self.holder)
+            self.leading = False
+            SCHEDULER_LEADER.set(0)
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
 
 # Create global scheduler instance
-scheduler = FeedScheduler() 
\ No newline at end of file
+scheduler = FeedScheduler()
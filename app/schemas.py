@@ -7,6 +7,8 @@ class FeedBase(BaseModel):
     url: str
     title: str
     description: Optional[str] = None
+    # Days to keep articles, None for the global retention, 0 keeps them forever
+    retention_days: Optional[int] = Field(default=None, ge=0)
 
 class FeedCreate(FeedBase):
     pass
@@ -15,6 +17,7 @@ class FeedUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     is_active: Optional[bool] = None
+    retention_days: Optional[int] = Field(default=None, ge=0)
 
 class FeedInDB(FeedBase):
     id: int
@@ -51,17 +54,93 @@ class ArticleInDB(ArticleBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     is_new: bool
+    canonical_link: Optional[str] = None
+    content_text: Optional[str] = None
+    excerpt: Optional[str] = None
+    word_count: int = 0
+    reading_time_minutes: int = 0
+    # Highlighted match excerpt, only set for search results
+    snippet: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+# Compact feed reference embedded in article listings
+class FeedRef(BaseModel):
+    id: int
+    title: str
+
+    class Config:
+        from_attributes = True
+
+# Article as it appears in listings; fields left out with ?fields= are omitted.
+# The content HTML is only returned by GET /articles/{id}.
+class ArticleSummary(BaseModel):
+    id: int
+    feed_id: Optional[int] = None
+    feed: Optional[FeedRef] = None
+    title: Optional[str] = None
+    link: Optional[str] = None
+    description: Optional[str] = None
+    author: Optional[str] = None
+    published_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    is_new: Optional[bool] = None
+    canonical_link: Optional[str] = None
+    content_text: Optional[str] = None
+    excerpt: Optional[str] = None
+    word_count: Optional[int] = None
+    reading_time_minutes: Optional[int] = None
+    # Lead article of the story this one copies, None if it is the lead
+    story_id: Optional[int] = None
+    # Copies folded into this article, only with ?collapse_duplicates=true
+    duplicates: Optional[int] = None
+    snippet: Optional[str] = None
+
 # Response Schemas
 class PaginatedResponse(BaseModel):
-    total: int
+    # total and pages are None when the count was not requested
+    total: Optional[int] = None
     page: int
     size: int
-    pages: int
-    items: List[ArticleInDB]
+    pages: Optional[int] = None
+    items: List[ArticleSummary]
+    # Pass back as ?cursor= to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+# One entry of the change feed; article is None for deletions
+class ArticleChange(BaseModel):
+    seq: int
+    id: int
+    feed_id: int
+    deleted: bool
+    article: Optional[ArticleSummary] = None
+
+class ArticleChanges(BaseModel):
+    changes: List[ArticleChange]
+    # Pass back as ?since= to get the changes after these
+    next_since: int
+    has_more: bool
+
+# Job Schemas
+class JobInDB(BaseModel):
+    id: int
+    kind: str
+    feed_id: Optional[int] = None
+    priority: int
+    # pending, running, done or failed
+    status: str
+    attempts: int
+    max_attempts: int
+    # When a pending job may run, later than created_at when retrying
+    run_after: datetime
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
 
 # Query Parameters
 class ArticleQueryParams(BaseModel):
@@ -71,4 +150,12 @@ class ArticleQueryParams(BaseModel):
     search: Optional[str] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
-    is_new: Optional[bool] = None 
\ No newline at end of file
+    is_new: Optional[bool] = None
+    # Opaque cursor from a previous response; takes precedence over page
+    cursor: Optional[str] = None
+    # Skip the COUNT(*) when the caller doesn't need totals
+    include_total: bool = True
+    # Comma-separated item fields to return; defaults to all but content_text
+    fields: Optional[str] = None
+    # Only return the lead article of each story, not its copies
+    collapse_duplicates: bool = False
@@ -0,0 +1,148 @@
+import re
+import sys
+import logging
+from typing import Dict, Iterable
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+from .normalize import normalize_persian
+
+logger = logging.getLogger(__name__)
+
+# FTS5 index over the article text, kept in sync with the article table by
+# triggers. unicode61 splits on anything that isn't a letter, digit or
+# combining mark, so the Persian half-space (ZWNJ) separates tokens:
+# "بیت‌کوین" matches both "بیت‌کوین" and "بیت کوین". Combining marks are
+# token characters so diacritics don't split a word in two. Content is
+# indexed from the plain-text column so markup never becomes tokens.
+FTS_TOKENIZER = "unicode61 remove_diacritics 2 categories 'L* N* Co Mn'"
+
+# Relative bm25 weights of the title, description and content_text columns
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+article_fts = table(
+    "article_fts",
+    column("rowid"),
+    column("title"),
+    column("description"),
+    column("content_text"),
+)
+
+_fts = literal_column("article_fts")
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5(
+        title, description, content_text,
+        content='article', content_rowid='id',
+        tokenize="{FTS_TOKENIZER}"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_ai AFTER INSERT ON article BEGIN
+        INSERT INTO article_fts(rowid, title, description, content_text)
+        VALUES (new.id, new.title, new.description, new.content_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_ad AFTER DELETE ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, title, description, content_text)
+        VALUES ('delete', old.id, old.title, old.description, old.content_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS article_fts_au
+    AFTER UPDATE OF title, description, content_text ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, title, description, content_text)
+        VALUES ('delete', old.id, old.title, old.description, old.content_text);
+        INSERT INTO article_fts(rowid, title, description, content_text)
+        VALUES (new.id, new.title, new.description, new.content_text);
+    END""",
+]
+
+_token_re = re.compile(r"\w+")
+
+
+def create_search_index(connection: Connection) -> bool:
+    """Create the FTS table and its sync triggers if they don't exist.
+
+    Returns True when the index was newly created and needs a backfill.
+    """
+    exists = connection.execute(
+        text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_fts'"
+        )
+    ).first()
+    for statement in FTS_DDL:
+        connection.execute(text(statement))
+    return exists is None
+
+
+def drop_search_index(connection: Connection):
+    """Drop the FTS table and its triggers, e.g. to change its columns."""
+    for trigger in ("article_fts_ai", "article_fts_ad", "article_fts_au"):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text("DROP TABLE IF EXISTS article_fts"))
+
+
+def rebuild_search_index(connection: Connection):
+    """Rebuild the whole FTS index from the article table."""
+    connection.execute(text("INSERT INTO article_fts(article_fts) VALUES ('rebuild')"))
+    logger.info("Search index rebuilt")
+
+
+def build_match_query(search: str) -> str:
+    """Turn free text into an FTS5 query.
+
+    Every word must match, as a prefix, so partial words still find results
+    the way the old substring search did. Words are quoted so user input
+    can't inject FTS5 query syntax.
+    """
+    tokens = _token_re.findall(normalize_persian(search))
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def match_clause(search: str):
+    """Build the MATCH condition for a search term."""
+    return _fts.op("MATCH")(build_match_query(search))
+
+
+def rank():
+    """bm25 relevance of the current match; lower is better."""
+    return func.bm25(_fts, *FTS_WEIGHTS)
+
+
+def search_snippets_statement(article_ids: Iterable[int], search: str):
+    """Build the query for highlighted snippets of matched articles.
+
+    Returns None when there is nothing to look up.
+    """
+    article_ids = list(article_ids)
+    query = build_match_query(search)
+    if not article_ids or not query:
+        return None
+
+    return select(
+        article_fts.c.rowid, func.snippet(_fts, -1, "<mark>", "</mark>", "…", 16)
+    ).where(_fts.op("MATCH")(query), article_fts.c.rowid.in_(article_ids))
+
+
+def get_search_snippets(
+    session: Session, article_ids: Iterable[int], search: str
+) -> Dict[int, str]:
+    """Get highlighted snippets for matched articles."""
+    statement = search_snippets_statement(article_ids, search)
+    if statement is None:
+        return {}
+    return {article_id: snippet for article_id, snippet in session.exec(statement)}
+
+
+def main():
+    """Command line entry point: python -m app.search rebuild"""
+    from . import models  # noqa: F401  (registers the tables)
+    from .db import engine, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.search rebuild")
+        sys.exit(1)
+
+    init_db()
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+from typing import List, Optional
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+from feedparser.datetimes import _parse_date
+from feedparser.util import FeedParserDict
+
+# Root elements of RSS 2.0, RSS 1.0 (RDF) and Atom documents
+FEED_ROOTS = {"rss", "RDF", "feed"}
+# Elements holding the feed-level title and description
+FEED_HEADERS = {"channel", "feed"}
+ENTRY_TAGS = {"item", "entry"}
+
+
+class UnsupportedFeed(Exception):
+    """The document is something the streaming parser doesn't handle."""
+
+
+def local_name(tag: str) -> str:
+    """Strip the namespace from an element tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def element_text(element: Element) -> Optional[str]:
+    """Get the text of a simple element.
+
+    Raises UnsupportedFeed for elements with markup inside (unescaped
+    XHTML), which only feedparser turns back into a string properly.
+    """
+    if len(element):
+        raise UnsupportedFeed(f"Markup inside <{local_name(element.tag)}>")
+    text = (element.text or "").strip()
+    return text or None
+
+
+def parse_entry_element(element: Element) -> FeedParserDict:
+    """Turn an <item> or <entry> into the dict feedparser would produce."""
+    entry = FeedParserDict()
+    for child in element:
+        name = local_name(child.tag)
+        if name == "link":
+            href = child.get("href")
+            if href is None:
+                entry.setdefault("link", element_text(child))
+            elif child.get("rel", "alternate") == "alternate":
+                entry.setdefault("link", href)
+        elif name == "guid":
+            if child.get("isPermaLink", "true") == "true":
+                entry.setdefault("guid_link", element_text(child))
+        elif name == "title":
+            entry["title"] = element_text(child)
+        elif name in ("description", "summary"):
+            entry["summary"] = element_text(child)
+        elif name in ("encoded", "content"):
+            if child.get("type") == "xhtml":
+                raise UnsupportedFeed("XHTML content")
+            entry["content"] = [
+                FeedParserDict(value=element_text(child), type="text/html")
+            ]
+        elif name in ("author", "creator"):
+            if len(child):
+                # Atom: <author><name>...</name></author>
+                names = [c for c in child if local_name(c.tag) == "name"]
+                author = element_text(names[0]) if names else None
+            else:
+                author = element_text(child)
+            entry.setdefault("author", author)
+        elif name in ("pubDate", "published", "issued"):
+            entry["published"] = element_text(child)
+            entry["published_parsed"] = _parse_date(entry["published"] or "")
+        elif name in ("updated", "modified", "date"):
+            entry["updated"] = element_text(child)
+            entry["updated_parsed"] = _parse_date(entry["updated"] or "")
+
+    # Like feedparser, fall back to a permalink guid when there's no link
+    guid_link = entry.pop("guid_link", None)
+    if not entry.get("link") and guid_link:
+        entry["link"] = guid_link
+    return entry
+
+
+class StreamingFeedParser:
+    """Incremental RSS/Atom parser that stops after the first N entries.
+
+    Chunks are fed as they arrive from the network, entries are built as
+    soon as their closing tag is read and then dropped from the tree, so
+    memory stays flat however long the document is. Once max_entries are
+    parsed, `done` is set and the rest of the body doesn't need to be
+    downloaded. Anything unusual raises UnsupportedFeed so the caller can
+    fall back to feedparser.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.parser = XMLPullParser(events=("start", "end"))
+        self.stack: List[Element] = []
+        self.feed_info = FeedParserDict()
+        self.entries: List[FeedParserDict] = []
+
+    @property
+    def done(self) -> bool:
+        return len(self.entries) >= self.max_entries
+
+    def feed(self, chunk: bytes):
+        """Parse the next chunk of the document."""
+        try:
+            self.parser.feed(chunk)
+            self._read_events()
+        except ParseError as e:
+            raise UnsupportedFeed(f"Invalid XML: {e}") from e
+
+    def close(self) -> FeedParserDict:
+        """Finish a document that ended before max_entries were found."""
+        if not self.done:
+            try:
+                self.parser.close()
+                self._read_events()
+            except ParseError as e:
+                raise UnsupportedFeed(f"Invalid XML: {e}") from e
+        if not self.stack and not self.entries and not self.feed_info:
+            raise UnsupportedFeed("Empty document")
+        return self.result()
+
+    def result(self) -> FeedParserDict:
+        """Get what was parsed so far, shaped like feedparser's result."""
+        return FeedParserDict(
+            feed=self.feed_info, entries=self.entries[: self.max_entries], bozo=False
+        )
+
+    def _read_events(self):
+        for event, element in self.parser.read_events():
+            if self.done:
+                return
+            name = local_name(element.tag)
+            if event == "start":
+                if not self.stack and name not in FEED_ROOTS:
+                    raise UnsupportedFeed(f"Not a feed: <{name}>")
+                self.stack.append(element)
+                continue
+
+            self.stack.pop()
+            parent = local_name(self.stack[-1].tag) if self.stack else None
+            if name in ENTRY_TAGS:
+                self.entries.append(parse_entry_element(element))
+                # The entry is built, let its subtree go
+                element.clear()
+                self.stack[-1].remove(element)
+            elif parent in FEED_HEADERS and not self.entries:
+                if name == "title":
+                    self.feed_info["title"] = element_text(element)
+                elif name in ("description", "subtitle"):
+                    self.feed_info["subtitle"] = element_text(element)
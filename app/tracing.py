@@ -0,0 +1,46 @@
+import logging
+from contextlib import nullcontext
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Spans around an ingest cycle: the cycle, each feed refresh and its
+# stages. They go through the optional OpenTelemetry API to whatever SDK
+# and exporter the deployment configures. With TRACING_ENABLED off, or
+# the API not installed, span() hands back a shared no-op context, so the
+# instrumented code costs one function call.
+
+NO_SPAN = nullcontext()
+
+
+def opentelemetry_available() -> bool:
+    """Check whether the optional OpenTelemetry API is installed."""
+    try:
+        import opentelemetry.trace  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_tracer():
+    """Get the tracer spans are opened with, None when tracing is off."""
+    if not settings.TRACING_ENABLED:
+        return None
+    if not opentelemetry_available():
+        logger.warning(
+            "TRACING_ENABLED is set but 'opentelemetry-api' is not installed, tracing is off"
+        )
+        return None
+    from opentelemetry import trace
+
+    return trace.get_tracer("bitpulse")
+
+
+tracer = create_tracer()
+
+
+def span(name: str, **attributes):
+    """Open a span as a child of the current one."""
+    if tracer is None:
+        return NO_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
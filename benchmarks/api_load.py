@@ -0,0 +1,191 @@
+"""Compare API throughput of the sync (threadpool) and async database paths.
+
+Seeds a throwaway database, serves the article listing and detail queries
+through both a sync `def` endpoint on the threadpool (the old path) and an
+`async def` endpoint on the aiosqlite session, and drives each with the
+same concurrent load.
+
+Usage:
+    python -m benchmarks.api_load --articles 20000 --concurrency 100 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Keep the benchmark away from the real database
+os.environ["SQLITE_DB_PATH"] = tempfile.mktemp(suffix=".db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import Depends, FastAPI, HTTPException  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+from app import async_crud, crud  # noqa: E402
+from app.bodies import compress_body  # noqa: E402
+from app.db import (  # noqa: E402
+    engine,
+    get_async_read_session,
+    get_read_session,
+    init_db,
+)
+from app.models import Article, Feed  # noqa: E402
+from app.schemas import ArticleInDB, ArticleQueryParams, PaginatedResponse  # noqa: E402
+
+
+def seed(articles: int):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        feeds = [
+            Feed(url=f"https://example.com/{i}.xml", title=f"Feed {i}")
+            for i in range(20)
+        ]
+        session.add_all(feeds)
+        session.commit()
+        for i in range(articles):
+            session.add(
+                Article(
+                    feed_id=feeds[i % 20].id,
+                    title=f"Bitcoin market story {i}",
+                    link=f"https://example.com/story/{i}",
+                    description="Market update " * 20,
+                    body=compress_body("<p>Full article body</p>" * 100),
+                    published_at=now - timedelta(minutes=i),
+                    is_new=i < 500,
+                )
+            )
+        session.commit()
+
+
+def to_response(results, total, next_cursor, params) -> PaginatedResponse:
+    return PaginatedResponse(
+        total=total,
+        page=params.page,
+        size=params.size,
+        pages=(total + params.size - 1) // params.size if total is not None else None,
+        items=crud.article_summaries(results, crud.article_fields(params)),
+        next_cursor=next_cursor,
+    )
+
+
+bench = FastAPI()
+
+
+@bench.get("/sync/articles", response_model=PaginatedResponse)
+def sync_articles(
+    params: ArticleQueryParams = Depends(), session: Session = Depends(get_read_session)
+):
+    return to_response(*crud.get_articles(session, params), params)
+
+
+@bench.get("/sync/articles/{article_id}", response_model=ArticleInDB)
+def sync_article(article_id: int, session: Session = Depends(get_read_session)):
+    article = crud.get_article(session, article_id)
+    if not article:
+        raise HTTPException(status_code=404)
+    return article
+
+
+@bench.get("/async/articles", response_model=PaginatedResponse)
+async def async_articles(
+    params: ArticleQueryParams = Depends(),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    return to_response(*await async_crud.get_articles(session, params), params)
+
+
+@bench.get("/async/articles/{article_id}", response_model=ArticleInDB)
+async def async_article(
+    article_id: int, session: AsyncSession = Depends(get_async_read_session)
+):
+    article = await async_crud.get_article(session, article_id)
+    if not article:
+        raise HTTPException(status_code=404)
+    return article
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive(
+    base_url: str, prefix: str, articles: int, concurrency: int, duration: float
+) -> dict:
+    """Hit the endpoints with a fixed number of concurrent clients."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            if random.random() < 0.7:
+                url = f"{prefix}/articles?page={random.randint(1, 5)}&size=20"
+            else:
+                url = f"{prefix}/articles/{random.randint(1, articles)}"
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.articles)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(bench, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    print(
+        f"{args.articles} articles, {args.concurrency} concurrent clients, {args.duration:.0f}s per path"
+    )
+    print(f"{'path':<8}{'req/s':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}{'errors':>8}")
+    for prefix in ("/sync", "/async"):
+        result = asyncio.run(
+            drive(base_url, prefix, args.articles, args.concurrency, args.duration)
+        )
+        print(
+            f"{prefix[1:]:<8}{result['rps']:>10.0f}{result['p50_ms']:>12.1f}"
+            f"{result['p99_ms']:>12.1f}{result['errors']:>8}"
+        )
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
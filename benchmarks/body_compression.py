@@ -0,0 +1,183 @@
+"""Measure what compressed article bodies save in space and list query time.
+
+Seeds a throwaway database through the normal ingest path (bodies
+compressed into article_body), then builds a copy with the old layout, the
+HTML inline in article.content, and compares the two: file size, pages
+held by the article table, and a cold-cache full scan of the listing
+columns. Also reports the compressed size per body for each codec, with
+and without a dictionary trained on the seeded corpus, and the cost of
+decompressing one body.
+
+Usage:
+    python -m benchmarks.body_compression --articles 20000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Keep the benchmark away from the real database
+os.environ["SQLITE_DB_PATH"] = tempfile.mktemp(suffix=".db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session  # noqa: E402
+from app import bodies  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.crud import bulk_insert_articles  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.models import Article, CompressionDictionary, Feed  # noqa: E402
+from app.normalize import normalize_article  # noqa: E402
+from benchmarks.normalize import build_entry  # noqa: E402
+
+LIST_SCAN = (
+    "SELECT id, feed_id, title, link, description, author, published_at, "
+    "excerpt, word_count FROM article ORDER BY published_at DESC"
+)
+
+
+def seed(articles: int) -> list:
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        feed = Feed(url="https://example.com/feed.xml", title="Feed")
+        session.add(feed)
+        session.commit()
+        html = []
+        batch = []
+        for i in range(articles):
+            # Vary the body so it doesn't compress unrealistically well
+            entry = build_entry(i, paragraphs=6 + i % 12)
+            entry["link"] = f"https://example.com/story/{i}"
+            normalized = normalize_article(**entry)
+            html.append(normalized["content"])
+            batch.append(
+                Article(
+                    feed_id=feed.id,
+                    published_at=now - timedelta(minutes=i),
+                    body=bodies.compress_body(normalized.pop("content")),
+                    **normalized,
+                )
+            )
+            if len(batch) == 500:
+                bulk_insert_articles(session, batch)
+                session.commit()
+                batch = []
+        bulk_insert_articles(session, batch)
+        session.commit()
+    return html
+
+
+def inline_copy(path: str, html: list) -> str:
+    """Copy the database with the HTML back inside the article table."""
+    copy = path + ".inline"
+    conn = sqlite3.connect(path)
+    conn.execute(f"VACUUM INTO '{copy}'")
+    conn.close()
+    conn = sqlite3.connect(copy)
+    conn.execute("ALTER TABLE article ADD COLUMN content VARCHAR")
+    conn.executemany(
+        "UPDATE article SET content = ? WHERE id = ?",
+        [(body, article_id) for article_id, body in enumerate(html, start=1)],
+    )
+    conn.execute("DROP TABLE article_body")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return copy
+
+
+def layout_stats(path: str, rounds: int = 5) -> dict:
+    conn = sqlite3.connect(path)
+    pages = conn.execute(
+        "SELECT count(*) FROM dbstat WHERE name = 'article'"
+    ).fetchone()[0]
+    conn.close()
+    times = []
+    for _ in range(rounds):
+        # A new connection with a tiny cache and no mmap reads from disk
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA cache_size = 16")
+        conn.execute("PRAGMA mmap_size = 0")
+        started = time.perf_counter()
+        conn.execute(LIST_SCAN).fetchall()
+        times.append(time.perf_counter() - started)
+        conn.close()
+    return {
+        "mb": os.path.getsize(path) / 1_000_000,
+        "pages": pages,
+        "scan_ms": sorted(times)[rounds // 2] * 1000,
+    }
+
+
+def codec_stats(html: list, codec: bodies.BodyCodec, dictionary: bytes = None) -> dict:
+    compressed = [codec.compress(body) for body in html]
+    started = time.perf_counter()
+    for body in compressed:
+        bodies.decompress_body(body, dictionary)
+    elapsed = time.perf_counter() - started
+    return {
+        "bytes": sum(len(body.data) for body in compressed) / len(compressed),
+        "decompress_us": elapsed / len(compressed) * 1e6,
+    }
+
+
+def trained_codec(codec_name: str, html: list, size: int) -> bodies.BodyCodec:
+    samples = [body.encode("utf-8") for body in html[:1000]]
+    if codec_name == bodies.ZSTD:
+        import zstandard
+
+        data = zstandard.train_dictionary(size, samples).as_bytes()
+    else:
+        data = bodies.build_zlib_dictionary(
+            samples, min(size, bodies.ZLIB_MAX_DICTIONARY)
+        )
+    return bodies.BodyCodec(
+        codec_name, CompressionDictionary(id=1, codec=codec_name, data=data)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--dictionary-size", type=int, default=32 * 1024)
+    args = parser.parse_args()
+
+    init_db()
+    html = seed(args.articles)
+    path = str(settings.SQLITE_DB_PATH)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+    raw_kb = sum(len(body.encode("utf-8")) for body in html) / len(html) / 1024
+    print(f"{args.articles} articles, {raw_kb:.1f} KB of content HTML each")
+
+    print(
+        f"{'layout':<12}{'DB (MB)':>10}{'article pages':>15}{'cold list scan (ms)':>21}"
+    )
+    for name, layout_path in (
+        ("inline", inline_copy(path, html)),
+        ("side table", path),
+    ):
+        stats = layout_stats(layout_path)
+        print(
+            f"{name:<12}{stats['mb']:>10.1f}{stats['pages']:>15}{stats['scan_ms']:>21.1f}"
+        )
+
+    codecs = [bodies.ZLIB] + ([bodies.ZSTD] if bodies.zstd_available() else [])
+    print(f"\n{'codec':<12}{'bytes/body':>12}{'ratio':>8}{'decompress (us)':>17}")
+    for codec_name in codecs:
+        plain = bodies.BodyCodec(codec_name)
+        trained = trained_codec(codec_name, html, args.dictionary_size)
+        for name, codec in ((codec_name, plain), (f"{codec_name}+dict", trained)):
+            dictionary = codec.dictionary.data if codec.dictionary else None
+            stats = codec_stats(html, codec, dictionary)
+            ratio = raw_kb * 1024 / stats["bytes"]
+            print(
+                f"{name:<12}{stats['bytes']:>12.0f}{ratio:>8.1f}{stats['decompress_us']:>17.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Compare the size and cost of an /articles page before and after sparse listings.
+
+Seeds a throwaway database with articles carrying realistic content, then
+builds the same page two ways: the old one (full rows, ArticleInDB with a
+nested FeedInDB, pydantic JSON) and the current one (deferred columns, plain
+dicts with a compact feed reference, orjson). Reports bytes per page, the
+time spent loading rows and the time spent serializing them.
+
+Usage:
+    python -m benchmarks.list_payload --articles 5000 --size 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Keep the benchmark away from the real database
+os.environ["SQLITE_DB_PATH"] = tempfile.mktemp(suffix=".db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+from app import crud  # noqa: E402
+from app.bodies import compress_body  # noqa: E402
+from app.db import engine, init_db, read_engine  # noqa: E402
+from app.models import Article, Feed  # noqa: E402
+from app.schemas import ArticleInDB, ArticleQueryParams, FeedInDB  # noqa: E402
+
+full_page_adapter = TypeAdapter(List[ArticleInDB])
+
+
+def seed(articles: int):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        feeds = [
+            Feed(
+                url=f"https://example.com/{i}.xml",
+                title=f"Feed {i}",
+                description="Crypto news " * 20,
+            )
+            for i in range(20)
+        ]
+        session.add_all(feeds)
+        session.commit()
+        for i in range(articles):
+            session.add(
+                Article(
+                    feed_id=feeds[i % 20].id,
+                    title=f"بیت‌کوین از مرز تازه‌ای عبور کرد {i}",
+                    link=f"https://example.com/story/{i}",
+                    description="خلاصه خبر بازار رمزارز " * 15,
+                    body=compress_body(
+                        "<p>متن کامل خبر درباره بازار بیت‌کوین و اتریوم</p>" * 120
+                    ),
+                    author="BitPulse",
+                    published_at=now - timedelta(minutes=i),
+                )
+            )
+        session.commit()
+
+
+def old_page(session: Session, size: int):
+    statement = (
+        select(Article, Feed)
+        .join(Feed, Article.feed_id == Feed.id)
+        .order_by(Article.published_at.desc(), Article.id.desc())
+        .limit(size)
+    )
+    rows = session.exec(statement).all()
+    items = []
+    for article, feed in rows:
+        item = ArticleInDB.model_validate(article)
+        item.feed = FeedInDB.model_validate(feed)
+        items.append(item)
+    return rows, lambda: full_page_adapter.dump_json(items)
+
+
+def new_page(session: Session, size: int):
+    params = ArticleQueryParams(size=size, include_total=False)
+    rows, _, _ = crud.get_articles(session, params)
+    return rows, lambda: orjson.dumps(
+        crud.article_summaries(rows, crud.article_fields(params))
+    )
+
+
+def measure(build, size: int, rounds: int) -> dict:
+    load_times = []
+    dump_times = []
+    for _ in range(rounds):
+        with Session(read_engine) as session:
+            started = time.perf_counter()
+            rows, dump = build(session, size)
+            loaded = time.perf_counter()
+            body = dump()
+            dump_times.append(time.perf_counter() - loaded)
+            load_times.append(loaded - started)
+    return {
+        "bytes": len(body),
+        "load_ms": sorted(load_times)[rounds // 2] * 1000,
+        "dump_ms": sorted(dump_times)[rounds // 2] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.articles)
+
+    print(
+        f"{args.articles} articles, page size {args.size}, median of {args.rounds} rounds"
+    )
+    print(f"{'listing':<10}{'KB/page':>10}{'load (ms)':>12}{'serialize (ms)':>16}")
+    for name, build in (("old", old_page), ("sparse", new_page)):
+        result = measure(build, args.size, args.rounds)
+        print(
+            f"{name:<10}{result['bytes'] / 1024:>10.1f}{result['load_ms']:>12.2f}{result['dump_ms']:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
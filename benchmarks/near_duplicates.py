@@ -0,0 +1,244 @@
+"""Measure near-duplicate story detection against a large article table.
+
+Seeds a throwaway database with background articles (random fingerprints,
+inserted in bulk through the band index triggers), then ingests original
+stories and syndicated copies of them: retitled, with a share of words
+rewritten and a trailer appended, plus unrelated stories on the same
+topics. Reports the cost of a band index lookup per new article next to a
+pairwise comparison with every article in the time window, and how many
+copies were grouped with their original (recall) and how many groupings
+were right (precision), by how heavily the copy was edited.
+
+Usage:
+    python -m benchmarks.near_duplicates --articles 1000000 --stories 500
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Keep the benchmark away from the real database
+os.environ["SQLITE_DB_PATH"] = tempfile.mktemp(suffix=".db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, text  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.duplicates import (  # noqa: E402
+    BINS,
+    Fingerprint,
+    assign_stories,
+    find_stories,
+    similarity,
+)
+from app.models import Article, Feed  # noqa: E402
+from app.normalize import fingerprint  # noqa: E402
+
+# Share of words rewritten in a copy
+EDIT_RATES = [0.0, 0.05, 0.1, 0.2, 0.3]
+TRAILER = "The post first appeared on {} and is republished with permission"
+
+
+def vocabulary(size: int = 5000) -> tuple:
+    """Words with a long-tailed frequency, so unrelated texts share common words."""
+    words = [f"w{i}" for i in range(size)]
+    weights = [1 / (rank + 1) for rank in range(size)]
+    return words, weights
+
+
+def make_story(rng: random.Random, words: list, weights: list) -> list:
+    return rng.choices(words, weights, k=rng.randint(150, 400))
+
+
+def make_copy(
+    rng: random.Random,
+    story: list,
+    rate: float,
+    words: list,
+    weights: list,
+    source: int,
+) -> list:
+    copy = [
+        rng.choices(words, weights)[0] if rng.random() < rate else word
+        for word in story
+    ]
+    return copy + TRAILER.format(f"source{source}").split()
+
+
+def seed_background(articles: int, feed_id: int, now: datetime):
+    """Insert articles with random fingerprints, spread over 30 days."""
+    rng = random.Random(1)
+    span = 30 * 24 * 3600
+    with engine.begin() as conn:
+        for start in range(0, articles, 10000):
+            conn.execute(
+                insert(Article.__table__),
+                [
+                    {
+                        "feed_id": feed_id,
+                        "title": f"Background story {i}",
+                        "link": f"https://example.com/background/{i}",
+                        "published_at": now - timedelta(seconds=rng.randrange(span)),
+                        "minhash": rng.randbytes(2 * BINS),
+                        "is_new": False,
+                        "word_count": 0,
+                        "reading_time_minutes": 0,
+                        "created_at": now,
+                    }
+                    for i in range(start, min(start + 10000, articles))
+                ],
+            )
+
+
+def ingest(session: Session, feed_id: int, items: list, now: datetime) -> list:
+    """Add (title, words) items the way ingest does, returning the articles."""
+    articles = [
+        Article(
+            feed_id=feed_id,
+            title=title,
+            link=f"https://example.com/{feed_id}/{title}/{i}",
+            published_at=now,
+            minhash=fingerprint(title, " ".join(words)),
+        )
+        for i, (title, words) in enumerate(items)
+    ]
+    assign_stories(session.connection(), articles)
+    session.add_all(articles)
+    session.commit()
+    return articles
+
+
+def pairwise(session: Session, minhash: bytes, now: datetime):
+    """The alternative: compare with every article in the time window."""
+    window = timedelta(hours=settings.NEAR_DUPLICATE_WINDOW_HOURS)
+    rows = session.connection().execute(
+        select(Article.id, Article.minhash).where(
+            Article.published_at.between(now - window, now + window),
+            Article.minhash.is_not(None),
+        )
+    )
+    best = None
+    best_similarity = settings.NEAR_DUPLICATE_SIMILARITY
+    for article_id, candidate in rows:
+        score = similarity(minhash, candidate)
+        if score >= best_similarity:
+            best, best_similarity = article_id, score
+    return best
+
+
+def percentile(times: list, share: float) -> float:
+    return sorted(times)[min(len(times) - 1, int(len(times) * share))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=1_000_000)
+    parser.add_argument("--stories", type=int, default=500)
+    parser.add_argument("--pairwise-samples", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        feeds = [
+            Feed(url=f"https://example.com/{i}.xml", title=f"Feed {i}")
+            for i in range(3)
+        ]
+        session.add_all(feeds)
+        session.commit()
+        background, originals_feed, copies_feed = (feed.id for feed in feeds)
+
+    started = time.perf_counter()
+    seed_background(args.articles, background, now)
+    print(
+        f"Seeded {args.articles} background articles in {time.perf_counter() - started:.0f}s"
+    )
+
+    rng = random.Random(2)
+    words, weights = vocabulary()
+    stories = [make_story(rng, words, weights) for _ in range(args.stories)]
+    copies = [
+        (i, rate, make_copy(rng, stories[i], rate, words, weights, i))
+        for i in range(args.stories)
+        for rate in EDIT_RATES
+    ]
+    unrelated = [make_story(rng, words, weights) for _ in range(args.stories)]
+
+    # Read story_id off the articles after the session closes
+    with Session(engine, expire_on_commit=False) as session:
+        started = time.perf_counter()
+        originals = ingest(
+            session,
+            originals_feed,
+            [(f"Story {i}", story) for i, story in enumerate(stories)],
+            now,
+        )
+        fingerprint_us = (time.perf_counter() - started) / len(stories) * 1e6
+
+        # One lookup per new article, as refresh_feed would do for a feed of one
+        lookups = []
+        for _, _, copy in copies:
+            minhash = fingerprint("Breaking news", " ".join(copy))
+            started = time.perf_counter()
+            find_stories(session.connection(), [Fingerprint(None, minhash, now)])
+            lookups.append(time.perf_counter() - started)
+        scans = []
+        for _, _, copy in copies[: args.pairwise_samples]:
+            minhash = fingerprint("Breaking news", " ".join(copy))
+            started = time.perf_counter()
+            pairwise(session, minhash, now)
+            scans.append(time.perf_counter() - started)
+
+        added = ingest(
+            session,
+            copies_feed,
+            [(f"Breaking: {i}", copy) for i, _, copy in copies],
+            now,
+        )
+        controls = ingest(
+            session,
+            copies_feed,
+            [(f"Other {i}", story) for i, story in enumerate(unrelated)],
+            now,
+        )
+        band_rows = (
+            session.connection()
+            .execute(text("SELECT count(*) FROM article_minhash_band"))
+            .scalar()
+        )
+
+    print(
+        f"{band_rows} band index rows, fingerprint and insert {fingerprint_us:.0f} us/article"
+    )
+    print(f"\n{'lookup':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}{'mean (ms)':>11}")
+    for name, times in (("band index", lookups), ("pairwise in window", scans)):
+        print(
+            f"{name:<22}{percentile(times, 0.5):>10.2f}{percentile(times, 0.99):>10.2f}"
+            f"{statistics.mean(times) * 1000:>11.2f}"
+        )
+
+    print(f"\n{'words rewritten':<18}{'recall':>8}{'precision':>11}")
+    for rate in EDIT_RATES:
+        results = [
+            (article.story_id, originals[i].id)
+            for article, (i, copy_rate, _) in zip(added, copies)
+            if copy_rate == rate
+        ]
+        grouped = [
+            (story, expected) for story, expected in results if story is not None
+        ]
+        correct = sum(story == expected for story, expected in grouped)
+        precision = correct / len(grouped) if grouped else 1.0
+        print(f"{rate:<18.0%}{correct / len(results):>8.3f}{precision:>11.3f}")
+    false_groupings = sum(article.story_id is not None for article in controls)
+    print(f"unrelated stories grouped: {false_groupings} of {len(controls)}")
+
+
+if __name__ == "__main__":
+    main()
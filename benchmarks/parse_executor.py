@@ -0,0 +1,108 @@
+"""Compare refresh-cycle latency with feed parsing inline vs. in a worker pool.
+
+Serves synthetic feeds through an in-memory transport, runs
+RSSParser.update_feeds against a throwaway SQLite database and reports the
+cycle wall time and the worst event-loop stall seen while it ran.
+
+Usage:
+    python -m benchmarks.parse_executor --feeds 30 --entries 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from email.utils import formatdate
+
+
+def build_feed(index: int, entries: int) -> bytes:
+    """Build an RSS document with the given number of items."""
+    items = "".join(
+        f"<item><title>Feed {index} story {i}</title>"
+        f"<link>https://example.com/{index}/{i}</link>"
+        f"<description>&lt;p&gt;{'بیت‌کوین ' * 40}&lt;/p&gt;</description>"
+        f"<pubDate>{formatdate(time.time() - i * 60, usegmt=True)}</pubDate></item>"
+        for i in range(entries)
+    )
+    return (
+        f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+        f"<title>Feed {index}</title>{items}</channel></rss>"
+    ).encode("utf-8")
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the longest delay between scheduled ticks of the event loop."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_cycle(mode: str, bodies: dict) -> tuple:
+    import httpx
+    from sqlmodel import Session, SQLModel, create_engine
+    from app.core.config import settings
+    from app.fetcher import FeedClient
+    from app.models import Feed
+    from app.rss import RSSParser, create_parse_executor
+
+    settings.RSS_PARSE_EXECUTOR = mode
+    engine = create_engine(f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+    SQLModel.metadata.create_all(engine)
+
+    def handler(request):
+        return httpx.Response(200, content=bodies[str(request.url)])
+
+    client = FeedClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    executor = create_parse_executor()
+
+    with Session(engine) as session:
+        for url in bodies:
+            session.add(Feed(url=url, title=url))
+        session.commit()
+
+        parser = RSSParser(session, client=client, executor=executor)
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(measure_lag(stop))
+        started = time.perf_counter()
+        await parser.update_feeds()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        worst_lag = await lag_task
+
+    await client.aclose()
+    if executor:
+        executor.shutdown()
+    return elapsed, worst_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=30)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--modes", default="inline,thread,process")
+    args = parser.parse_args()
+
+    # Keep the benchmark away from the real database
+    os.environ.setdefault("SQLITE_DB_PATH", tempfile.mktemp(suffix=".db"))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    bodies = {
+        f"https://feeds{i % 5}.example.com/{i}.xml": build_feed(i, args.entries)
+        for i in range(args.feeds)
+    }
+    size_mb = sum(len(body) for body in bodies.values()) / 1_000_000
+    print(f"{args.feeds} feeds x {args.entries} entries ({size_mb:.1f} MB)")
+    print(f"{'mode':<10}{'cycle (s)':>12}{'max loop stall (ms)':>22}")
+    for mode in args.modes.split(","):
+        elapsed, worst_lag = asyncio.run(run_cycle(mode, bodies))
+        print(f"{mode:<10}{elapsed:>12.2f}{worst_lag * 1000:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compare streaming and whole-document feed ingestion on large feeds.
+
+Serves large synthetic feeds in chunks through an in-memory transport and
+runs RSSParser.fetch_feed on each, once with the streaming parser and once
+with it disabled (download everything, then feedparser). Reports the time
+per feed, the bytes actually read and the peak Python memory per fetch
+(measured on a separate run, as tracing slows parsing down).
+
+Usage:
+    python -m benchmarks.streaming_ingest --feeds 5 --entries 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep the benchmark away from the real database
+os.environ.setdefault("SQLITE_DB_PATH", tempfile.mktemp(suffix=".db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.fetcher import FeedClient  # noqa: E402
+from app.models import Feed  # noqa: E402
+from app.rss import RSSParser  # noqa: E402
+from benchmarks.parse_executor import build_feed  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def fetch_all(bodies: dict, streaming: bool) -> dict:
+    settings.RSS_STREAMING_PARSER = streaming
+    settings.RSS_PARSE_EXECUTOR = "inline"
+    bytes_read = 0
+
+    async def chunks(body: bytes):
+        nonlocal bytes_read
+        for start in range(0, len(body), CHUNK_SIZE):
+            bytes_read += min(CHUNK_SIZE, len(body) - start)
+            yield body[start : start + CHUNK_SIZE]
+
+    async def handler(request):
+        return httpx.Response(200, content=chunks(bodies[str(request.url)]))
+
+    client = FeedClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    parser = RSSParser(None, client=client)
+
+    times = []
+    peaks = []
+    entries = 0
+    for url in bodies:
+        started = time.perf_counter()
+        parsed = await parser.fetch_feed(Feed(url=url, title=url))
+        times.append(time.perf_counter() - started)
+        entries += len(parsed.entries[: settings.RSS_MAX_ENTRIES])
+
+        # Measure memory on a second run, tracing slows parsing down a lot
+        tracemalloc.start()
+        await parser.fetch_feed(Feed(url=url, title=url))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    await client.aclose()
+    return {
+        "ms_per_feed": sum(times) / len(times) * 1000,
+        "read_mb": bytes_read / 2 / 1_000_000,
+        "peak_mb": max(peaks) / 1_000_000,
+        "entries": entries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=5)
+    parser.add_argument("--entries", type=int, default=5000)
+    args = parser.parse_args()
+
+    settings.RSS_MAX_FEED_BYTES = 1024 * 1024 * 1024
+    bodies = {
+        f"https://feeds.example.com/{i}.xml": build_feed(i, args.entries)
+        for i in range(args.feeds)
+    }
+    size_mb = sum(len(body) for body in bodies.values()) / 1_000_000
+    print(
+        f"{args.feeds} feeds x {args.entries} entries ({size_mb:.1f} MB), "
+        f"keeping {settings.RSS_MAX_ENTRIES} entries each"
+    )
+    print(
+        f"{'mode':<12}{'ms/feed':>10}{'read (MB)':>12}{'peak (MB)':>12}{'entries':>10}"
+    )
+    for mode, streaming in (("feedparser", False), ("streaming", True)):
+        result = asyncio.run(fetch_all(bodies, streaming))
+        print(
+            f"{mode:<12}{result['ms_per_feed']:>10.1f}{result['read_mb']:>12.1f}"
+            f"{result['peak_mb']:>12.1f}{result['entries']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
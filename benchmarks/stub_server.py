@@ -0,0 +1,226 @@
+"""Serve synthetic RSS and Atom feeds to benchmark ingestion against.
+
+Feed i is served at /feeds/<i>.xml, as Atom for a share of the feeds and
+RSS for the rest. Every fetch moves the feed on by a share of new
+entries (the churn), so a feed that doesn't churn keeps its ETag and
+answers conditional requests with 304. Each response can be delayed, and
+a share of them fail with a 500. Feeds are spread over several loopback
+addresses (127.0.0.1, 127.0.0.2, ...) so the fetcher's per-host limit
+sees several hosts, as it would in production; Linux routes all of
+127.0.0.0/8 to the loopback interface, elsewhere use --hosts 1.
+
+Everything is derived from the feed number, the fetch count and --seed,
+so runs are reproducible.
+
+Usage:
+    python -m benchmarks.stub_server --feeds 200 --churn 0.1 --latency-ms 50
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.normalize import PARAGRAPHS  # noqa: E402
+
+# Words the unique part of each entry is made of
+WORDS = sorted(set(re.sub(r"<[^>]+>|[^\w\s]", " ", "".join(PARAGRAPHS)).split()))
+# Entry n of every feed is published this long after entry 0
+ENTRY_SPACING = timedelta(minutes=5)
+STARTED_AT = datetime(2026, 1, 1)
+
+
+@dataclass
+class StubConfig:
+    feeds: int = 100
+    entries: int = 20  # per document
+    paragraphs: int = 6  # of 40 words, per entry body
+    churn: float = 0.1  # share of entries that are new on each fetch
+    latency_ms: float = 0.0
+    error_rate: float = 0.0
+    atom_share: float = 0.3
+    duplicate_share: float = (
+        0.1  # entries that are syndicated copies of a story other feeds carry
+    )
+    hosts: int = 8
+    port: int = 8799
+    seed: int = 1
+
+    def feed_url(self, feed: int) -> str:
+        return f"http://127.0.0.{1 + feed % self.hosts}:{self.port}/feeds/{feed}.xml"
+
+
+class StubFeeds:
+    """Renders each feed's current document and counts its fetches."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.fetches = [0] * config.feeds
+        self.lock = threading.Lock()
+        self.new_per_fetch = round(config.churn * config.entries)
+
+    def next_fetch(self, feed: int) -> int:
+        with self.lock:
+            fetch = self.fetches[feed]
+            self.fetches[feed] += 1
+        return fetch
+
+    def is_atom(self, feed: int) -> bool:
+        return (
+            random.Random(self.config.seed * 100003 + feed).random()
+            < self.config.atom_share
+        )
+
+    def etag(self, feed: int, fetch: int) -> str:
+        return f'"{feed}-{fetch * self.new_per_fetch}"'
+
+    def entry(self, feed: int, number: int) -> tuple:
+        """Title, link, publish date and HTML body of one entry.
+
+        Syndicated entries share their text with the same entry number in
+        every other feed that syndicates it.
+        """
+        seed = self.config.seed
+        syndicated = (
+            random.Random(f"{seed}-{feed}-{number}").random()
+            < self.config.duplicate_share
+        )
+        story = random.Random(
+            f"{seed}-story-{number}" if syndicated else f"{seed}-{feed}-{number}"
+        )
+        body = "".join(
+            f"<p>{' '.join(story.choices(WORDS, k=40))}</p>"
+            for _ in range(self.config.paragraphs)
+        )
+        # An image and a script for the sanitizer to deal with
+        body += PARAGRAPHS[2] + PARAGRAPHS[4]
+        return (
+            f"Feed {feed} story {number}",
+            f"https://stub.example/{feed}/{number}",
+            STARTED_AT + number * ENTRY_SPACING,
+            body,
+        )
+
+    def render(self, feed: int, fetch: int) -> bytes:
+        newest = fetch * self.new_per_fetch + self.config.entries
+        numbers = range(newest - 1, newest - 1 - self.config.entries, -1)
+        entries = [self.entry(feed, number) for number in numbers]
+        if self.is_atom(feed):
+            items = "".join(
+                f'<entry><title>{escape(title)}</title><link href="{link}"/><id>{link}</id>'
+                f"<updated>{published.isoformat()}Z</updated>"
+                f'<content type="html">{escape(body)}</content></entry>'
+                for title, link, published, body in entries
+            )
+            return (
+                '<?xml version="1.0" encoding="utf-8"?>'
+                f'<feed xmlns="http://www.w3.org/2005/Atom"><title>Stub feed {feed}</title>'
+                f"{items}</feed>"
+            ).encode()
+        items = "".join(
+            f"<item><title>{escape(title)}</title><link>{link}</link><guid>{link}</guid>"
+            f"<pubDate>{format_datetime(published)}</pubDate>"
+            f"<description>{escape(body)}</description></item>"
+            for title, link, published, body in entries
+        )
+        return (
+            '<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+            f"<title>Stub feed {feed}</title>{items}</channel></rss>"
+        ).encode()
+
+
+def make_handler(feeds: StubFeeds):
+    config = feeds.config
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like real feed hosts
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            name = self.path.rsplit("/", 1)[-1]
+            if not self.path.startswith("/feeds/") or not name.endswith(".xml"):
+                return self.send_error(404)
+            feed = int(name[:-4])
+            if not 0 <= feed < config.feeds:
+                return self.send_error(404)
+            fetch = feeds.next_fetch(feed)
+            if config.latency_ms:
+                time.sleep(config.latency_ms / 1000)
+            if (
+                random.Random(f"{config.seed}-{feed}-{fetch}").random()
+                < config.error_rate
+            ):
+                return self.send_error(500)
+
+            etag = feeds.etag(feed, fetch)
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = feeds.render(feed, fetch)
+            self.send_response(200)
+            self.send_header(
+                "Content-Type",
+                (
+                    "application/atom+xml"
+                    if feeds.is_atom(feed)
+                    else "application/rss+xml"
+                ),
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(config: StubConfig):
+    """Serve the feeds on every host address until the process is killed."""
+    handler = make_handler(StubFeeds(config))
+    servers = [
+        ThreadingHTTPServer((f"127.0.0.{1 + host}", config.port), handler)
+        for host in range(min(config.hosts, config.feeds))
+    ]
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    servers[0].serve_forever()
+
+
+def start_stub_server(config: StubConfig) -> Process:
+    """Run the stub server in a child process, so it doesn't count
+    towards the benchmark's CPU time and memory."""
+    process = Process(target=serve, args=(config,), daemon=True)
+    process.start()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = StubConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    config = StubConfig(**vars(parser.parse_args()))
+    print(f"Serving {config.feeds} feeds, e.g. {config.feed_url(0)}")
+    serve(config)
+
+
+if __name__ == "__main__":
+    main()
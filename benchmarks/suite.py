@@ -0,0 +1,373 @@
+"""Benchmark ingestion and the API end to end, and save the results as JSON.
+
+Starts the stub feed server (benchmarks/stub_server.py) in a child
+process, subscribes a throwaway database to its feeds and runs
+RSSParser.update_feeds over all of them for a number of rounds, the way
+the scheduler does. Then drives the FastAPI app in-process with a fixed
+number of concurrent clients over a mix of endpoints. Reports:
+
+- feeds/s and new articles/s during ingestion
+- p50/p95/p99 latency and requests/s per endpoint
+- peak resident memory of the process
+- database size
+
+The results, with the commit and settings they were measured with, are
+written to --output (benchmarks/results/ by default). --compare prints
+the change against an earlier results file.
+
+Usage:
+    python -m benchmarks.suite --feeds 200 --rounds 5 --latency-ms 50
+    python -m benchmarks.suite --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+
+# Keep the benchmark away from the real database
+os.environ["SQLITE_DB_PATH"] = tempfile.mktemp(suffix=".db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from sqlmodel import Session, func, select  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db import engine, init_db, read_engine  # noqa: E402
+from app.fetcher import FeedClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Article, Feed  # noqa: E402
+from app.pipeline import FEED_FAILED, FEED_NOT_MODIFIED, FEED_UPDATED  # noqa: E402
+from app.rss import RSSParser, create_parse_executor  # noqa: E402
+from benchmarks.stub_server import StubConfig, start_stub_server  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SEARCH_TERMS = ["bitcoin", "ETF", "بيتكوين", "funding", "اتريوم"]
+
+# (metric, higher is better) pairs shown by --compare
+COMPARED = [
+    ("ingest.feeds_per_second", True),
+    ("ingest.articles_per_second", True),
+    ("api.all.rps", True),
+    ("api.all.p50_ms", False),
+    ("api.all.p95_ms", False),
+    ("api.all.p99_ms", False),
+    ("peak_rss_mb", False),
+    ("db_size_mb", False),
+]
+
+
+def wait_for_port(host: str, port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def subscribe(config: StubConfig):
+    with Session(engine) as session:
+        session.add_all(
+            Feed(url=config.feed_url(feed), title=f"Stub feed {feed}")
+            for feed in range(config.feeds)
+        )
+        session.commit()
+
+
+async def run_ingest(rounds: int) -> dict:
+    """Refresh every feed once per round, as one scheduler dispatch would."""
+    client = FeedClient()
+    executor = create_parse_executor()
+    per_round = []
+    try:
+        for _ in range(rounds):
+            with Session(read_engine) as session:
+                feeds = session.exec(select(Feed)).all()
+            parser = RSSParser(None, client=client, executor=executor)
+            started = time.perf_counter()
+            results = await parser.update_feeds(feeds)
+            elapsed = time.perf_counter() - started
+            per_round.append(
+                {
+                    "seconds": elapsed,
+                    "updated": sum(result.status == FEED_UPDATED for result in results),
+                    "not_modified": sum(
+                        result.status == FEED_NOT_MODIFIED for result in results
+                    ),
+                    "failed": sum(result.status == FEED_FAILED for result in results),
+                    "articles": sum(len(result.articles) for result in results),
+                    "pipeline": parser.pipeline_stats,
+                }
+            )
+    finally:
+        await client.aclose()
+        if executor:
+            executor.shutdown()
+
+    seconds = sum(result["seconds"] for result in per_round)
+    feeds = sum(
+        result["updated"] + result["not_modified"] + result["failed"]
+        for result in per_round
+    )
+    articles = sum(result["articles"] for result in per_round)
+    return {
+        "feeds_per_second": feeds / seconds,
+        "articles_per_second": articles / seconds,
+        "articles": articles,
+        "rounds": per_round,
+    }
+
+
+def endpoint_mix(articles: int, feeds: int) -> list:
+    """(name, weight, path builder) for the requests the load generator sends."""
+    return [
+        ("GET /articles", 40, lambda: f"/articles?page={random.randint(1, 5)}&size=20"),
+        (
+            "GET /articles?feed_id",
+            15,
+            lambda: f"/articles?feed_id={random.randint(1, feeds)}&size=20",
+        ),
+        (
+            "GET /articles?search",
+            10,
+            lambda: f"/articles?search={random.choice(SEARCH_TERMS)}&size=20",
+        ),
+        ("GET /articles/{id}", 25, lambda: f"/articles/{random.randint(1, articles)}"),
+        ("GET /feeds", 5, lambda: "/feeds"),
+        (
+            "GET /articles/changes",
+            5,
+            lambda: f"/articles/changes?since={random.randint(0, articles)}",
+        ),
+    ]
+
+
+def latency_stats(latencies: list, seconds: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(share: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * share))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / seconds,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def run_api(articles: int, feeds: int, concurrency: int, duration: float) -> dict:
+    """Send a weighted mix of requests from concurrent in-process clients."""
+    mix = endpoint_mix(articles, feeds)
+    names = [name for name, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    builders = {name: build for name, _, build in mix}
+    latencies = {name: [] for name in names}
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            response = await client.get(builders[name]())
+            latencies[name].append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+
+    results = {
+        name: latency_stats(times, seconds)
+        for name, times in latencies.items()
+        if times
+    }
+    results["all"] = latency_stats(
+        [t for times in latencies.values() for t in times], seconds
+    )
+    results["all"]["errors"] = errors
+    return results
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, None where it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def db_size_mb() -> float:
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(settings.SQLITE_DB_PATH) / 1_000_000
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(RESULTS_DIR),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def lookup(results: dict, metric: str):
+    for key in metric.split("."):
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(baseline: dict, results: dict):
+    print(f"\nAgainst {baseline['meta']['commit']} ({baseline['meta']['started_at']}):")
+    for metric, higher_is_better in COMPARED:
+        old, new = lookup(baseline, metric), lookup(results, metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        better = change > 0 if higher_is_better else change < 0
+        verdict = "better" if better else "worse" if change else ""
+        print(f"{metric:<30}{old:>12.1f}{new:>12.1f}{change:>+9.1%}  {verdict}")
+
+
+def report(results: dict):
+    ingest = results["ingest"]
+    print(
+        f"Ingest: {ingest['feeds_per_second']:.1f} feeds/s, "
+        f"{ingest['articles_per_second']:.1f} articles/s, {ingest['articles']} articles"
+    )
+    print(
+        f"\n{'endpoint':<24}{'req/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}"
+    )
+    for name, stats in results["api"].items():
+        print(
+            f"{name:<24}{stats['rps']:>9.0f}{stats['p50_ms']:>10.1f}"
+            f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+    print(f"\nErrors: {results['api']['all']['errors']}")
+    peak = results["peak_rss_mb"]
+    print(
+        f"Peak RSS: {f'{peak:.0f} MB' if peak is not None else 'n/a'}, "
+        f"database: {results['db_size_mb']:.1f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=100)
+    parser.add_argument("--entries", type=int, default=settings.RSS_MAX_ENTRIES)
+    parser.add_argument("--paragraphs", type=int, default=6)
+    parser.add_argument("--churn", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--duplicate-share", type=float, default=0.1)
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--output", help="results file, by default one in benchmarks/results/"
+    )
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    config = StubConfig(
+        feeds=args.feeds,
+        entries=args.entries,
+        paragraphs=args.paragraphs,
+        churn=args.churn,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        duplicate_share=args.duplicate_share,
+        hosts=args.hosts,
+        seed=args.seed,
+    )
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        config.port = sock.getsockname()[1]
+    stub = start_stub_server(config)
+    try:
+        wait_for_port("127.0.0.1", config.port)
+        init_db()
+        subscribe(config)
+        started_at = datetime.utcnow()
+        ingest = asyncio.run(run_ingest(args.rounds))
+        with Session(engine) as session:
+            articles = session.exec(select(func.count()).select_from(Article)).one()
+        api = asyncio.run(
+            run_api(articles, args.feeds, args.concurrency, args.duration)
+        )
+    finally:
+        stub.terminate()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "config": {
+            "stub": asdict(config),
+            "rounds": args.rounds,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "parse_executor": settings.RSS_PARSE_EXECUTOR,
+        },
+        "ingest": ingest,
+        "api": api,
+        "peak_rss_mb": peak_rss_mb(),
+        "db_size_mb": db_size_mb(),
+    }
+    report(results)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = started_at.strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(
+            RESULTS_DIR, f"{stamp}-{results['meta']['commit'] or 'unknown'}.json"
+        )
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -47,7 +47,7 @@ const ArticleCard = ({ article }: ArticleCardProps) => {
       </div>
       <hr className="my-2 border-gray-200" />
       <p className="mt-2 text-sm text-gray-700 line-clamp-3" dir={ltr ? 'ltr' : 'rtl'}>
-        {stripHtml(article.description || '')}
+        {article.excerpt ?? stripHtml(article.description || '')}
       </p>
       <a
         href={article.link}
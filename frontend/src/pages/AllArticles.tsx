@@ -20,7 +20,7 @@ function AllArticles() {
 
   const { data, isLoading, isError } = useQuery(['all-articles', page, search], fetchArticles, { keepPreviousData: true })
 
-  const totalPages = data ? data.pages : 1
+  const totalPages = data?.pages ?? 1
 
   return (
     <section className="max-w-6xl mx-auto px-4 py-8">
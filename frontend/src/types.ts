@@ -6,29 +6,44 @@ export interface Feed {
   last_updated?: string
   created_at: string
   is_active: boolean
+  retention_days?: number | null
+}
+
+export interface FeedRef {
+  id: number
+  title: string
 }
 
 export interface Article {
   id: number
   feed_id: number
-  feed: Feed
+  feed: FeedRef
   title: string
   link: string
   description?: string
-  content?: string
+  content?: string  // only returned by GET /articles/{id}
   author?: string
   published_at: string
   created_at: string
   updated_at?: string
   is_new: boolean
+  canonical_link?: string
+  content_text?: string
+  excerpt?: string
+  word_count?: number
+  reading_time_minutes?: number
+  snippet?: string
+  story_id?: number | null  // the first article of the story this copies
+  duplicates?: number  // only returned with collapse_duplicates
 }
 
 export interface PaginatedResponse<T> {
-  total: number
+  total: number | null
   page: number
   size: number
-  pages: number
+  pages: number | null
   items: T[]
+  next_cursor: string | null
 }
 
 export interface ArticleQueryParams {
@@ -39,4 +54,8 @@ export interface ArticleQueryParams {
   start_date?: string
   end_date?: string
   is_new?: boolean
+  cursor?: string
+  include_total?: boolean
+  fields?: string
+  collapse_duplicates?: boolean
 } 
\ No newline at end of file
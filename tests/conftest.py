@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from itertools import count
+
+# Point the app at a throwaway database before anything imports app.db
+os.environ["SQLITE_DB_PATH"] = os.path.join(
+    tempfile.mkdtemp(prefix="bitpulse-tests-"), "bitpulse.db"
+)
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+from app import models  # noqa: E402, F401  (registers the tables)
+from app.migrations import migrate  # noqa: E402
+from app.models import Article, Feed  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """A connection to a fresh database with every table, in one transaction."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'unit.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        yield connection
+    engine.dispose()
+
+
+# The schema the first release created, before any migration
+LEGACY_SCHEMA = """
+CREATE TABLE feed (
+    id INTEGER NOT NULL,
+    url VARCHAR NOT NULL,
+    title VARCHAR NOT NULL,
+    description VARCHAR,
+    last_updated DATETIME,
+    created_at DATETIME NOT NULL,
+    is_active BOOLEAN NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_feed_url ON feed (url);
+CREATE TABLE article (
+    id INTEGER NOT NULL,
+    feed_id INTEGER NOT NULL,
+    title VARCHAR NOT NULL,
+    link VARCHAR NOT NULL,
+    description VARCHAR,
+    content VARCHAR,
+    author VARCHAR,
+    published_at DATETIME NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME,
+    is_new BOOLEAN NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(feed_id) REFERENCES feed (id)
+);
+CREATE UNIQUE INDEX ix_article_link ON article (link);
+INSERT INTO feed VALUES
+    (1, 'http://127.0.0.1:9/feed.xml', 'Test', NULL, NULL, '2024-01-01 00:00:00', 1);
+INSERT INTO article VALUES
+    (1, 1, 'Bitcoin halving', 'https://example.com/1', '<p>Miners brace</p>',
+     '<p>The <b>halving</b> cuts the block reward.</p>', NULL,
+     '2024-01-01 00:00:00', '2024-01-01 00:00:00', NULL, 1),
+    (2, 1, 'Ethereum upgrade', 'https://example.com/2', NULL, NULL, NULL,
+     '2024-01-02 00:00:00', '2024-01-02 00:00:00', NULL, 0);
+"""
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """Path to a database made by the first release, with two articles."""
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.close()
+    return path
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A connection to a fresh, fully migrated database, in one transaction.
+
+    Unlike conn, it has the search index and the triggers the migrations
+    add.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with engine.begin() as connection:
+        yield connection
+    engine.dispose()
+
+
+@pytest.fixture
+def add_article(db):
+    """A function that stores an article in the db fixture's database,
+    under feed 1 unless told otherwise, and returns its id."""
+    links = count()
+    with Session(bind=db) as session:
+        session.add(Feed(id=1, url="http://127.0.0.1:9/feed.xml", title="Test"))
+        session.flush()
+
+    def add(**fields) -> int:
+        fields.setdefault("feed_id", 1)
+        fields.setdefault("title", "Untitled")
+        fields.setdefault("published_at", datetime(2024, 1, 1))
+        with Session(bind=db) as session:
+            article = Article(link=f"https://example.com/{next(links)}", **fields)
+            session.add(article)
+            session.flush()
+            return article.id
+
+    return add
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its startup run against the test database."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,185 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from itertools import count
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from app.cache import response_cache
+from app.db import engine
+from app.models import Article
+
+# Nothing listens on the discard port, so queued fetches fail fast
+UNREACHABLE_FEED = "http://127.0.0.1:9/feed.xml"
+
+links = count()
+
+
+def add_feed(client, title: str) -> int:
+    feed = client.post(
+        "/feeds", json={"url": f"{UNREACHABLE_FEED}?{title}", "title": title}
+    )
+    return feed.json()["id"]
+
+
+def add_articles(feed_id: int, *articles: dict) -> list:
+    """Store articles straight in the database and get their ids."""
+    with Session(engine) as session:
+        rows = [
+            Article(
+                feed_id=feed_id, link=f"https://example.com/{next(links)}", **fields
+            )
+            for fields in articles
+        ]
+        session.add_all(rows)
+        session.commit()
+        ids = [row.id for row in rows]
+    response_cache.invalidate()
+    return ids
+
+
+def test_feed_lifecycle(client):
+    response = client.post(
+        "/feeds", json={"url": UNREACHABLE_FEED, "title": "Test feed"}
+    )
+    assert response.status_code == 200
+    feed = response.json()
+
+    assert client.get(f"/feeds/{feed['id']}").json()["title"] == "Test feed"
+    assert feed["id"] in [item["id"] for item in client.get("/feeds").json()]
+
+    response = client.put(f"/feeds/{feed['id']}", json={"title": "Renamed"})
+    assert response.json()["title"] == "Renamed"
+    assert client.get(f"/feeds/{feed['id']}").json()["title"] == "Renamed"
+
+    assert client.delete(f"/feeds/{feed['id']}").status_code == 200
+    assert client.get(f"/feeds/{feed['id']}").status_code == 404
+
+
+def test_creating_a_feed_queues_a_fetch(client):
+    feed = client.post(
+        "/feeds", json={"url": UNREACHABLE_FEED + "?jobs", "title": "Jobs"}
+    ).json()
+    jobs = client.get("/jobs", params={"feed_id": feed["id"]}).json()
+    assert [job["kind"] for job in jobs] == ["fetch_feed"]
+    assert client.get(f"/jobs/{jobs[0]['id']}").json()["feed_id"] == feed["id"]
+
+    response = client.post(f"/feeds/{feed['id']}/refresh")
+    assert response.status_code == 202
+    assert client.post("/feeds/999999/refresh").status_code == 404
+    assert client.get("/jobs", params={"status": "unknown"}).status_code == 400
+
+
+def test_article_listing(client):
+    response = client.get("/articles")
+    assert response.status_code == 200
+    page = response.json()
+    assert page["items"] == [] or "title" in page["items"][0]
+    assert "next_cursor" in page
+
+    # The same listing again is answered from the cache by its ETag
+    response = client.get(
+        "/articles", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+    assert client.get("/articles/999999").status_code == 404
+
+
+def test_metrics(client):
+    client.get("/feeds")
+    body = client.get("/metrics").text
+    assert (
+        'bitpulse_http_request_duration_seconds_count{method="GET",route="/feeds"'
+        in body
+    )
+
+
+def test_search_without_words_matches_nothing(client):
+    feed_id = add_feed(client, "Punctuation")
+    add_articles(
+        feed_id, {"title": "Bitcoin - the rally", "published_at": datetime.utcnow()}
+    )
+    params = {"feed_id": feed_id}
+    assert len(client.get("/articles", params=params).json()["items"]) == 1
+    for search in ("!!!", "-"):
+        page = client.get("/articles", params={**params, "search": search}).json()
+        assert page["items"] == []
+
+
+def all_pages(client, params: dict) -> list:
+    """Follow next_cursor from the first page to the last and get the ids."""
+    ids = []
+    page = client.get("/articles", params=params).json()
+    ids.extend(item["id"] for item in page["items"])
+    while page["next_cursor"]:
+        page = client.get(
+            "/articles", params={**params, "cursor": page["next_cursor"]}
+        ).json()
+        ids.extend(item["id"] for item in page["items"])
+    return ids
+
+
+def test_cursor_pages_break_ties_on_id(client):
+    feed_id = add_feed(client, "Ties")
+    published = datetime.utcnow().replace(microsecond=0)
+    ids = add_articles(
+        feed_id,
+        *({"title": f"Tie {number}", "published_at": published} for number in range(5)),
+        {"title": "Older", "published_at": published - timedelta(hours=1)},
+    )
+    pages = all_pages(client, {"feed_id": feed_id, "size": 2})
+    assert pages == sorted(ids[:5], reverse=True) + [ids[5]]
+
+    page = client.get("/articles", params={"feed_id": feed_id, "size": 2}).json()
+    assert page["total"] == 6
+    assert page["pages"] == 3
+
+
+def test_articles_always_have_a_publish_date(client):
+    # Keyset paging compares (published_at, id), so there is no NULL tail
+    # for it to skip
+    feed_id = add_feed(client, "Undated")
+    with pytest.raises(IntegrityError):
+        add_articles(feed_id, {"title": "Undated", "published_at": None})
+
+
+def test_cursor_pages_through_search_results(client):
+    feed_id = add_feed(client, "Searched")
+    published = datetime.utcnow()
+    ids = add_articles(
+        feed_id,
+        *(
+            {"title": f"Cardano news {number}", "published_at": published}
+            for number in range(5)
+        ),
+        {"title": "Unrelated", "published_at": published},
+    )
+    pages = all_pages(client, {"feed_id": feed_id, "search": "cardano", "size": 2})
+    assert sorted(pages) == ids[:5]
+
+
+def encode(position) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        "بیت",
+        encode([1, 2]),
+        encode({"id": 1}),
+        encode({"published_at": "yesterday", "id": 1}),
+        encode({"published_at": 1, "id": 1}),
+        encode({"published_at": "2024-01-01T00:00:00", "id": "one"}),
+        encode({"published_at": "2024-01-01T00:00:00", "id": 2**64}),
+    ],
+)
+def test_invalid_cursors_are_rejected(client, cursor):
+    assert client.get("/articles", params={"cursor": cursor}).status_code == 400
+
+
+@pytest.mark.parametrize("offset", ["ten", -1, 2**64])
+def test_invalid_search_cursors_are_rejected(client, offset):
+    params = {"search": "bitcoin", "cursor": encode({"offset": offset})}
+    assert client.get("/articles", params=params).status_code == 400
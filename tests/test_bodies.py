@@ -0,0 +1,120 @@
+from datetime import datetime
+from itertools import count
+import pytest
+from sqlalchemy import create_engine, text
+from sqlmodel import Session, SQLModel, select
+from app import bodies
+from app.bodies import (
+    compress_body,
+    decompress_body,
+    ensure_dictionary,
+    get_content,
+    set_content,
+)
+from app.core.config import settings
+from app.migrations import migrate
+from app.models import Article, ArticleBody, CompressionDictionary, Feed
+
+links = count()
+
+HTML = "<p>Bitcoin <b>rallied</b> again as traders piled in.</p>" * 20
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A migrated database, with the codec state reset around the test."""
+    monkeypatch.setattr(bodies, "codec", None)
+    monkeypatch.setattr(bodies, "dictionaries", {})
+    engine = create_engine(f"sqlite:///{tmp_path / 'bodies.db'}")
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with Session(engine) as session:
+        session.add(Feed(id=1, url="http://127.0.0.1:9/feed.xml", title="Test"))
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def add_articles(engine, *contents: str) -> list:
+    with Session(engine) as session:
+        articles = [
+            Article(
+                feed_id=1,
+                title=f"Story {number}",
+                link=f"https://example.com/{next(links)}",
+                published_at=datetime(2024, 1, 1),
+                body=compress_body(content),
+            )
+            for number, content in enumerate(contents)
+        ]
+        session.add_all(articles)
+        session.commit()
+        return [article.id for article in articles]
+
+
+def test_bodies_round_trip_compressed():
+    body = compress_body(HTML)
+    assert body.codec == "zlib"
+    assert len(body.data) < len(HTML) / 5
+    assert decompress_body(body) == HTML
+    assert compress_body("") is None
+    assert compress_body(None) is None
+
+
+def test_content_is_read_replaced_and_removed(engine):
+    (article_id,) = add_articles(engine, HTML)
+    with Session(engine) as session:
+        assert get_content(session, article_id) == HTML
+        set_content(session, article_id, "<p>Edited</p>")
+        session.commit()
+        assert get_content(session, article_id) == "<p>Edited</p>"
+        set_content(session, article_id, None)
+        session.commit()
+        assert get_content(session, article_id) is None
+
+
+def test_bodies_are_deleted_with_their_article(engine):
+    (article_id,) = add_articles(engine, HTML)
+    with Session(engine) as session:
+        session.exec(text(f"DELETE FROM article WHERE id = {article_id}"))
+        session.commit()
+        assert session.get(ArticleBody, article_id) is None
+
+
+def test_trained_dictionary_compresses_new_bodies(engine, monkeypatch):
+    monkeypatch.setattr(settings, "ARTICLE_BODY_DICTIONARY_SIZE", 4096)
+    monkeypatch.setattr(settings, "ARTICLE_BODY_DICTIONARY_SAMPLES", 5)
+    stories = [
+        f"<article><p>Story {number}: {HTML}</p></article>" for number in range(6)
+    ]
+
+    older = add_articles(engine, *stories[:4])
+    assert not ensure_dictionary(engine)
+    older += add_articles(engine, stories[4])
+    assert ensure_dictionary(engine)
+    # Only once
+    assert not ensure_dictionary(engine)
+
+    (newer,) = add_articles(engine, stories[5])
+    with Session(engine) as session:
+        dictionary = session.exec(select(CompressionDictionary)).one()
+        assert session.get(ArticleBody, newer).dictionary_id == dictionary.id
+        assert session.get(ArticleBody, older[0]).dictionary_id is None
+        # Both decompress, whichever dictionary they were written with
+        monkeypatch.setattr(bodies, "dictionaries", {})
+        assert get_content(session, newer) == stories[5]
+        assert get_content(session, older[0]) == stories[0]
+
+
+def test_migration_moves_content_into_compressed_bodies(legacy_db):
+    engine = create_engine(f"sqlite:///{legacy_db}")
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with Session(engine) as session:
+        assert (
+            get_content(session, 1)
+            == "<p>The <b>halving</b> cuts the block reward.</p>"
+        )
+        assert session.get(ArticleBody, 1).codec == "zlib"
+        assert get_content(session, 2) is None
+    engine.dispose()
@@ -0,0 +1,40 @@
+from sqlalchemy import text
+from app.cache import ResponseCache
+from app.changes import create_change_triggers
+
+
+def change_version(conn) -> int:
+    return conn.execute(
+        text("SELECT value FROM change_sequence WHERE id = 1")
+    ).scalar_one()
+
+
+def test_sync_invalidates_when_the_version_moves():
+    cache = ResponseCache(max_entries=10, max_bytes=1 << 20, ttl=60)
+    # The first sync only records the version
+    cache.sync(5)
+    cache.put("feeds", b"[]", cache.generation)
+    cache.sync(5)
+    assert cache.get("feeds") is not None
+
+    cache.sync(6)
+    assert cache.get("feeds") is None
+
+
+def test_feed_writes_advance_the_version(conn):
+    conn.execute(
+        text("INSERT INTO change_sequence (id, value, pruned_through) VALUES (1, 0, 0)")
+    )
+    create_change_triggers(conn)
+
+    conn.execute(
+        text(
+            "INSERT INTO feed (id, url, title, created_at, is_active) "
+            "VALUES (1, 'http://example.com/feed', 'Example', CURRENT_TIMESTAMP, 1)"
+        )
+    )
+    assert change_version(conn) == 1
+    conn.execute(text("UPDATE feed SET title = 'Renamed' WHERE id = 1"))
+    assert change_version(conn) == 2
+    conn.execute(text("DELETE FROM feed WHERE id = 1"))
+    assert change_version(conn) == 3
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+from app.changes import ChangesExpired
+from app.crud import delete_old_tombstones, get_article_changes
+
+FIELDS = ("id", "title")
+
+
+def change_seq(db, article_id: int) -> int:
+    return db.execute(
+        text("SELECT change_seq FROM article WHERE id = :id"), {"id": article_id}
+    ).scalar_one()
+
+
+def changes(db, since: int, limit: int = 100) -> dict:
+    with Session(bind=db) as session:
+        return get_article_changes(session, since, limit, FIELDS)
+
+
+def test_writes_advance_the_sequence(db, add_article):
+    first = add_article(title="First")
+    second = add_article(title="Second")
+    assert 0 < change_seq(db, first) < change_seq(db, second)
+
+    db.execute(
+        text("UPDATE article SET title = 'Edited' WHERE id = :id"), {"id": first}
+    )
+    assert change_seq(db, first) > change_seq(db, second)
+
+    db.execute(text("DELETE FROM article WHERE id = :id"), {"id": second})
+    page = changes(db, 0)
+    assert [(change["id"], change["deleted"]) for change in page["changes"]] == [
+        (first, False),
+        (second, True),
+    ]
+    assert page["changes"][0]["article"] == {"id": first, "title": "Edited"}
+    assert page["next_since"] == page["changes"][-1]["seq"]
+    assert not page["has_more"]
+
+
+def test_changes_are_paged_in_sequence_order(db, add_article):
+    ids = [add_article(title=f"Story {number}") for number in range(5)]
+    db.execute(text("DELETE FROM article WHERE id = :id"), {"id": ids[1]})
+    db.execute(
+        text("UPDATE article SET title = 'Edited' WHERE id = :id"), {"id": ids[0]}
+    )
+
+    seen = []
+    since = 0
+    while True:
+        page = changes(db, since, limit=2)
+        assert len(page["changes"]) <= 2
+        seen.extend(page["changes"])
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+    seqs = [change["seq"] for change in seen]
+    assert seqs == sorted(seqs)
+    assert [change["id"] for change in seen] == [ids[2], ids[3], ids[4], ids[1], ids[0]]
+    assert changes(db, since) == {"changes": [], "next_since": since, "has_more": False}
+
+
+def test_restored_articles_lose_their_tombstone(db, add_article):
+    article_id = add_article(title="Back again")
+    db.execute(text("DELETE FROM article WHERE id = :id"), {"id": article_id})
+    add_article(id=article_id, title="Back again")
+    page = changes(db, 0)
+    assert [change["deleted"] for change in page["changes"]] == [False]
+
+
+def test_syncs_older_than_purged_tombstones_start_over(db, add_article):
+    deleted = add_article(title="Deleted")
+    add_article(title="Kept")
+    db.execute(text("DELETE FROM article WHERE id = :id"), {"id": deleted})
+    before_purge = changes(db, 0)["next_since"]
+
+    with Session(bind=db) as session:
+        assert (
+            delete_old_tombstones(session, datetime.utcnow() + timedelta(days=1)) == 1
+        )
+    with pytest.raises(ChangesExpired):
+        changes(db, 1)
+    # A sync that already saw the purged deletions, or starts over, goes on
+    assert changes(db, before_purge)["changes"] == []
+    assert [change["deleted"] for change in changes(db, 0)["changes"]] == [False]
+
+
+def test_changes_endpoint(client):
+    page = client.get("/articles/changes", params={"since": 0, "limit": 1}).json()
+    assert set(page) == {"changes", "next_since", "has_more"}
+    response = client.get("/articles/changes", params={"fields": "nonsense"})
+    assert response.status_code == 400
+    assert client.get("/articles/changes", params={"since": -1}).status_code == 422
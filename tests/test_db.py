@@ -0,0 +1,44 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from sqlalchemy import create_engine
+from app.migrations import MIGRATIONS, get_schema_version
+
+ROOT = Path(__file__).parent.parent
+WORKERS = 4
+
+
+def start_workers(path: Path) -> list:
+    """Start processes that all initialize the same database at once."""
+    env = {**os.environ, "SQLITE_DB_PATH": str(path)}
+    return [
+        subprocess.Popen(
+            [sys.executable, "-c", "from app.db import init_db; init_db()"],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        for _ in range(WORKERS)
+    ]
+
+
+@pytest.mark.parametrize("existing", [False, True], ids=["empty", "legacy"])
+def test_workers_initialize_the_database_together(tmp_path, legacy_db, existing):
+    path = tmp_path / "shared.db"
+    if existing:
+        shutil.copy(legacy_db, path)
+    workers = start_workers(path)
+    errors = [worker.communicate(timeout=120)[1].decode() for worker in workers]
+    assert [worker.returncode for worker in workers] == [0] * WORKERS, errors
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == len(MIGRATIONS)
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+        articles = conn.exec_driver_sql("SELECT count(*) FROM article").scalar()
+        assert articles == (2 if existing else 0)
+    engine.dispose()
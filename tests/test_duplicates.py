@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlmodel import Session
+from app.crud import get_articles, get_duplicate_counts
+from app.duplicates import assign_stories, similarity
+from app.models import Article
+from app.normalize import fingerprint
+from app.schemas import ArticleQueryParams
+
+PUBLISHED = datetime(2024, 1, 1, 12)
+
+STORY = (
+    "The central bank said on Monday it would keep interest rates unchanged "
+    "while inflation stays above target, and traders pushed bitcoin to a "
+    "new monthly high as the dollar weakened against most major currencies "
+    "in quiet holiday trading across Asia and Europe"
+)
+COPY = STORY.replace("Monday", "Tuesday").replace("quiet", "thin")
+OTHER = (
+    "Developers of the ethereum network scheduled the next upgrade for "
+    "March after two test networks ran the new code without problems for "
+    "several weeks, clearing the way for cheaper transactions on layer two "
+    "rollups and lower fees for everyday users of the chain"
+)
+
+
+def story_of(db, article_id: int):
+    return db.execute(
+        text("SELECT story_id FROM article WHERE id = :id"), {"id": article_id}
+    ).scalar_one()
+
+
+def add_story(add_article, body: str, published_at=PUBLISHED, **fields) -> int:
+    return add_article(
+        title="News",
+        content_text=body,
+        minhash=fingerprint("News", body),
+        published_at=published_at,
+        **fields,
+    )
+
+
+def incoming(body: str, published_at=PUBLISHED) -> Article:
+    return Article(
+        title="News",
+        minhash=fingerprint("News", body),
+        published_at=published_at,
+    )
+
+
+def test_signatures_estimate_similarity():
+    story = fingerprint("News", STORY)
+    assert similarity(story, fingerprint("News", STORY)) == 1
+    assert similarity(story, fingerprint("News", COPY)) > 0.5
+    assert similarity(story, fingerprint("News", OTHER)) < 0.2
+    assert fingerprint("News", "Too short to compare") is None
+
+
+def test_copies_join_the_story_they_copy(db, add_article):
+    lead = add_story(add_article, STORY)
+    other_lead = add_story(add_article, OTHER)
+    copy, other, late = (
+        incoming(COPY),
+        incoming(OTHER + " again"),
+        incoming(COPY, PUBLISHED + timedelta(days=30)),
+    )
+    assign_stories(db, [copy, other, late])
+    assert copy.story_id == lead
+    assert other.story_id == other_lead
+    # Too far apart to be the same story
+    assert late.story_id is None
+
+
+def test_copies_of_copies_point_at_the_lead(db, add_article):
+    lead = add_story(add_article, STORY)
+    copy = add_story(add_article, COPY, story_id=lead)
+    again = incoming(COPY)
+    assign_stories(db, [again])
+    assert again.story_id == lead
+    assert story_of(db, copy) == lead
+
+
+def test_oldest_copy_leads_when_the_lead_is_deleted(db, add_article):
+    lead = add_story(add_article, STORY)
+    first = add_story(add_article, COPY, story_id=lead)
+    second = add_story(add_article, COPY, story_id=lead)
+    db.execute(text("DELETE FROM article WHERE id = :id"), {"id": lead})
+    assert story_of(db, first) is None
+    assert story_of(db, second) == first
+
+
+def test_listings_can_collapse_copies(db, add_article):
+    lead = add_story(add_article, STORY)
+    add_story(add_article, COPY, story_id=lead)
+    add_story(add_article, COPY, story_id=lead)
+    other = add_story(add_article, OTHER)
+    with Session(bind=db) as session:
+        rows, _, _ = get_articles(session, ArticleQueryParams(collapse_duplicates=True))
+        assert sorted(article.id for article, _ in rows) == [lead, other]
+        assert get_duplicate_counts(session, [lead, other]) == {lead: 2}
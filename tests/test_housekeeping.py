@@ -0,0 +1,61 @@
+from datetime import datetime
+from sqlmodel import Session, select
+from app.bodies import compress_body
+from app.crud import bulk_insert_articles, create_feed, delete_feed
+from app.db import engine, init_db
+from app.housekeeping import purge_old_articles
+from app.models import Article, ArticleBody, Feed
+
+
+def add_feed(session: Session, name: str) -> int:
+    feed = create_feed(
+        session,
+        Feed(url=f"http://127.0.0.1:9/{name}.xml", title=name, retention_days=0),
+    )
+    articles = [
+        Article(
+            feed_id=feed.id,
+            title=f"{name} {number}",
+            link=f"http://example.com/{name}/{number}",
+            published_at=datetime(2026, 1, 1, number),
+            body=compress_body(f"<p>{name} {number}</p>"),
+        )
+        for number in range(3)
+    ]
+    bulk_insert_articles(session, articles)
+    session.commit()
+    return feed.id
+
+
+def test_articles_of_deleted_feeds_are_purged():
+    init_db()
+    with Session(engine) as session:
+        kept = add_feed(session, "kept")
+        removed = add_feed(session, "removed")
+        removed_ids = session.exec(
+            select(Article.id).where(Article.feed_id == removed)
+        ).all()
+        assert (
+            len(
+                session.exec(
+                    select(ArticleBody).where(ArticleBody.article_id.in_(removed_ids))
+                ).all()
+            )
+            == 3
+        )
+        assert delete_feed(session, removed)
+
+    assert purge_old_articles(engine) == 3
+    with Session(engine) as session:
+        assert (
+            session.exec(select(Article).where(Article.feed_id == removed)).all() == []
+        )
+        assert (
+            session.exec(
+                select(ArticleBody).where(ArticleBody.article_id.in_(removed_ids))
+            ).all()
+            == []
+        )
+        assert (
+            len(session.exec(select(Article).where(Article.feed_id == kept)).all()) == 3
+        )
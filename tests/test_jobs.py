@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from app.core.config import settings
+from app.jobs import (
+    JOB_FAILED,
+    JOB_FETCH_FEED,
+    JOB_PENDING,
+    JOB_PRIORITY_RETRY,
+    JOB_RUNNING,
+    claim_jobs,
+    complete_job,
+    enqueue_job,
+    fail_job,
+)
+from app.models import Job
+
+
+def statuses(conn) -> list:
+    return conn.execute(select(Job.status).order_by(Job.id)).scalars().all()
+
+
+def expire_claims(conn):
+    conn.execute(
+        update(Job).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+
+
+def test_pending_jobs_are_deduplicated(conn):
+    first = enqueue_job(conn, JOB_FETCH_FEED, 1, priority=JOB_PRIORITY_RETRY)
+    second = enqueue_job(conn, JOB_FETCH_FEED, 1)
+    assert second.id == first.id
+    assert second.priority > first.priority
+    assert enqueue_job(conn, JOB_FETCH_FEED, 2).id != first.id
+
+
+def test_highest_priority_is_claimed_first(conn):
+    enqueue_job(conn, JOB_FETCH_FEED, 1, priority=JOB_PRIORITY_RETRY)
+    enqueue_job(conn, JOB_FETCH_FEED, 2)
+    jobs = claim_jobs(conn, "worker", 10)
+    assert [job.feed_id for job in jobs] == [2, 1]
+    assert all(job.status == JOB_RUNNING and job.attempts == 1 for job in jobs)
+    assert claim_jobs(conn, "worker", 10) == []
+
+
+def test_failed_jobs_are_retried_later_at_a_lower_priority(conn):
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    (job,) = claim_jobs(conn, "worker", 10)
+    assert fail_job(conn, job, "worker", "boom") == JOB_PENDING
+
+    retried = conn.execute(select(Job)).one()
+    assert retried.priority == JOB_PRIORITY_RETRY
+    assert retried.run_after > datetime.utcnow()
+    assert claim_jobs(conn, "worker", 10) == []
+
+
+def test_jobs_are_given_up_after_their_last_attempt(conn):
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    for _ in range(settings.JOB_MAX_ATTEMPTS):
+        conn.execute(update(Job).values(run_after=datetime.utcnow()))
+        (job,) = claim_jobs(conn, "worker", 10)
+        status = fail_job(conn, job, "worker", "boom")
+    assert status == JOB_FAILED
+
+
+def test_retry_yields_to_an_identical_pending_job(conn):
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    (job,) = claim_jobs(conn, "worker", 10)
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    assert fail_job(conn, job, "worker", "boom") == JOB_FAILED
+    assert statuses(conn) == [JOB_FAILED, JOB_PENDING]
+
+
+def test_only_the_holder_completes_a_job(conn):
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    (job,) = claim_jobs(conn, "worker", 10)
+    assert not complete_job(conn, job, "other")
+    assert complete_job(conn, job, "worker")
+
+
+def test_expired_jobs_are_put_back(conn):
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    claim_jobs(conn, "worker", 10)
+    expire_claims(conn)
+    (job,) = claim_jobs(conn, "other", 10)
+    assert job.holder == "other"
+    assert job.attempts == 2
+
+
+def test_expired_jobs_with_the_same_key_are_put_back_once(conn):
+    # Queued again while running, then claimed again: both claims run out
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    claim_jobs(conn, "worker", 10)
+    enqueue_job(conn, JOB_FETCH_FEED, 1)
+    claim_jobs(conn, "worker", 10)
+    assert statuses(conn) == [JOB_RUNNING, JOB_RUNNING]
+    expire_claims(conn)
+
+    assert claim_jobs(conn, "other", 0) == []
+    assert statuses(conn) == [JOB_PENDING, JOB_FAILED]
+    (job,) = claim_jobs(conn, "other", 10)
+    assert job.holder == "other"
@@ -0,0 +1,28 @@
+from app.leases import acquire_leases, hold_leases, release_leases
+
+
+def test_one_holder_at_a_time(conn):
+    assert sorted(acquire_leases(conn, ["a", "b"], "first", 60)) == ["a", "b"]
+    assert acquire_leases(conn, ["a", "c"], "second", 60) == ["c"]
+    # The holder renews its own
+    assert sorted(acquire_leases(conn, ["a", "b"], "first", 60)) == ["a", "b"]
+
+
+def test_expired_leases_can_be_taken_over(conn):
+    acquire_leases(conn, ["a"], "first", 60)
+    hold_leases(conn, {"a": -1}, "first")
+    assert acquire_leases(conn, ["a"], "second", 60) == ["a"]
+
+
+def test_hold_and_release_only_touch_own_leases(conn):
+    acquire_leases(conn, ["a"], "first", 60)
+    hold_leases(conn, {"a": -1}, "second")
+    release_leases(conn, ["a"], "second")
+    assert acquire_leases(conn, ["a"], "second", 60) == []
+
+    release_leases(conn, ["a"], "first")
+    assert acquire_leases(conn, ["a"], "second", 60) == ["a"]
+
+
+def test_no_names_takes_nothing(conn):
+    assert acquire_leases(conn, [], "first", 60) == []
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def run_worker(directory: Path, code: str) -> str:
+    """Run code in a process sharing the metrics directory."""
+    result = subprocess.run(
+        [sys.executable, "-c", "from app.metrics import *\n" + code],
+        cwd=ROOT,
+        env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(directory)},
+        capture_output=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr.decode()
+    return result.stdout.decode()
+
+
+def test_workers_metrics_are_combined(tmp_path):
+    for connections in (2, 3):
+        run_worker(
+            tmp_path,
+            "ARTICLES_INSERTED.inc(5)\n"
+            "JOB_SECONDS.labels('jobs').observe(0.2)\n"
+            f"WS_CONNECTIONS.set({connections})",
+        )
+    # A worker that shut down no longer counts towards live gauges
+    run_worker(tmp_path, "WS_CONNECTIONS.set(7)\nmark_worker_stopped()")
+
+    body = run_worker(tmp_path, "print(render_metrics().decode())")
+    assert "bitpulse_articles_inserted_total 10.0" in body
+    assert 'bitpulse_scheduler_job_duration_seconds_count{job="jobs"} 2.0' in body
+    assert "bitpulse_websocket_connections 5.0" in body
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlmodel import SQLModel
+from app import migrations
+from app.migrations import MIGRATIONS, column_exists, get_schema_version, migrate
+
+
+def test_fresh_database_is_fully_migrated(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    SQLModel.metadata.create_all(engine)
+    assert migrate(engine) == len(MIGRATIONS)
+    # Nothing left to do the second time
+    assert migrate(engine) == len(MIGRATIONS)
+
+
+def test_legacy_database_is_upgraded(legacy_db):
+    engine = create_engine(f"sqlite:///{legacy_db}")
+    SQLModel.metadata.create_all(engine)
+    assert migrate(engine) == len(MIGRATIONS)
+    with engine.connect() as conn:
+        assert not column_exists(conn, "article", "content")
+        rows = conn.execute(
+            text("SELECT id, content_text, change_seq FROM article ORDER BY id")
+        ).all()
+        assert rows == [
+            (1, "The halving cuts the block reward.", 1),
+            (2, None, 2),
+        ]
+
+
+def test_failed_migration_leaves_nothing_behind(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'broken.db'}")
+    SQLModel.metadata.create_all(engine)
+    version = migrate(engine)
+
+    def half_done(conn):
+        conn.execute(text("CREATE TABLE half_done (id INTEGER)"))
+        conn.execute(text("ALTER TABLE feed ADD COLUMN half_done INTEGER"))
+        raise RuntimeError("Migration failed")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*MIGRATIONS, half_done])
+    with pytest.raises(RuntimeError):
+        migrate(engine)
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == version
+        assert not column_exists(conn, "feed", "half_done")
+        assert (
+            conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'half_done'")
+            ).all()
+            == []
+        )
+
+    def fixed(conn):
+        conn.execute(text("ALTER TABLE feed ADD COLUMN half_done INTEGER"))
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*MIGRATIONS, fixed])
+    assert migrate(engine) == version + 1
@@ -0,0 +1,92 @@
+import feedparser
+import pytest
+from app.bodies import decompress_body
+from app.normalize import (
+    canonical_link,
+    html_to_text,
+    make_excerpt,
+    normalize_article,
+    normalize_persian,
+    reading_time_minutes,
+    sanitize_html,
+)
+from app.rss import RSSParser
+
+
+def test_sanitize_html_strips_scripts_and_handlers():
+    cleaned = sanitize_html('<p onclick="steal()">Hi<script>alert(1)</script></p>')
+    assert cleaned == "<p>Hi</p>"
+    assert sanitize_html("") is None
+
+
+def test_html_to_text_separates_blocks_and_unescapes():
+    text = html_to_text("<h1>Bitcoin</h1><p>Price&nbsp;up<br>again &amp; again</p>")
+    assert text == "Bitcoin Price up again & again"
+    assert html_to_text("<b>bold</b>text") == "boldtext"
+    assert html_to_text(None) == ""
+
+
+def test_persian_forms():
+    # Arabic yeh and kaf, tatweel and Arabic-Indic digits
+    assert normalize_persian("بيتكـوين ١٢٣") == "بیتکوین ۱۲۳"
+    assert normalize_persian(None) is None
+
+
+@pytest.mark.parametrize(
+    "link, expected",
+    [
+        (
+            "https://Example.com:443/news?id=1&utm_source=x#top",
+            "https://example.com/news?id=1",
+        ),
+        ("http://example.com?fbclid=abc", "http://example.com/"),
+        ("http://example.com:8080/a", "http://example.com:8080/a"),
+        ("not a url", "not a url"),
+    ],
+)
+def test_canonical_link(link, expected):
+    assert canonical_link(link) == expected
+
+
+def test_excerpt_cuts_at_a_word_boundary():
+    assert make_excerpt("short", 10) == "short"
+    assert make_excerpt("one two three four five", 12) == "one two…"
+
+
+def test_reading_time():
+    assert reading_time_minutes(0) == 0
+    assert reading_time_minutes(1) == 1
+    assert reading_time_minutes(401) == 3
+
+
+def test_normalize_article():
+    values = normalize_article(
+        " Bitcoin &amp; Ether ",
+        " https://example.com/a?utm_medium=rss ",
+        "<p>Summary text</p>",
+        "<p>Full <b>body</b> of the story</p><script>x()</script>",
+    )
+    assert values["title"] == "Bitcoin & Ether"
+    assert values["link"] == "https://example.com/a?utm_medium=rss"
+    assert values["canonical_link"] == "https://example.com/a"
+    assert values["description"] == "Summary text"
+    assert values["content"] == "<p>Full <b>body</b> of the story</p>"
+    assert values["content_text"] == "Full body of the story"
+    assert values["excerpt"] == "Summary text"
+    assert values["word_count"] == 5
+    assert values["reading_time_minutes"] == 1
+
+
+def test_entries_are_normalized_at_ingest():
+    parsed = feedparser.parse(
+        b"""<rss version="2.0"><channel><title>T</title><item>
+        <title>Bitcoin news</title><link>https://example.com/1?gclid=x</link>
+        <description>&lt;p&gt;Price &lt;b&gt;rises&lt;/b&gt;&lt;/p&gt;</description>
+        <pubDate>Mon, 01 Jan 2024 10:00:00 GMT</pubDate>
+        </item></channel></rss>"""
+    )
+    article = RSSParser(None).parse_entry(parsed.entries[0], feed_id=1)
+    assert article.canonical_link == "https://example.com/1"
+    assert article.content_text == "Price rises"
+    assert article.excerpt == "Price rises"
+    assert decompress_body(article.body) == "<p>Price <b>rises</b></p>"
@@ -0,0 +1,53 @@
+from app.core.config import settings
+from app.db import init_db
+from app.models import Feed
+from app.pipeline import FeedWork, IngestPipeline
+from app.polling import PollSchedule, clamp_interval
+from app.rss import RSSParser, parse_feed_content
+
+
+def rss(items: str) -> bytes:
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Test</title>{items}</channel></rss>'.encode()
+
+
+def find_new_entries(document: bytes) -> FeedWork:
+    init_db()
+    work = FeedWork(Feed(id=1, url="http://127.0.0.1:9/undated.xml", title="Test"))
+    work.parsed = parse_feed_content(document)
+    IngestPipeline(RSSParser(None)).find_new_entries(work)
+    return work
+
+
+def test_only_dates_from_the_feed_are_reported():
+    work = find_new_entries(
+        rss(
+            "<item><title>Dated</title><link>http://example.com/dated</link>"
+            "<pubDate>Thu, 01 Jan 2026 10:00:00 GMT</pubDate></item>"
+            "<item><title>Undated</title><link>http://example.com/undated</link></item>"
+        )
+    )
+    assert len(work.entries) == 2
+    assert [date.isoformat()[:10] for date in work.published] == ["2026-01-01"]
+
+
+def test_undated_feeds_back_off():
+    work = find_new_entries(
+        rss(
+            "".join(
+                f"<item><title>Entry {number}</title><link>http://example.com/{number}</link></item>"
+                for number in range(20)
+            )
+        )
+    )
+    assert len(work.entries) == 20
+    assert work.published == []
+
+    schedule = PollSchedule()
+    schedule.sync([1], now=0)
+    schedule.pop_due(now=0)
+    start = schedule.states[1].interval
+    schedule.record_success(1, work.published, now=0)
+    assert schedule.states[1].interval == clamp_interval(
+        start * settings.RSS_POLL_BACKOFF_FACTOR
+    )
+    assert schedule.states[1].interval > start
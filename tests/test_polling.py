@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.polling import PollSchedule, clamp_interval, publish_interval
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+
+def hourly(count: int):
+    start = datetime(2026, 1, 1)
+    return [start + timedelta(hours=hour) for hour in range(count)]
+
+
+def test_publish_interval_is_the_median_gap():
+    assert publish_interval(hourly(5)) == HOUR
+    # Repeated dates don't count as zero gaps
+    assert publish_interval(hourly(3) + hourly(3)) == HOUR
+
+
+def test_publish_interval_needs_two_distinct_dates():
+    assert publish_interval([]) is None
+    assert publish_interval(hourly(1) * 3) is None
+
+
+def test_new_feeds_are_due_immediately():
+    schedule = PollSchedule()
+    schedule.sync([1, 2], now=0)
+    assert sorted(schedule.pop_due(now=0)) == [1, 2]
+    assert schedule.pop_due(now=0) == []
+
+
+def test_removed_feeds_are_forgotten():
+    schedule = PollSchedule()
+    schedule.sync([1, 2], now=0)
+    schedule.sync([2], now=0)
+    assert schedule.pop_due(now=0) == [2]
+
+
+def test_interval_moves_towards_the_publishing_rate():
+    schedule = PollSchedule()
+    schedule.sync([1], now=0)
+    schedule.pop_due(now=0)
+    start = schedule.states[1].interval
+    schedule.record_success(1, hourly(5), now=0)
+    assert schedule.states[1].interval == clamp_interval((start + HOUR) / 2)
+    assert schedule.seconds_until_due(1, now=0) is not None
+
+
+def test_unchanged_feeds_back_off():
+    schedule = PollSchedule()
+    schedule.sync([1], now=0)
+    schedule.pop_due(now=0)
+    start = schedule.states[1].interval
+    schedule.record_not_modified(1, now=0)
+    assert schedule.states[1].interval == clamp_interval(
+        start * settings.RSS_POLL_BACKOFF_FACTOR
+    )
+
+
+def test_failing_feeds_open_the_circuit():
+    schedule = PollSchedule()
+    schedule.sync([1], now=0)
+    for _ in range(settings.RSS_CIRCUIT_BREAKER_FAILURES):
+        schedule.pop_due(now=10**9)
+        schedule.record_failure(1, now=0)
+    delay = schedule.seconds_until_due(1, now=0)
+    breaker = settings.RSS_CIRCUIT_BREAKER_MINUTES * MINUTE
+    assert (
+        breaker * (1 - settings.RSS_POLL_JITTER)
+        <= delay
+        <= breaker * (1 + settings.RSS_POLL_JITTER)
+    )
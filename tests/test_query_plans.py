@@ -0,0 +1,213 @@
+"""The queries behind each endpoint and the ingest path use their indexes.
+
+Runs the crud helpers against a seeded database, captures the SQL they
+execute and checks SQLite's EXPLAIN QUERY PLAN for each statement: no
+full table scans, no temporary sorts for ordered listings, and the index
+the query was designed around.
+"""
+
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlmodel import Session, SQLModel
+from app import crud
+from app.bodies import get_content
+from app.duplicates import BINS, Fingerprint, find_stories
+from app.migrations import migrate
+from app.models import Article, Feed
+from app.schemas import ArticleQueryParams
+
+FULL_SCAN = re.compile(r"^SCAN (article|feed)$")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+NOW = datetime.utcnow()
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    """A migrated database with 500 articles over 5 feeds."""
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with Session(engine) as session:
+        feeds = [
+            Feed(url=f"https://example.com/{i}.xml", title=f"Feed {i}")
+            for i in range(5)
+        ]
+        session.add_all(feeds)
+        session.commit()
+        for i in range(500):
+            session.add(
+                Article(
+                    feed_id=feeds[i % 5].id,
+                    title=f"Bitcoin story {i}",
+                    link=f"https://example.com/story/{i}",
+                    description="Market update",
+                    published_at=NOW - timedelta(minutes=i),
+                    is_new=i < 50,
+                    minhash=i.to_bytes(2, "little") * BINS,
+                )
+            )
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+@contextmanager
+def capture_statements(engine):
+    """Collect the SQL and parameters executed inside the block."""
+    statements = []
+
+    def record(conn, cursor, sql, parameters, context, executemany):
+        statements.append((sql, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def explain(session: Session, sql: str, parameters) -> list:
+    """Get the query plan of a raw statement."""
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters)
+    return [row[3] for row in rows]
+
+
+def list_articles(**params):
+    return lambda session: crud.get_articles(session, ArticleQueryParams(**params))
+
+
+# (query runner, index the plan must mention, ordered listing?)
+CHECKS = [
+    pytest.param(
+        list_articles(size=20), "ix_article_published_at_id", True, id="GET /articles"
+    ),
+    pytest.param(
+        list_articles(
+            size=20,
+            cursor=crud.encode_cursor(
+                {"published_at": (NOW - timedelta(minutes=19)).isoformat(), "id": 20}
+            ),
+        ),
+        "ix_article_published_at_id",
+        True,
+        id="GET /articles?cursor",
+    ),
+    pytest.param(
+        list_articles(feed_id=1),
+        "ix_article_feed_id_published_at",
+        True,
+        id="GET /articles?feed_id",
+    ),
+    pytest.param(
+        list_articles(is_new=True),
+        "ix_article_new_published_at",
+        True,
+        id="GET /articles?is_new",
+    ),
+    pytest.param(
+        list_articles(
+            start_date=NOW - timedelta(hours=2), end_date=NOW - timedelta(hours=1)
+        ),
+        "ix_article_published_at_id",
+        True,
+        id="GET /articles?start_date&end_date",
+    ),
+    pytest.param(
+        list_articles(search="bitcoin"), "article_fts", False, id="GET /articles?search"
+    ),
+    pytest.param(
+        list_articles(collapse_duplicates=True),
+        "ix_article_lead_published_at",
+        True,
+        id="GET /articles?collapse_duplicates",
+    ),
+    pytest.param(
+        lambda session: crud.get_duplicate_counts(session, [1, 2, 3]),
+        "ix_article_story_id",
+        False,
+        id="GET /articles duplicate counts",
+    ),
+    pytest.param(
+        lambda session: crud.get_article(session, 1),
+        "PRIMARY KEY",
+        False,
+        id="GET /articles/{id}",
+    ),
+    pytest.param(
+        lambda session: get_content(session, 1),
+        "PRIMARY KEY",
+        False,
+        id="GET /articles/{id} body",
+    ),
+    pytest.param(
+        lambda session: session.exec(
+            crud.article_changes_statement(400, 100, crud.DEFAULT_ARTICLE_FIELDS)
+        ).all(),
+        "ix_article_change_seq",
+        True,
+        id="GET /articles/changes",
+    ),
+    pytest.param(
+        lambda session: session.exec(crud.tombstones_statement(400, 100)).all(),
+        "ix_article_tombstone_change_seq",
+        True,
+        id="GET /articles/changes deletions",
+    ),
+    pytest.param(
+        lambda session: crud.get_feed(session, 1),
+        "PRIMARY KEY",
+        False,
+        id="GET /feeds/{id}",
+    ),
+    pytest.param(
+        lambda session: crud.get_existing_article_keys(
+            session, ["https://example.com/story/1"], [("Bitcoin story 1", NOW)]
+        ),
+        "ix_article_link",
+        False,
+        id="ingest dedupe",
+    ),
+    pytest.param(
+        lambda session: find_stories(
+            session.connection(), [Fingerprint(None, bytes(2 * BINS), NOW)]
+        ),
+        "article_minhash_band USING PRIMARY KEY",
+        False,
+        id="ingest near-duplicates",
+    ),
+    pytest.param(
+        lambda session: crud.mark_old_articles(session, hours=1),
+        "ix_article_new_published_at",
+        False,
+        id="housekeeping expire",
+    ),
+    pytest.param(
+        lambda session: crud.delete_old_articles(
+            session, 1, NOW - timedelta(hours=6), 100
+        ),
+        "ix_article_feed_id_published_at",
+        False,
+        id="housekeeping purge",
+    ),
+]
+
+
+@pytest.mark.parametrize("run, expected_index, ordered", CHECKS)
+def test_query_uses_its_index(engine, run, expected_index, ordered):
+    with Session(engine) as session:
+        with capture_statements(engine) as statements:
+            run(session)
+        assert statements
+        for sql, parameters in statements:
+            plan = explain(session, sql, parameters)
+            assert not [step for step in plan if FULL_SCAN.match(step)], plan
+            # COUNT(*) for totals needs neither the order nor the index
+            if "count(" in sql.lower():
+                continue
+            if ordered:
+                assert TEMP_SORT not in plan, plan
+            assert any(expected_index in step for step in plan), plan
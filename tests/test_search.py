@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, select, text
+from sqlmodel import SQLModel
+from app.migrations import migrate
+from app.search import (
+    article_fts,
+    build_match_query,
+    match_clause,
+    rank,
+    search_snippets_statement,
+)
+
+
+def search(conn, term: str) -> list:
+    """Ids of the articles matching a search, best match first."""
+    statement = (
+        select(article_fts.c.rowid)
+        .where(match_clause(term))
+        .order_by(rank(), article_fts.c.rowid)
+    )
+    return conn.execute(statement).scalars().all()
+
+
+def test_index_follows_inserts_updates_and_deletes(db, add_article):
+    article_id = add_article(title="Bitcoin halving", description="Miners brace")
+    assert search(db, "halving") == [article_id]
+    assert search(db, "miners") == [article_id]
+
+    db.execute(
+        text("UPDATE article SET title = 'Ethereum upgrade' WHERE id = :id"),
+        {"id": article_id},
+    )
+    assert search(db, "halving") == []
+    assert search(db, "ethereum") == [article_id]
+
+    db.execute(text("DELETE FROM article WHERE id = :id"), {"id": article_id})
+    assert search(db, "ethereum") == []
+
+
+def test_every_word_must_match_as_a_prefix(db, add_article):
+    both = add_article(title="Bitcoin price rally")
+    add_article(title="Bitcoin mining")
+    assert search(db, "bitc pri") == [both]
+
+
+def test_title_matches_rank_above_content_matches(db, add_article):
+    in_content = add_article(title="Weekly roundup", content_text="Solana outage")
+    in_title = add_article(title="Solana outage", content_text="Weekly roundup")
+    assert search(db, "solana") == [in_title, in_content]
+
+
+def test_snippets_highlight_the_match(db, add_article):
+    article_id = add_article(title="News", content_text="The Bitcoin ETF was approved")
+    statement = search_snippets_statement([article_id], "etf")
+    ((rowid, snippet),) = db.execute(statement).all()
+    assert rowid == article_id
+    assert "<mark>ETF</mark>" in snippet
+    assert search_snippets_statement([], "etf") is None
+    assert search_snippets_statement([article_id], "!!!") is None
+
+
+def test_persian_search(db, add_article):
+    article_id = add_article(title="قیمت بیت‌کوین امروز")
+    # The half-space splits words, and Arabic letters match their Persian forms
+    assert search(db, "بیت کوین") == [article_id]
+    assert search(db, "كوين") == [article_id]
+    assert search(db, "قیمت") == [article_id]
+    assert search(db, "اتریوم") == []
+
+
+def test_query_syntax_is_not_injected():
+    assert build_match_query('bitcoin" OR "x') == '"bitcoin"* "OR"* "x"*'
+    assert build_match_query("!!!") == ""
+
+
+def test_rebuild_command(tmp_path):
+    path = tmp_path / "bitpulse.db"
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO feed (id, url, title, created_at, is_active) "
+                "VALUES (1, 'http://127.0.0.1:9/feed.xml', 'Test', CURRENT_TIMESTAMP, 1)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO article (feed_id, title, link, published_at, created_at, "
+                "is_new, word_count, reading_time_minutes, change_seq) "
+                "VALUES (1, 'Bitcoin', 'https://example.com/1', CURRENT_TIMESTAMP, "
+                "CURRENT_TIMESTAMP, 1, 0, 0, 0)"
+            )
+        )
+        conn.execute(text("INSERT INTO article_fts(article_fts) VALUES ('delete-all')"))
+        assert search(conn, "bitcoin") == []
+    engine.dispose()
+
+    result = subprocess.run(
+        [sys.executable, "-m", "app.search", "rebuild"],
+        cwd=Path(__file__).parent.parent,
+        env={**os.environ, "SQLITE_DB_PATH": str(path)},
+        capture_output=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        assert len(search(conn, "bitcoin")) == 1
+    engine.dispose()
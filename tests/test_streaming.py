@@ -0,0 +1,173 @@
+import asyncio
+import feedparser
+import httpx
+import pytest
+from app.core.config import settings
+from app.fetcher import ResponseTooLarge
+from app.rss import RSSParser
+from app.streaming import StreamingFeedParser, UnsupportedFeed
+
+RSS = b"""<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"
+     xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel>
+  <title>Crypto news</title>
+  <description>Daily updates</description>
+  <item>
+    <title>Bitcoin halving</title>
+    <link>https://example.com/halving</link>
+    <description><![CDATA[Miners brace for the halving]]></description>
+    <content:encoded><![CDATA[<p>The block reward is cut.</p>]]></content:encoded>
+    <dc:creator>Satoshi</dc:creator>
+    <pubDate>Mon, 01 Jan 2024 10:00:00 GMT</pubDate>
+  </item>
+  <item>
+    <title>Ethereum upgrade</title>
+    <guid>https://example.com/upgrade</guid>
+    <description>Validators prepare</description>
+    <pubDate>Tue, 02 Jan 2024 12:30:00 +0330</pubDate>
+  </item>
+</channel>
+</rss>"""
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>Crypto news</title>
+  <subtitle>Daily updates</subtitle>
+  <entry>
+    <title>Solana outage</title>
+    <link rel="alternate" href="https://example.com/outage"/>
+    <summary>The network stalled</summary>
+    <content type="html">&lt;p&gt;Block production stopped.&lt;/p&gt;</content>
+    <author><name>Vitalik</name></author>
+    <updated>2024-01-03T08:00:00Z</updated>
+  </entry>
+</feed>"""
+
+RDF = b"""<?xml version="1.0" encoding="utf-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns="http://purl.org/rss/1.0/" xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel><title>Crypto news</title><description>Daily updates</description></channel>
+  <item>
+    <title>Cardano fork</title>
+    <link>https://example.com/fork</link>
+    <description>Nodes upgrade</description>
+    <dc:date>2024-01-04T09:15:00Z</dc:date>
+  </item>
+</rdf:RDF>"""
+
+ENTRY_FIELDS = (
+    "title",
+    "link",
+    "summary",
+    "author",
+    "published_parsed",
+    "updated_parsed",
+)
+
+
+def stream(document: bytes, max_entries: int = 20, chunk_size: int = 7):
+    """Feed a document to the streaming parser in small chunks."""
+    parser = StreamingFeedParser(max_entries)
+    for start in range(0, len(document), chunk_size):
+        parser.feed(document[start : start + chunk_size])
+        if parser.done:
+            return parser.result()
+    return parser.close()
+
+
+def rss_with_items(count: int) -> bytes:
+    items = "".join(
+        f"<item><title>Story {number}</title>"
+        f"<link>https://example.com/{number}</link></item>"
+        for number in range(count)
+    )
+    return f'<rss version="2.0"><channel><title>Many</title>{items}</channel></rss>'.encode()
+
+
+@pytest.mark.parametrize("document", [RSS, ATOM, RDF], ids=["rss", "atom", "rdf"])
+def test_entries_match_feedparser(document):
+    streamed = stream(document)
+    parsed = feedparser.parse(document)
+    assert streamed.feed["title"] == parsed.feed["title"]
+    assert streamed.feed["subtitle"] == parsed.feed["subtitle"]
+    assert len(streamed.entries) == len(parsed.entries)
+    for ours, theirs in zip(streamed.entries, parsed.entries):
+        for field in ENTRY_FIELDS:
+            assert ours.get(field) == theirs.get(field), field
+        if "content" in theirs:
+            assert ours["content"][0]["value"] == theirs["content"][0]["value"]
+
+
+def test_stops_after_max_entries():
+    parser = StreamingFeedParser(max_entries=3)
+    document = rss_with_items(1000)
+    fed = 0
+    while not parser.done:
+        parser.feed(document[fed : fed + 64])
+        fed += 64
+    assert fed < len(document) // 10
+    assert [entry["title"] for entry in parser.result().entries] == [
+        "Story 0",
+        "Story 1",
+        "Story 2",
+    ]
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        b"<html><body>Not a feed</body></html>",
+        b"<rss><channel><item><title>Broken</item></channel></rss>",
+        b'<feed xmlns="http://www.w3.org/2005/Atom"><entry>'
+        b'<content type="xhtml"><div>Markup</div></content></entry></feed>',
+        b"<rss><channel><item><title>A <b>bold</b> title</title></item></channel></rss>",
+        b"",
+    ],
+    ids=["html", "invalid", "xhtml content", "markup in title", "empty"],
+)
+def test_unusual_documents_are_left_to_feedparser(document):
+    with pytest.raises(UnsupportedFeed):
+        stream(document)
+
+
+def read_feed(content, headers=None):
+    """Run RSSParser.read_feed over a response with the given body."""
+    request = httpx.Request("GET", "https://example.com/feed.xml")
+    response = httpx.Response(200, content=content, headers=headers, request=request)
+    return asyncio.run(RSSParser(None).read_feed(response))
+
+
+def test_read_feed_stops_reading_after_max_entries(monkeypatch):
+    monkeypatch.setattr(settings, "RSS_MAX_ENTRIES", 2)
+    document = rss_with_items(100)
+    sent = []
+
+    async def body():
+        for start in range(0, len(document), 100):
+            sent.append(start)
+            yield document[start : start + 100]
+
+    parsed = read_feed(body())
+    assert len(parsed.entries) == 2
+    assert len(sent) < 10
+
+
+def test_read_feed_falls_back_to_feedparser():
+    document = (
+        b'<feed xmlns="http://www.w3.org/2005/Atom"><title>X</title><entry>'
+        b"<title>Rich</title><link href='https://example.com/rich'/>"
+        b'<content type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml">'
+        b"<p>Markup</p></div></content></entry></feed>"
+    )
+    parsed = read_feed(document)
+    assert parsed.entries[0]["link"] == "https://example.com/rich"
+    assert "<p>Markup</p>" in parsed.entries[0]["content"][0]["value"]
+
+
+def test_read_feed_rejects_oversized_bodies(monkeypatch):
+    monkeypatch.setattr(settings, "RSS_MAX_FEED_BYTES", 1000)
+    with pytest.raises(ResponseTooLarge):
+        read_feed(rss_with_items(1000))
+    with pytest.raises(ResponseTooLarge):
+        read_feed(b"", headers={"Content-Length": "5000"})